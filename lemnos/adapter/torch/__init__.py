@@ -1,2 +1,12 @@
 from .formatter import create_module, generate_source, TorchComponentFormatter, DefaultComponentFormatter
+from .memory_planner import plan_execution_order, get_peak_live_size
+from .fusion import fold_batchnorm
+from .export import export_ir, export_source, load_module, prepare_for_inference, ExportFormat
 from .evaluator import TorchEvaluator, Adam, SGD, Optimizer, Scheduler, StepLR, OneCycleLR, AccuracyFunction
+from .compile_cache import CompileBackend, CompileCache, CompileStats
+from .checkpoint import Checkpointer
+from .precision import Precision, PrecisionPolicy, PolicyTiming, benchmark_policies, select_policy
+from .proxies import TorchProxyPrescreener, Proxy, get_grad_norm, get_synflow, get_naswot, get_loss_drop
+from .data import cache_dataset, DatasetCache, CachedLoader, DeviceLoader, BatchTransform
+from .latency import LatencyBenchmark, LatencyStats, benchmark_module, summarize_latency
+from .latency_table import LatencyTable, PredictionError
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+
+import time
+
+def measure_latency(module: Module, inputs: list[Tensor], iterations: int = 32, warmup: int = 4) -> list[float]:
+	times: list[float] = []
+	with torch.inference_mode():
+		for i in range(warmup + iterations):
+			start = time.perf_counter()
+			module(*inputs)
+			if i >= warmup:
+				times.append((time.perf_counter() - start) * 1000)
+	return times
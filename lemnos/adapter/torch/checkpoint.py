@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+import time
+import random
+import hashlib
+
+import numpy as np
+import torch
+
+from typing import Any
+
+# Checkpoints of the training state of a group of candidates, so an evaluation killed part way (preempted, or crashed) resumes where it was saved.
+#
+# A checkpoint holds the model, optimizer, scheduler and grad scaler states, the metrics recorded so far, the epoch and the batches done in it,
+#	and the random states both at the start of the epoch and at the checkpoint.
+# The loaders draw their order from the global random states as an epoch starts (numpy for cached loaders, torch for the rest),
+#	so a resumed epoch restores the states of its start, draws the same order and passes over the batches already trained,
+#	then restores the states of the checkpoint, and continues as the evaluation would have without the interruption.
+#	A checkpoint taken as an epoch starts holds only the states of its start, restoring them again once the loader has drawn would change its order.
+#	Batches passed over are still loaded, which for the cached and device loaders is a few tensor operations each.
+#
+# A checkpoint is named by a hash of the structural hashes of the group and its epochs, written under a temporary name and renamed over the last,
+#	so the file is always a whole checkpoint, and removed once the group finishes.
+# Saves are taken every every_steps steps, or every_seconds seconds, whichever is set and comes first, and at the end of each epoch when due.
+
+class Checkpointer:
+	def __init__(self, directory: str, every_steps: int | None = 256, every_seconds: float | None = None) -> None:
+		if every_steps is None and every_seconds is None:
+			raise ValueError("No checkpoint interval")
+		if every_steps is not None and every_steps < 1:
+			raise ValueError("Every steps must be at least 1")
+		os.makedirs(directory, exist_ok=True)
+		self._directory = directory
+		self._every_steps = every_steps
+		self._every_seconds = every_seconds
+		self._steps = 0
+		self._last_save = time.perf_counter()
+	def get_path(self, hashes: list[str], epochs: int) -> str:
+		return os.path.join(self._directory, hashlib.sha256(f"{epochs}|{'|'.join(hashes)}".encode()).hexdigest()[:32] + ".pt")
+	def tick(self) -> bool:
+		#counts a step, and returns whether a save is due
+		self._steps += 1
+		return self.is_due()
+	def is_due(self) -> bool:
+		return ((self._every_steps is not None and self._steps >= self._every_steps)
+			or (self._every_seconds is not None and time.perf_counter() - self._last_save >= self._every_seconds))
+	def save(self, path: str, state: dict[str, Any]) -> None:
+		temporary = f"{path}.{os.getpid()}.tmp"
+		torch.save(state, temporary)
+		os.replace(temporary, path)
+		self.reset()
+	def load(self, path: str, device: Any) -> dict[str, Any] | None:
+		self.reset()
+		if not os.path.exists(path):
+			return None
+		#metrics and random states are python objects, so the whole checkpoint is unpickled, it is only read from a directory the search writes
+		return torch.load(path, map_location=device, weights_only=False)
+	def remove(self, path: str) -> None:
+		if os.path.exists(path):
+			os.remove(path)
+	def reset(self) -> None:
+		self._steps = 0
+		self._last_save = time.perf_counter()
+
+def get_random_state() -> dict[str, Any]:
+	return {
+		"python": random.getstate(),
+		"numpy": np.random.get_state(),
+		"torch": torch.get_rng_state(),
+		"cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+	}
+
+def set_random_state(state: dict[str, Any]) -> None:
+	random.setstate(state["python"])
+	np.random.set_state(state["numpy"])
+	#map location moves every tensor of a checkpoint to the device, the generators take their states on cpu
+	torch.set_rng_state(state["torch"].cpu())
+	if state["cuda"] is not None and torch.cuda.is_available():
+		torch.cuda.set_rng_state_all([cuda_state.cpu() for cuda_state in state["cuda"]])
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from ...schema import IRNode, get_structural_hash
+
+import math
+import time
+
+import torch
+from torch.nn import Module
+
+from typing import Any, Callable
+from enum import Enum
+from collections import OrderedDict
+
+# torch.compile is paid once per model instance, seconds to minutes, which a candidate trained for a few steps never earns back.
+#
+# Compiled models are cached by the structural hash of the ir and its input shapes.
+#	A model evaluated again, by a later generation or a repeated evaluation, takes the cached compiled module with its parameters reset,
+#	which keeps the guards of the compiled graphs valid and so is not compiled again.
+#	An entry is lent to one evaluation at a time, an ir evaluated twice at once compiles a second module, which is not cached.
+#
+# On a miss the cost is measured: a probe step (forward and backward, grads cleared after) is timed eagerly and twice compiled,
+#	the first compiled step less the second is the compile time, and the eager step less the second is the saving per step.
+#	Once measured, a miss is only compiled if the expected steps times the mean saving pays for the mean compile time,
+#	and if compiling does not make steps faster it is skipped for every model not already cached.
+
+class CompileBackend(Enum):
+	INDUCTOR = "inductor"
+	CUDA_GRAPHS = "cudagraphs"
+
+class CompileStats:
+	__slots__ = ["_compiles", "_hits", "_skips", "_compile_seconds", "_eager_step_seconds", "_compiled_step_seconds"]
+	def __init__(self) -> None:
+		self._compiles: int = 0
+		self._hits: int = 0
+		self._skips: int = 0
+		self._compile_seconds: float = 0
+		self._eager_step_seconds: float = 0
+		self._compiled_step_seconds: float = 0
+	def record_compile(self, compile_seconds: float, eager_step_seconds: float, compiled_step_seconds: float) -> None:
+		self._compiles += 1
+		self._compile_seconds += compile_seconds
+		self._eager_step_seconds += eager_step_seconds
+		self._compiled_step_seconds += compiled_step_seconds
+	def record_hit(self) -> None:
+		self._hits += 1
+	def record_skip(self) -> None:
+		self._skips += 1
+	def get_compiles(self) -> int:
+		return self._compiles
+	def get_hits(self) -> int:
+		return self._hits
+	def get_skips(self) -> int:
+		return self._skips
+	def get_compile_time(self) -> float | None:
+		return self._compile_seconds / self._compiles if self._compiles > 0 else None
+	def get_step_saving(self) -> float | None:
+		return (self._eager_step_seconds - self._compiled_step_seconds) / self._compiles if self._compiles > 0 else None
+	def get_speedup(self) -> float | None:
+		return self._eager_step_seconds / self._compiled_step_seconds if self._compiles > 0 and self._compiled_step_seconds > 0 else None
+	def get_payback_steps(self) -> float | None:
+		#the training steps a compile needs to pay for itself, inf when compiling does not make steps faster
+		if (compile_time := self.get_compile_time()) is None or (saving := self.get_step_saving()) is None:
+			return None
+		return compile_time / saving if saving > 0 else math.inf
+	def __repr__(self) -> str:
+		return f"compiles: {self._compiles}, hits: {self._hits}, skips: {self._skips}, compile time: {self.get_compile_time()}, speedup: {self.get_speedup()}"
+
+class _CacheEntry:
+	__slots__ = ["module", "compiled", "in_use"]
+	def __init__(self, module: Module, compiled: Module) -> None:
+		self.module: Module = module
+		self.compiled: Module = compiled
+		self.in_use: bool = True
+
+class CompileCache:
+	def __init__(self, backend: CompileBackend = CompileBackend.INDUCTOR, max_entries: int = 32, mode: str | None = None, min_measurements: int = 1) -> None:
+		if max_entries < 1:
+			raise ValueError("Max entries must be at least 1")
+		if backend == CompileBackend.CUDA_GRAPHS and not torch.cuda.is_available():
+			raise ValueError("CUDA graphs need CUDA")
+		self._backend: CompileBackend = backend
+		self._max_entries: int = max_entries
+		self._mode: str | None = mode
+		self._min_measurements: int = min_measurements
+		self._entries: OrderedDict[tuple, _CacheEntry] = OrderedDict()
+		self._leases: dict[int, _CacheEntry] = {}
+		self._stats: CompileStats = CompileStats()
+	def acquire(self, ir: list[IRNode], build: Callable[[], Module], probe: Callable[[Module], Any], expected_steps: int) -> Module:
+		#build makes the eager model on its device, probe runs a training forward and backward through a model
+		#	the module returned is to be released once it is done training
+		key = (get_structural_hash(ir), tuple(tuple(node.input_shape) for node in ir if len(node.parent_ids) == 0))
+		entry = self._entries.get(key)
+		if entry is not None and not entry.in_use:
+			self._entries.move_to_end(key)
+			_reset_parameters(entry.module)
+			entry.in_use = True
+			self._leases[id(entry.compiled)] = entry
+			self._stats.record_hit()
+			return entry.compiled
+		module = build()
+		if not self._should_compile(expected_steps):
+			self._stats.record_skip()
+			return module
+		eager_step = _time_probe(module, probe, 2)
+		compiled = torch.compile(module, backend=self._backend.value, mode=self._mode)
+		first_step = _time_probe(compiled, probe, 1)
+		compiled_step = _time_probe(compiled, probe, 1)
+		self._stats.record_compile(max(first_step - compiled_step, 0), eager_step, compiled_step)
+		#the probes moved the running stats of normalization layers, the model starts training from a fresh initialization
+		_reset_parameters(module)
+		if entry is None:
+			new_entry = _CacheEntry(module, compiled)
+			self._entries[key] = new_entry
+			self._leases[id(compiled)] = new_entry
+			self._evict()
+		return compiled
+	def release(self, module: Module) -> None:
+		if (entry := self._leases.pop(id(module), None)) is not None:
+			entry.in_use = False
+	def get_stats(self) -> CompileStats:
+		return self._stats
+	def __len__(self) -> int:
+		return len(self._entries)
+	def _should_compile(self, expected_steps: int) -> bool:
+		if self._stats.get_compiles() < self._min_measurements:
+			return True
+		payback = self._stats.get_payback_steps()
+		return payback is not None and expected_steps >= payback
+	def _evict(self) -> None:
+		#least recently used first, entries lent out are kept
+		for key in [key for key, entry in self._entries.items() if not entry.in_use][:max(len(self._entries) - self._max_entries, 0)]:
+			del self._entries[key]
+
+def _time_probe(module: Module, probe: Callable[[Module], Any], repeats: int) -> float:
+	#the last of the repeats is timed, earlier ones warm up the allocator and kernels
+	for _ in range(repeats):
+		_synchronize()
+		start = time.perf_counter()
+		probe(module)
+		_synchronize()
+		seconds = time.perf_counter() - start
+	module.zero_grad(set_to_none=True)
+	return seconds
+
+def _reset_parameters(module: Module) -> None:
+	for child in module.modules():
+		if (reset := getattr(child, "reset_parameters", None)) is not None:
+			reset()
+
+def _synchronize() -> None:
+	if torch.cuda.is_available():
+		torch.cuda.synchronize()
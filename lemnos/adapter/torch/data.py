@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import os
+import math
+
+import numpy as np
+import torch
+from torch import Tensor
+from torch.utils.data import Dataset
+
+from typing import Iterator
+
+# A dataset is decoded and transformed once, and stored as a uint8 memory mapped file of inputs and an int64 file of labels.
+# Every evaluation (and every process, the files are only read) then samples batches straight from the map,
+#	and the per sample work of a data loader is replaced by a few tensor operations per batch:
+#	scaling back to float, normalization, and random flips and padded crops of the whole batch at once.
+#
+# Inputs are stored as round(input * scale), clipped to a byte, so the default scale suits inputs in [0, 1] such as ToTensor output.
+# The files are written beside each other under a temporary name and renamed into place,
+#	so a cache is either complete or absent, and concurrent searches can share one path (a path in /dev/shm keeps it in shared memory).
+
+class DatasetCache:
+	__slots__ = ["_inputs", "_labels", "_scale"]
+	def __init__(self, path: str, scale: float = 255) -> None:
+		self._inputs: np.ndarray = np.load(_inputs_path(path), mmap_mode="r")
+		self._labels: np.ndarray = np.load(_labels_path(path), mmap_mode="r")
+		if len(self._inputs) != len(self._labels):
+			raise ValueError("Cached inputs and labels differ in length")
+		self._scale: float = scale
+	def get_batch(self, indices: np.ndarray) -> tuple[Tensor, Tensor]:
+		#indices are sorted so the reads from the map are sequential, the batch order is restored after
+		order = np.argsort(indices, kind="stable")
+		sorted_indices = indices[order]
+		inverse = np.empty_like(order)
+		inverse[order] = np.arange(len(order))
+		inputs = torch.from_numpy(self._inputs[sorted_indices][inverse])
+		labels = torch.from_numpy(self._labels[sorted_indices][inverse])
+		return inputs, labels
+	def get_scale(self) -> float:
+		return self._scale
+	def get_input_shape(self) -> tuple[int, ...]:
+		return tuple(self._inputs.shape[1:])
+	def __len__(self) -> int:
+		return len(self._inputs)
+
+def cache_dataset(dataset: Dataset, path: str, scale: float = 255, overwrite: bool = False) -> DatasetCache:
+	if not overwrite and os.path.exists(_inputs_path(path)) and os.path.exists(_labels_path(path)):
+		return DatasetCache(path, scale)
+	length = len(dataset) # type: ignore
+	if length == 0:
+		raise ValueError("Dataset is empty")
+	first_input, _ = dataset[0]
+	directory = os.path.dirname(os.path.abspath(path))
+	os.makedirs(directory, exist_ok=True)
+	temporary = f"{path}.{os.getpid()}.tmp"
+	inputs = np.lib.format.open_memmap(_inputs_path(temporary), mode="w+", dtype=np.uint8, shape=(length, *tuple(first_input.shape)))
+	labels = np.lib.format.open_memmap(_labels_path(temporary), mode="w+", dtype=np.int64, shape=(length,))
+	for i in range(length):
+		input, label = dataset[i]
+		input = torch.as_tensor(input)
+		inputs[i] = (input if input.dtype == torch.uint8 else (input.float() * scale).round().clamp(0, 255).to(torch.uint8)).numpy()
+		labels[i] = int(label)
+	inputs.flush()
+	labels.flush()
+	del inputs, labels
+	#the labels are renamed last, a cache is only read once both exist
+	os.replace(_inputs_path(temporary), _inputs_path(path))
+	os.replace(_labels_path(temporary), _labels_path(path))
+	return DatasetCache(path, scale)
+
+class BatchTransform:
+	#flips are of the last dim, and crops pad and crop the last two dims back to their size, as for images in channels first order
+	#	flips and crops move bytes, so they are done before the inputs are widened to floats
+	__slots__ = ["_scale", "_flip", "_crop_padding", "_mean", "_std"]
+	def __init__(self, scale: float = 255, flip: bool = False, crop_padding: int = 0, mean: tuple[float, ...] | None = None, std: tuple[float, ...] | None = None) -> None:
+		if crop_padding < 0:
+			raise ValueError("Crop padding must not be negative")
+		self._scale: float = scale
+		self._flip: bool = flip
+		self._crop_padding: int = crop_padding
+		self._mean: Tensor | None = torch.tensor(mean, dtype=torch.float32) if mean is not None else None
+		self._std: Tensor | None = torch.tensor(std, dtype=torch.float32) if std is not None else None
+	def validate(self, input_shape: tuple[int, ...]) -> None:
+		if (self._flip or self._crop_padding > 0) and len(input_shape) < 2:
+			raise ValueError("Flips and crops need inputs with at least two dims")
+	def to(self, device: torch.device) -> BatchTransform:
+		if self._mean is not None:
+			self._mean = self._mean.to(device)
+		if self._std is not None:
+			self._std = self._std.to(device)
+		return self
+	def __call__(self, inputs: Tensor) -> Tensor:
+		if self._flip:
+			flipped = torch.rand(len(inputs), device=inputs.device) < .5
+			inputs[flipped] = inputs[flipped].flip(-1)
+		if self._crop_padding > 0:
+			inputs = _random_crop(inputs, self._crop_padding)
+		inputs = inputs.float().div_(self._scale)
+		shape = (1, -1) + (1,) * (inputs.dim() - 2)
+		if self._mean is not None:
+			inputs.sub_(self._mean.reshape(shape))
+		if self._std is not None:
+			inputs.div_(self._std.reshape(shape))
+		return inputs
+
+class CachedLoader:
+	def __init__(self,
+			cache: DatasetCache,
+			batch_size: int,
+			shuffle: bool = True,
+			drop_last: bool = False,
+			flip: bool = False,
+			crop_padding: int = 0,
+			mean: tuple[float, ...] | None = None,
+			std: tuple[float, ...] | None = None,
+		) -> None:
+		if batch_size < 1:
+			raise ValueError("Batch size must be at least 1")
+		self._cache = cache
+		self._batch_size = batch_size
+		self._shuffle = shuffle
+		self._drop_last = drop_last
+		self._transform = BatchTransform(cache.get_scale(), flip, crop_padding, mean, std)
+		self._transform.validate(cache.get_input_shape())
+	def __iter__(self) -> Iterator[tuple[Tensor, Tensor]]:
+		order = np.random.permutation(len(self._cache)) if self._shuffle else np.arange(len(self._cache))
+		for start in range(0, len(self) * self._batch_size, self._batch_size):
+			inputs, labels = self._cache.get_batch(order[start:start + self._batch_size])
+			yield self._transform(inputs), labels
+	def __len__(self) -> int:
+		return len(self._cache) // self._batch_size if self._drop_last else math.ceil(len(self._cache) / self._batch_size)
+
+class DeviceLoader:
+	#the whole dataset is held on the device, as uint8 when taken from a cache, and batches are sliced by a permutation made on the device
+	#	one loader (or two, for validation) is made per search and given to the evaluator, so every candidate shares the same tensors
+	def __init__(self,
+			inputs: Tensor,
+			labels: Tensor,
+			batch_size: int,
+			shuffle: bool = True,
+			drop_last: bool = False,
+			transform: BatchTransform | None = None,
+			device: torch.device | str | None = None,
+		) -> None:
+		if batch_size < 1:
+			raise ValueError("Batch size must be at least 1")
+		if len(inputs) != len(labels):
+			raise ValueError("Inputs and labels differ in length")
+		self._device = torch.device(device) if device is not None else torch.device("cuda" if torch.cuda.is_available() else "cpu")
+		self._inputs = inputs.to(self._device)
+		self._labels = labels.to(self._device)
+		self._batch_size = batch_size
+		self._shuffle = shuffle
+		self._drop_last = drop_last
+		self._transform = transform.to(self._device) if transform is not None else None
+		if self._transform is not None:
+			self._transform.validate(tuple(inputs.shape[1:]))
+	@staticmethod
+	def from_cache(cache: DatasetCache, batch_size: int, shuffle: bool = True, drop_last: bool = False,
+			flip: bool = False, crop_padding: int = 0, mean: tuple[float, ...] | None = None, std: tuple[float, ...] | None = None,
+			device: torch.device | str | None = None) -> DeviceLoader:
+		inputs, labels = cache.get_batch(np.arange(len(cache)))
+		return DeviceLoader(inputs, labels, batch_size, shuffle, drop_last, BatchTransform(cache.get_scale(), flip, crop_padding, mean, std), device)
+	@staticmethod
+	def from_dataset(dataset: Dataset, batch_size: int, shuffle: bool = True, drop_last: bool = False, device: torch.device | str | None = None) -> DeviceLoader:
+		#the dataset's own transforms are applied once, as it is loaded
+		inputs, labels = zip(*(dataset[i] for i in range(len(dataset)))) # type: ignore
+		return DeviceLoader(torch.stack([torch.as_tensor(input) for input in inputs]), torch.as_tensor(labels), batch_size, shuffle, drop_last, None, device)
+	def __iter__(self) -> Iterator[tuple[Tensor, Tensor]]:
+		order = torch.randperm(len(self._inputs), device=self._device) if self._shuffle else torch.arange(len(self._inputs), device=self._device)
+		for start in range(0, len(self) * self._batch_size, self._batch_size):
+			#the order within a batch does not matter, sorted indices gather from memory in order
+			#	index select is used over indexing, which takes a much slower general path on cpu
+			indices = order[start:start + self._batch_size].sort().values
+			inputs = self._inputs.index_select(0, indices)
+			yield (self._transform(inputs) if self._transform is not None else inputs), self._labels.index_select(0, indices)
+	def __len__(self) -> int:
+		return len(self._inputs) // self._batch_size if self._drop_last else math.ceil(len(self._inputs) / self._batch_size)
+	def get_device(self) -> torch.device:
+		return self._device
+
+def _random_crop(inputs: Tensor, padding: int) -> Tensor:
+	#every crop window of the padded batch is a strided view, so each sample's window is picked with one index, without copying the rest
+	height, width = inputs.shape[-2], inputs.shape[-1]
+	windows = torch.nn.functional.pad(inputs, (padding, padding, padding, padding)).unfold(-2, height, 1).unfold(-2, width, 1)
+	rows = torch.randint(0, 2 * padding + 1, (len(inputs),))
+	columns = torch.randint(0, 2 * padding + 1, (len(inputs),))
+	return windows.movedim((-4, -3), (1, 2))[torch.arange(len(inputs)), rows, columns]
+
+def _inputs_path(path: str) -> str:
+	return f"{path}.inputs.npy"
+def _labels_path(path: str) -> str:
+	return f"{path}.labels.npy"
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 from ...shared import LockedShape
-from ...schema import IRNode
-from ...control import Evaluator, Metrics, SampleCollection
+from ...schema import IRNode, get_structural_hash
+from ...control import Evaluator, Metrics, SampleCollection, EventBus, BatchMetrics, EpochEnd
 from .formatter import DefaultComponentFormatter, TorchComponentFormatter, create_module 
+from .data import CachedLoader, DeviceLoader
+from .precision import PrecisionPolicy
+from .compile_cache import CompileBackend, CompileCache
+from .resources import reset_peak_memory, get_peak_memory
+from .checkpoint import Checkpointer, get_random_state, set_random_state
 
 import torch
 from torch import Tensor
@@ -12,14 +17,11 @@ from torch.utils.data import DataLoader
 
 from typing import Callable, Any
 
-from enum import Enum
 from abc import ABC as Abstract, abstractmethod
 
 import gc
-
-class CompileBackend(Enum):
-	INDUCTOR = "inductor"
-	CUDA_GRAPHS = "cudagraphs"
+import time
+import itertools
 
 CUDA = "cuda"
 CPU = "cpu"
@@ -62,8 +64,8 @@ AccuracyFunction = Callable[[Tensor, Tensor], float]
 
 class TorchEvaluator(Evaluator):
 	def __init__(self, 
-			train_loader: DataLoader,
-			validation_loader: DataLoader | None,
+			train_loader: DataLoader | CachedLoader | DeviceLoader,
+			validation_loader: DataLoader | CachedLoader | DeviceLoader | None,
 			epochs: int,
 			criterion: Module,
 			accuracy_function: AccuracyFunction | None,
@@ -74,7 +76,14 @@ class TorchEvaluator(Evaluator):
 			metrics_resolution: int = 2048,
 			formatter: TorchComponentFormatter = DefaultComponentFormatter(),
 			torch_compiler: CompileBackend | None = None,
+			model_group_size: int = 1,
+			precision: PrecisionPolicy | None = None,
+			compile_cache: CompileCache | None = None,
+			events: EventBus | None = None,
+			checkpointer: Checkpointer | None = None,
 		) -> None:
+		if model_group_size < 1:
+			raise ValueError("Model group size must be at least 1")
 		self._device_type = CUDA if torch.cuda.is_available() else CPU 
 		if require_cuda and not self._device_type == CUDA:
 			raise ValueError("CUDA not available")
@@ -88,54 +97,199 @@ class TorchEvaluator(Evaluator):
 		self._input_shapes = input_shapes
 		self._metrics_resolution = metrics_resolution
 		self._formatter = formatter
-		self._torch_compiler = torch_compiler
+		#a torch compiler alone gets a cache of its own, a cache given can be shared between evaluators
+		self._compile_cache = compile_cache if compile_cache is not None else CompileCache(torch_compiler) if torch_compiler is not None else None
+		self._probe_batch: tuple[Tensor, Tensor] | None = None
 		self._training_example_count = 0
+		self._model_group_size = model_group_size
+		self._precision = precision if precision is not None else PrecisionPolicy()
+		self._precision.apply()
+		self._events = events
+		self._checkpointer = checkpointer
 	def evaluate(self, ir: list[IRNode]) -> tuple[Metrics, Metrics | None]:
+		return self._evaluate_group([ir])[0]
+	def evaluate_many(self, irs: list[list[IRNode]]) -> list[tuple[Metrics, Metrics | None]]:
+		#candidates are trained model group size at a time, each group on the same batches in a single step,
+		#	so loading and per step overhead are paid once per group rather than once per candidate
+		results: list[tuple[Metrics, Metrics | None]] = []
+		for start in range(0, len(irs), self._model_group_size):
+			results += self._evaluate_group(irs[start:start + self._model_group_size])
+		return results
+	def _evaluate_group(self, irs: list[list[IRNode]]) -> list[tuple[Metrics, Metrics | None]]:
 		device = torch.cuda.current_device() if self._device_type == CUDA else torch.device(CPU)
-		training_metrics = Metrics(self._metrics_resolution)
-		validation_metrics = Metrics(self._metrics_resolution)
-		model: Any = create_module("Model", ir, self._formatter)
-		if self._torch_compiler is not None:
-			model = torch.compile(model, backend=str(self._torch_compiler))
-		model.to(device)
-		optimizer = self._optimizer.get(model)
-		scheduler = self._scheduler.get(optimizer) if self._scheduler is not None else None
-		model.train()
-		scaler = torch.cuda.amp.GradScaler()
-		for epoch in range(self._epochs):
-			print("here")
-			for (input, truth) in self._train_loader:
-				input, truth = input.to(device), truth.to(device)
-				optimizer.zero_grad(set_to_none=True)
-				with torch.autocast(device_type=self._device_type, dtype=torch.float16):
-					output = model(input)
-					loss = self._criterion(output, truth)
-					accuracy = self._accuracy_function(output, truth) if self._accuracy_function is not None else None
-					training_metrics.record(SampleCollection(loss.item(), loss.item(), loss.item(), accuracy, None, epoch, len(input)))
-				scaler.scale(loss).backward()
-				scaler.step(optimizer)
+		baseline_memory = reset_peak_memory(self._device_type)
+		models: list[Any] = []
+		for ir in irs:
+			build = lambda: self._precision.prepare_model(create_module("Model", ir, self._formatter).to(device))
+			if self._compile_cache is not None:
+				models.append(self._compile_cache.acquire(ir, build, lambda model: self._probe(model, device), self._epochs * len(self._train_loader)))
+			else:
+				models.append(build())
+		try:
+			results = self._train_group(irs, models, device)
+			#the models of a group are resident together, so each is charged the peak of the group
+			peak_memory = max(get_peak_memory(self._device_type) - baseline_memory, 0)
+			for training_metrics, _ in results:
+				training_metrics.set_peak_memory(peak_memory)
+			return results
+		finally:
+			if self._compile_cache is not None:
+				for model in models:
+					self._compile_cache.release(model)
+	def _train_group(self, irs: list[list[IRNode]], models: list[Any], device: Any) -> list[tuple[Metrics, Metrics | None]]:
+		#the losses of the models are summed for one backward pass, the graphs are disjoint so each model only gets its own gradients,
+		#	each model keeps its own optimizer and scheduler, and the scaler skips the step of only the optimizers that overflowed
+		#the time of a step is split between the models of the group: each is charged its own forward,
+		#	a share of the backward, optimizer steps and collection in proportion to its forward, and an even share of the wait for the batch
+		#	the forwards end in loss.item(), which synchronizes the device, so the split holds on cuda as well
+		training_metrics = [Metrics(self._metrics_resolution) for _ in models]
+		validation_metrics = [Metrics(self._metrics_resolution) for _ in models]
+		optimizers = [self._optimizer.get(model) for model in models]
+		schedulers = [self._scheduler.get(optimizer) for optimizer in optimizers] if self._scheduler is not None else []
+		scaler = self._precision.get_scaler(self._device_type)
+		#whether anything listens is decided once, so without subscribers the loop does no event work
+		batch_events = self._events is not None and self._events.wants(BatchMetrics)
+		epoch_events = self._events is not None and self._events.wants(EpochEnd)
+		hashes = [get_structural_hash(ir) for ir in irs] if batch_events or epoch_events or self._checkpointer is not None else []
+		checkpoint_path = self._checkpointer.get_path(hashes, self._epochs) if self._checkpointer is not None else None
+		checkpoint = self._checkpointer.load(checkpoint_path, device) if self._checkpointer is not None and checkpoint_path is not None else None
+		if checkpoint is not None:
+			for model, state in zip(models, checkpoint["models"]):
+				getattr(model, "_orig_mod", model).load_state_dict(state)
+			for optimizer, state in zip(optimizers, checkpoint["optimizers"]):
+				optimizer.load_state_dict(state)
+			for scheduler, state in zip(schedulers, checkpoint["schedulers"]):
+				scheduler.load_state_dict(state)
+			scaler.load_state_dict(checkpoint["scaler"])
+			training_metrics, validation_metrics = checkpoint["training_metrics"], checkpoint["validation_metrics"]
+		first_epoch = checkpoint["epoch"] if checkpoint is not None else 0
+		for epoch in range(first_epoch, self._epochs):
+			for model in models:
+				model.train()
+			resumed = checkpoint is not None and epoch == first_epoch
+			epoch_random = checkpoint["epoch_random"] if resumed else get_random_state() if self._checkpointer is not None else None
+			if resumed:
+				set_random_state(epoch_random) # type: ignore
+			first_step = checkpoint["step"] if resumed else 0
+			epoch_start = time.perf_counter() - (checkpoint["seconds"] if resumed else 0)
+			training_losses = list(checkpoint["training_losses"]) if resumed else [0.0] * len(models)
+			validation_losses = [0.0] * len(models)
+			training_samples, validation_samples = checkpoint["training_samples"] if resumed else 0, 0
+			batches = iter(self._train_loader)
+			if resumed:
+				#the batches trained before the checkpoint are drawn in the same order and passed over
+				for _ in itertools.islice(batches, first_step):
+					pass
+				#a checkpoint at the start of an epoch is already at the epoch's states, restoring them again after the loader has drawn
+				#	(a data loader draws its base seed as it is iterated) would draw its order again, differently
+				if first_step > 0:
+					set_random_state(checkpoint["random"]) # type: ignore
+				checkpoint = None
+			wait_start = time.perf_counter()
+			for step, (input, truth) in enumerate(batches, first_step):
+				input, truth = self._precision.prepare_input(input.to(device)), truth.to(device)
+				compute_start = time.perf_counter()
+				wait = (compute_start - wait_start) / len(models)
+				for optimizer in optimizers:
+					optimizer.zero_grad(set_to_none=True)
+				with self._precision.autocast(self._device_type):
+					losses: list[Tensor] = []
+					values: list[float] = []
+					accuracies: list[float | None] = []
+					forward_times: list[float] = []
+					for model in models:
+						forward_start = time.perf_counter()
+						output = model(input)
+						loss = self._criterion(output, truth)
+						accuracies.append(self._accuracy_function(output, truth) if self._accuracy_function is not None else None)
+						values.append(loss.item())
+						forward_times.append(time.perf_counter() - forward_start)
+						losses.append(loss)
+				backward_start = time.perf_counter()
+				scaler.scale(torch.stack(losses).sum() if len(losses) > 1 else losses[0]).backward()
+				for optimizer in optimizers:
+					scaler.step(optimizer)
 				scaler.update()
 				self._training_example_count += 1
-				if training_metrics.get_total_samples() % 2**12 == 0:
-					print(f"sample count: {training_metrics.get_total_samples()}")
-					print(training_metrics)
-				gc.collect()
-			if scheduler is not None:
+				training_samples += len(input)
+				wait_start = time.perf_counter()
+				shared_time = wait_start - backward_start
+				total_forward_time = sum(forward_times)
+				for k, (metrics, value, accuracy, forward_time) in enumerate(zip(training_metrics, values, accuracies, forward_times)):
+					compute_time = forward_time + (shared_time * forward_time / total_forward_time if total_forward_time > 0 else shared_time / len(models))
+					metrics.record(SampleCollection(value, value, value, accuracy, compute_time, epoch, len(input), wait))
+					if epoch_events:
+						training_losses[k] += value * len(input)
+					if batch_events:
+						self._events.emit(BatchMetrics(hashes[k], epoch, step, value, accuracy, len(input), compute_time, wait)) # type: ignore
+				#a save due on the last batch is left to the end of the epoch, after the scheduler step and validation
+				if self._checkpointer is not None and self._checkpointer.tick() and step + 1 < len(self._train_loader):
+					self._save_checkpoint(checkpoint_path, models, optimizers, schedulers, scaler, training_metrics, validation_metrics, # type: ignore
+						epoch, step + 1, epoch_random, training_losses, training_samples, time.perf_counter() - epoch_start)
+					wait_start = time.perf_counter()
+			for scheduler in schedulers:
 				scheduler.step()
+			#collected once an epoch, a collection per batch took nearly all the step time of small models
+			gc.collect()
 			if self._validation_loader is not None:
-				model.eval()
+				for model in models:
+					model.eval()
 				with torch.no_grad():
+					wait_start = time.perf_counter()
 					for (input, truth) in self._validation_loader:
-						input, truth = input.to(device), truth.to(device)
-						with torch.autocast(device_type=self._device_type, dtype=torch.float16):
-							output = model(input)
-							loss = self._criterion(output, truth)
-							accuracy = self._accuracy_function(output, truth) if self._accuracy_function is not None else None
-						validation_metrics.record(SampleCollection(loss.item(), loss.item(), loss.item(), accuracy, None, epoch, len(input)))
-						gc.collect()
-				print("Validation Metrics")
-				print(validation_metrics)
-		return training_metrics, validation_metrics if self._validation_loader is not None else None
+						input, truth = self._precision.prepare_input(input.to(device)), truth.to(device)
+						forward_start = time.perf_counter()
+						wait = (forward_start - wait_start) / len(models)
+						for k, (model, metrics) in enumerate(zip(models, validation_metrics)):
+							with self._precision.autocast(self._device_type):
+								output = model(input)
+								loss = self._criterion(output, truth)
+								accuracy = self._accuracy_function(output, truth) if self._accuracy_function is not None else None
+							value = loss.item()
+							forward_end = time.perf_counter()
+							metrics.record(SampleCollection(value, value, value, accuracy, forward_end - forward_start, epoch, len(input), wait))
+							forward_start = forward_end
+							validation_losses[k] += value * len(input)
+						validation_samples += len(input)
+						wait_start = time.perf_counter()
+			if epoch_events:
+				for k in range(len(models)):
+					self._events.emit(EpochEnd(hashes[k], epoch, training_losses[k] / max(training_samples, 1), # type: ignore
+						validation_losses[k] / validation_samples if validation_samples > 0 else None, training_samples, time.perf_counter() - epoch_start))
+			if self._checkpointer is not None and epoch + 1 < self._epochs and self._checkpointer.is_due():
+				self._save_checkpoint(checkpoint_path, models, optimizers, schedulers, scaler, training_metrics, validation_metrics, # type: ignore
+					epoch + 1, 0, get_random_state(), [0.0] * len(models), 0, 0)
+		if self._checkpointer is not None:
+			self._checkpointer.remove(checkpoint_path) # type: ignore
+		return [(training, validation if self._validation_loader is not None else None) for training, validation in zip(training_metrics, validation_metrics)]
+	def _save_checkpoint(self, path: str, models: list[Any], optimizers: list[torch.optim.Optimizer], schedulers: list[torch.optim.lr_scheduler.LRScheduler],
+			scaler: Any, training_metrics: list[Metrics], validation_metrics: list[Metrics], epoch: int, step: int, epoch_random: dict[str, Any],
+			training_losses: list[float], training_samples: int, seconds: float) -> None:
+		#the states of compiled models are taken from the module they wrap, so a checkpoint loads whether or not the resumed model is compiled
+		self._checkpointer.save(path, { # type: ignore
+			"models": [getattr(model, "_orig_mod", model).state_dict() for model in models],
+			"optimizers": [optimizer.state_dict() for optimizer in optimizers],
+			"schedulers": [scheduler.state_dict() for scheduler in schedulers],
+			"scaler": scaler.state_dict(),
+			"training_metrics": training_metrics,
+			"validation_metrics": validation_metrics,
+			"epoch": epoch,
+			"step": step,
+			"epoch_random": epoch_random,
+			"random": get_random_state() if step > 0 else None,
+			"training_losses": training_losses,
+			"training_samples": training_samples,
+			"seconds": seconds,
+		})
+	def _probe(self, model: Any, device: Any) -> None:
+		#a training forward and backward on the first batch, which the compile cache times to weigh compiling against running eagerly
+		if self._probe_batch is None:
+			input, truth = next(iter(self._train_loader))
+			self._probe_batch = (self._precision.prepare_input(input.to(device)), truth.to(device))
+		model.train()
+		with self._precision.autocast(self._device_type):
+			loss = self._criterion(model(self._probe_batch[0]), self._probe_batch[1])
+		loss.backward()
 	def get_input_shapes(self) -> list[LockedShape]:
 		if self._input_shapes is not None:
 			return self._input_shapes
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from ...schema import IRNode
+from .formatter import DefaultComponentFormatter, TorchComponentFormatter, create_module, generate_source
+from .fusion import fold_batchnorm
+from .benchmark import measure_latency
+
+import torch
+from torch import Tensor
+from torch.nn import Module, Identity, Dropout, Dropout1d, Dropout2d, Dropout3d
+
+from typing import Any
+from enum import Enum
+
+import importlib.util
+import os
+
+_ONNX_PACKAGES = ("onnx", "onnxscript")
+
+class ExportFormat(Enum):
+	SOURCE = "source"
+	TORCHSCRIPT = "torchscript"
+	ONNX = "onnx"
+
+def prepare_for_inference(module: Module, ir: list[IRNode]) -> Module:
+	module.eval()
+	fold_batchnorm(module, ir)
+	for name, child in list(module.named_children()):
+		if isinstance(child, Dropout) or isinstance(child, Dropout1d) or isinstance(child, Dropout2d) or isinstance(child, Dropout3d):
+			setattr(module, name, Identity())
+	return module
+
+def get_example_inputs(ir: list[IRNode], batch_size: int = 1) -> list[Tensor]:
+	return [torch.zeros(batch_size, *node.input_shape) for node in ir if len(node.parent_ids) == 0]
+
+def export_source(path: str, name: str, ir: list[IRNode], component_formatter: TorchComponentFormatter = DefaultComponentFormatter()) -> str:
+	with open(path, "w") as file:
+		file.write(generate_source(name, ir, component_formatter) + "\n")
+	return path
+
+def load_module(path: str, name: str) -> Module:
+	spec = importlib.util.spec_from_file_location(name, path)
+	if spec is None or spec.loader is None:
+		raise ImportError(f"Cannot load module from '{path}'")
+	source_module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(source_module)
+	return getattr(source_module, name)()
+
+def onnx_available() -> bool:
+	return all(importlib.util.find_spec(package) is not None for package in _ONNX_PACKAGES)
+
+def export_ir(ir: list[IRNode], directory: str, name: str, 
+		state_dict: dict[str, Any] | None = None, 
+		formats: tuple[ExportFormat, ...] = (ExportFormat.SOURCE, ExportFormat.TORCHSCRIPT),
+		component_formatter: TorchComponentFormatter = DefaultComponentFormatter(),
+		) -> dict[ExportFormat, str]:
+	#onnx is opt in, its packages are checked before anything is written, so a missing one leaves no partial export
+	if ExportFormat.ONNX in formats and not onnx_available():
+		raise ImportError("ONNX export needs the onnx and onnxscript packages, install requirements-onnx.txt")
+	os.makedirs(directory, exist_ok=True)
+	paths: dict[ExportFormat, str] = {}
+	module = create_module(name, ir, component_formatter)
+	if state_dict is not None:
+		module.load_state_dict(state_dict)
+	if ExportFormat.SOURCE in formats:
+		#the source and weights are saved before folding, so the module can be loaded, trained further, or prepared again
+		paths[ExportFormat.SOURCE] = export_source(os.path.join(directory, f"{name}.py"), name, ir, component_formatter)
+		torch.save(module.state_dict(), os.path.join(directory, f"{name}.pt"))
+	module = prepare_for_inference(module, ir)
+	inputs = get_example_inputs(ir)
+	input_names = [f"input_{i}" for i in range(len(inputs))]
+	if ExportFormat.TORCHSCRIPT in formats:
+		paths[ExportFormat.TORCHSCRIPT] = os.path.join(directory, f"{name}.torchscript.pt")
+		with torch.no_grad():
+			torch.jit.save(torch.jit.freeze(torch.jit.trace(module, tuple(inputs))), paths[ExportFormat.TORCHSCRIPT])
+	if ExportFormat.ONNX in formats:
+		paths[ExportFormat.ONNX] = os.path.join(directory, f"{name}.onnx")
+		torch.onnx.export(module, tuple(inputs), paths[ExportFormat.ONNX], input_names=input_names, output_names=["output"], 
+			dynamic_axes={input_name: {0: "batch"} for input_name in input_names + ["output"]})
+	return paths
+
+def benchmark_export(path: str, ir: list[IRNode], batch_size: int = 1, iterations: int = 32, warmup: int = 4) -> list[float]:
+	return measure_latency(torch.jit.load(path, map_location="cpu"), get_example_inputs(ir, batch_size), iterations, warmup)
@@ -3,6 +3,7 @@ from ...schema import IRNode
 from ...schema.components import *
 from ...templates.torch import * 
 from ...templates.python import *
+from .memory_planner import plan_execution_order
 from torch.nn import Module
 
 from abc import ABC as Abstract, abstractmethod
@@ -15,7 +16,7 @@ class ShapeView(Enum):
 
 class TorchComponentFormatter(Abstract):
 	@abstractmethod
-	def get_init(self, component: Component, input_shape: LockedShape, output_shape: LockedShape) -> str:
+	def get_init(self, component: Component, input_shape: LockedShape, output_shape: LockedShape, inplace: bool = False) -> str:
 		pass
 	@abstractmethod
 	def get_forward(self, component: Component, input_shape: LockedShape, output_shape: LockedShape, component_name: str, input_exprs: list[str]) -> str:
@@ -26,9 +27,11 @@ class TorchComponentFormatter(Abstract):
 	@abstractmethod
 	def get_class_definitions(self) -> list[str]:
 		pass
+	def supports_inplace(self, component: Component) -> bool:
+		return False
 
 class DefaultComponentFormatter(TorchComponentFormatter):
-	def get_init(self, component: Component, input_shape: LockedShape, output_shape: LockedShape) -> str:
+	def get_init(self, component: Component, input_shape: LockedShape, output_shape: LockedShape, inplace: bool = False) -> str:
 		if isinstance(component, Conv):
 			return conv_init_(input_shape, output_shape, component.get_kernel(input_shape),
 				component.get_stride(input_shape), component.get_padding(input_shape),
@@ -36,15 +39,15 @@ class DefaultComponentFormatter(TorchComponentFormatter):
 		elif isinstance(component, Full):
 			return full_init_(input_shape, output_shape)
 		elif isinstance(component, ReLU):
-			return relu_init_()
+			return relu_init_(inplace)
 		elif isinstance(component, ReLU6):
-			return relu6_init_()
+			return relu6_init_(inplace)
 		elif isinstance(component, Sigmoid):
 			return sigmoid_init_() 
 		elif isinstance(component, Softmax):
 			return softmax_init_() 
 		elif isinstance(component, SiLU):
-			return silu_init_()
+			return silu_init_(inplace)
 		elif isinstance(component, BatchNorm):
 			return batchnorm_init_(output_shape) 
 		elif isinstance(component, LayerNorm):
@@ -75,37 +78,83 @@ class DefaultComponentFormatter(TorchComponentFormatter):
 			return ShapeView.REAL
 		elif isinstance(component, Full):
 			return ShapeView.FLAT
+		elif isinstance(component, Softmax):
+			#normalizes over dim 1, which is the flattened features, not the channels of the real view
+			return ShapeView.FLAT
 		elif isinstance(component, Concat) or isinstance(component, Sum):
 			return ShapeView.FLAT
 		return ShapeView.EITHER
 	def get_class_definitions(self) -> list[str]:
 		return conv_mix_definition_(1) + conv_mix_definition_(2) + conv_mix_definition_(3)
+	def supports_inplace(self, component: Component) -> bool:
+		return isinstance(component, ReLU) or isinstance(component, ReLU6) or isinstance(component, SiLU)
 
 def _register_name(register: ID) -> str:
 	return f"r{register:04x}"
 def _component_name(node_id: ID, component_index: int) -> str:
 	return f"c{node_id:04x}_{component_index}"
-def generate_source(name: str, ir: list[IRNode], component_formatter: TorchComponentFormatter = DefaultComponentFormatter()) -> str:
+def _inplace_safe(node: IRNode) -> bool:
+	#the activation input must be a fresh tensor, ie produced by the transform or a merge of multiple inputs
+	#otherwise it may be a parent register that is still needed by another node or by autograd
+	if node.schema_node.get_transform() is not None:
+		return True
+	return node.schema_node.get_merge_method() is not None and len(node.parent_ids) > 1
+def _mix_foldable(node: IRNode, children: list[IRNode]) -> bool:
+	#the channel mix gather is a fixed permutation of the output channels,
+	#if the only consumer is a dense layer, the permutation can be folded into that layers weights,
+	#as the weights are freshly initialized, the folded layer is simply a layer with its input channels relabeled
+	transform = node.schema_node.get_transform()
+	if not isinstance(transform, Conv) or not transform.get_mix_groups():
+		return False
+	if transform.get_groups(node.input_shape) == 1:
+		return True
+	if len(children) != 1 or len(children[0].parent_ids) != 1 or isinstance(node.schema_node.get_activation(), GLU):
+		return False
+	child_transform = children[0].schema_node.get_transform()
+	return isinstance(child_transform, Full) or (isinstance(child_transform, Conv) and child_transform.get_groups(children[0].input_shape) == 1)
+def _merged_view(component: MergeMethod, node: IRNode, views: list[LockedShape | None]) -> LockedShape | None:
+	if len(views) == 1:
+		return views[0]
+	if any(view is None for view in views):
+		return None
+	if isinstance(component, Sum) and all(view == node.input_shape for view in views):
+		return node.input_shape
+	if isinstance(component, Concat) and all(len(view) == len(node.input_shape) and view.to_open() == node.input_shape.to_open() for view in views if view is not None):
+		return node.input_shape
+	return None
+def generate_source(name: str, ir: list[IRNode], component_formatter: TorchComponentFormatter = DefaultComponentFormatter(), memory_planning: bool = True, fusion: bool = True) -> str:
+	return_order: dict[ID, int] = {node.id: i for i, node in enumerate(ir)}
+	if memory_planning:
+		ir = plan_execution_order(ir)
 	children_counts: dict[ID, int] = {}
+	children: dict[ID, list[IRNode]] = {}
 	for node in ir:
 		for parent_id in node.parent_ids:
 			children_counts[parent_id] = children_counts.get(parent_id, 0) + 1
+			children.setdefault(parent_id, []).append(node)
 	node_register: dict[ID, ID] = {}
+	register_views: dict[ID, LockedShape | None] = {}
 	arg_registers: list[ID] = []
-	return_registers: list[ID] = []
+	return_registers: list[tuple[int, ID]] = []
 	init_statements: list[str] = []
 	forward_statements: list[str] = []
 	available_registers: list[ID] = []
 	greatest_register: ID = ID(0) 
 	for node in ir:
 		registers_in: list[ID] = []
+		freed_registers: list[ID] = []
 		register_out: ID
 		if len(node.parent_ids) == 0:
 			greatest_register += 1
 			node_register[node.id] = greatest_register
 			registers_in = [greatest_register]
 			register_out = greatest_register
-			forward_statements.append(assign_(_register_name(register_out), flatten_view_(_register_name(greatest_register), node.input_shape)))
+			if fusion:
+				forward_statements.append(assign_(_register_name(register_out), view_(_register_name(greatest_register), node.input_shape)))
+				register_views[register_out] = node.input_shape
+			else:
+				forward_statements.append(assign_(_register_name(register_out), flatten_view_(_register_name(greatest_register), node.input_shape)))
+				register_views[register_out] = None
 			arg_registers.append(greatest_register)
 		else:
 			for id in node.parent_ids:
@@ -113,6 +162,7 @@ def generate_source(name: str, ir: list[IRNode], component_formatter: TorchCompo
 				children_counts[id] -= 1
 				if children_counts[id] == 0:
 					available_registers.append(node_register[id])
+					freed_registers.append(node_register[id])
 			if len(available_registers) == 0:
 				greatest_register += 1
 				register_out = greatest_register
@@ -120,24 +170,45 @@ def generate_source(name: str, ir: list[IRNode], component_formatter: TorchCompo
 				register_out = available_registers.pop()
 		node_register[node.id] = register_out
 		if node.id not in children_counts: #dont need to worry about register being reclaimed
-			return_registers.append(register_out)
+			return_registers.append((return_order[node.id], register_out))
 		forward_statement = [_register_name(register) for register in registers_in] 
-		current_shape = ShapeView.FLAT
+		views: list[LockedShape | None] = [register_views[register] for register in registers_in]
+		logical_shape = node.input_shape
 		for i, component in enumerate(node.schema_node.get_components()):
-			if (init := component_formatter.get_init(component, node.input_shape, node.output_shape)) != "":
+			inplace = memory_planning and isinstance(component, Activation) and component_formatter.supports_inplace(component) and _inplace_safe(node)
+			if fusion and isinstance(component, Conv) and _mix_foldable(node, children.get(node.id, [])):
+				component = component.get_unmixed()
+			if (init := component_formatter.get_init(component, node.input_shape, node.output_shape, inplace)) != "":
 				init_statements.append(assign_(self_(_component_name(node.id, i)), self_(init)))
-			if component_formatter.get_shape_requirment(component) == ShapeView.REAL and current_shape == ShapeView.FLAT:
-				forward_statement = [view_(expr, node.input_shape) for expr in forward_statement]
-			elif component_formatter.get_shape_requirment(component) == ShapeView.FLAT and current_shape == ShapeView.REAL:
-				forward_statement = [flatten_view_(expr, node.input_shape) for expr in forward_statement]
-			current_shape = component_formatter.get_shape_requirment(component)
+			requirement = component_formatter.get_shape_requirment(component)
+			if fusion and isinstance(component, MergeMethod) and (merged_view := _merged_view(component, node, views)) is not None:
+				views = [merged_view]
+			elif requirement == ShapeView.REAL:
+				forward_statement = [expr if view == logical_shape else view_(expr, logical_shape) for expr, view in zip(forward_statement, views)]
+				views = [logical_shape]
+			elif requirement == ShapeView.FLAT:
+				forward_statement = [expr if view is None else flatten_view_(expr, view) for expr, view in zip(forward_statement, views)]
+				views = [None]
+			elif len(views) > 1:
+				forward_statement = [expr if view is None else flatten_view_(expr, view) for expr, view in zip(forward_statement, views)]
+				views = [None]
 			forward_statement = [component_formatter.get_forward(component, node.input_shape, node.output_shape, self_(_component_name(node.id, i)), forward_statement)]
-		#forward_statements.append(assign_(_register_name(register_out), (flatten_view_(forward_statement[0], node.output_shape) if current_shape == ShapeView.REAL else forward_statement[0])))
-		forward_statements.append(assign_(_register_name(register_out), (flatten_view_(forward_statement[0], node.output_shape))))
+			if isinstance(component, Transform):
+				logical_shape = node.output_shape
+				views = [node.output_shape if views[0] is not None else None]
+		view = views[0]
+		if view is not None and (not fusion or node.id not in children_counts):
+			forward_statement = [flatten_view_(forward_statement[0], view)]
+			view = None
+		register_views[register_out] = view
+		forward_statements.append(assign_(_register_name(register_out), forward_statement[0]))
+		if memory_planning and len(dead_registers := [register for register in freed_registers if register != register_out]) > 0:
+			forward_statements.append(del_(*map(_register_name, dead_registers)))
 		#forward_statements.append(print_(arg_list_(f"'{node.schema_node.debug_name}'", _register_name(register_out) + ".shape")))
-	forward_statements.append(return_(*[_register_name(register) for register in return_registers]))
+	return_registers.sort()
+	forward_statements.append(return_(*[_register_name(register) for _, register in return_registers]))
 	return concat_lines_(import_torch_(), *module_(name, component_formatter.get_class_definitions(), [], init_statements, list(map(_register_name, arg_registers)), forward_statements))
-def create_module(name: str, ir: list[IRNode], component_formatter: TorchComponentFormatter = DefaultComponentFormatter()) -> Module:
-	source = generate_source(name, ir, component_formatter)
+def create_module(name: str, ir: list[IRNode], component_formatter: TorchComponentFormatter = DefaultComponentFormatter(), memory_planning: bool = True, fusion: bool = True) -> Module:
+	source = generate_source(name, ir, component_formatter, memory_planning, fusion)
 	exec(source)
 	return locals()[name]()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from ...schema import IRNode
+from ...schema.components import Conv, BatchNorm
+from .formatter import _component_name
+
+import torch
+from torch.nn import Module, Identity
+from torch.nn.utils.fusion import fuse_conv_bn_weights
+
+# Passes over an instantiated module, these rely on the component naming of generate_source,
+# and are only valid for inference, as the folded layers no longer track batch statistics.
+
+def fold_batchnorm(module: Module, ir: list[IRNode]) -> Module:
+	if module.training:
+		raise ValueError("BatchNorm can only be folded in eval mode")
+	for node in ir:
+		components = node.schema_node.get_components()
+		#the activation sits between the transform and the regularization, so only an activation free node can be folded
+		if node.schema_node.get_activation() is not None or not isinstance(node.schema_node.get_transform(), Conv) or not isinstance(node.schema_node.get_regularization(), BatchNorm):
+			continue
+		conv_name = _component_name(node.id, components.index(node.schema_node.get_transform()))
+		norm_name = _component_name(node.id, components.index(node.schema_node.get_regularization()))
+		conv = getattr(module, conv_name)
+		norm = getattr(module, norm_name)
+		norm_parameters = (norm.running_mean, norm.running_var, norm.weight, norm.bias)
+		if hasattr(conv, "indices"):
+			#the mix gather permutes the conv channels before the norm, so the norm is permuted back onto the conv channels
+			conv, norm_parameters = conv.c, tuple(_unpermute(parameter, conv.indices) for parameter in norm_parameters)
+		with torch.no_grad():
+			running_mean, running_var, norm_weight, norm_bias = norm_parameters
+			weight, bias = fuse_conv_bn_weights(conv.weight, conv.bias, running_mean, running_var, norm.eps, norm_weight, norm_bias)
+			conv.weight = weight
+			conv.bias = bias
+		setattr(module, norm_name, Identity())
+	return module
+
+def _unpermute(parameter: torch.Tensor | None, indices: torch.Tensor) -> torch.Tensor | None:
+	if parameter is None:
+		return None
+	unpermuted = torch.empty_like(parameter)
+	unpermuted[indices.long()] = parameter
+	return unpermuted
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from ...schema import IRNode, get_structural_hash
+from ...control import Cost
+from .formatter import DefaultComponentFormatter, TorchComponentFormatter, create_module
+from .export import prepare_for_inference
+from .benchmark import measure_latency
+
+import numpy as np
+import torch
+from torch.nn import Module
+
+from dataclasses import dataclass
+
+# Cpu inference latency of the modules an ir builds, prepared as for export (eval mode, batchnorm folded, dropout removed).
+#
+# Each batch size and thread count is measured after warm-up runs, and runs beyond the far tukey fence (q3 + fence * iqr, 3 by default) are rejected,
+#	which drops the runs interrupted by the scheduler while keeping the tail of the module itself in the p99.
+# Thread counts are process wide, they are set for each measurement and restored after.
+#
+# The latency benchmark caches the measurements of an ir by its structural hash, and as a cost gives the median latency in milliseconds
+#	at one batch size and thread count, for selectors to penalize and prescreeners to rank by.
+
+@dataclass(frozen=True)
+class LatencyStats:
+	batch_size: int
+	threads: int
+	p50: float
+	p99: float
+	mean: float
+	#samples per second, over the runs kept
+	throughput: float
+	rejected: int
+
+def summarize_latency(times: list[float], batch_size: int, threads: int, fence: float = 3) -> LatencyStats:
+	#times in milliseconds
+	if len(times) == 0:
+		raise ValueError("No times")
+	values = np.asarray(times)
+	q1, q3 = np.percentile(values, [25, 75])
+	kept = values[values <= q3 + fence * (q3 - q1)]
+	return LatencyStats(batch_size, threads, float(np.percentile(kept, 50)), float(np.percentile(kept, 99)), float(kept.mean()),
+		batch_size * len(kept) / float(kept.sum()) * 1000 if kept.sum() > 0 else float("inf"), len(values) - len(kept))
+
+def benchmark_module(module: Module, input_shapes: list[tuple[int, ...]], batch_sizes: tuple[int, ...] = (1, 8, 32), thread_counts: tuple[int, ...] = (1,),
+		iterations: int = 32, warmup: int = 8, fence: float = 3) -> list[LatencyStats]:
+	if iterations < 1:
+		raise ValueError("Iterations must be at least 1")
+	threads = torch.get_num_threads()
+	stats: list[LatencyStats] = []
+	try:
+		for thread_count in thread_counts:
+			torch.set_num_threads(thread_count)
+			for batch_size in batch_sizes:
+				inputs = [torch.randn(batch_size, *shape) for shape in input_shapes]
+				stats.append(summarize_latency(measure_latency(module, inputs, iterations, warmup), batch_size, thread_count, fence))
+	finally:
+		torch.set_num_threads(threads)
+	return stats
+
+class LatencyBenchmark(Cost):
+	def __init__(self,
+			batch_sizes: tuple[int, ...] = (1, 8, 32),
+			thread_counts: tuple[int, ...] = (1,),
+			iterations: int = 32,
+			warmup: int = 8,
+			fence: float = 3,
+			cost_batch_size: int | None = None,
+			cost_threads: int | None = None,
+			formatter: TorchComponentFormatter = DefaultComponentFormatter(),
+		) -> None:
+		if len(batch_sizes) == 0 or len(thread_counts) == 0:
+			raise ValueError("No batch sizes or thread counts")
+		self._batch_sizes = batch_sizes
+		self._thread_counts = thread_counts
+		self._iterations = iterations
+		self._warmup = warmup
+		self._fence = fence
+		#the cost is taken at the first batch size and thread count unless given
+		self._cost_batch_size = cost_batch_size if cost_batch_size is not None else batch_sizes[0]
+		self._cost_threads = cost_threads if cost_threads is not None else thread_counts[0]
+		if self._cost_batch_size not in batch_sizes or self._cost_threads not in thread_counts:
+			raise ValueError("Cost batch size and thread count must be measured")
+		self._formatter = formatter
+		self._cache: dict[str, list[LatencyStats]] = {}
+	def measure(self, ir: list[IRNode]) -> list[LatencyStats]:
+		structural_hash = get_structural_hash(ir)
+		if (stats := self._cache.get(structural_hash)) is None:
+			module = prepare_for_inference(create_module("Model", ir, self._formatter), ir)
+			input_shapes = [tuple(node.input_shape) for node in ir if len(node.parent_ids) == 0]
+			stats = benchmark_module(module, input_shapes, self._batch_sizes, self._thread_counts, self._iterations, self._warmup, self._fence)
+			self._cache[structural_hash] = stats
+		return stats
+	def get_stats(self, ir: list[IRNode], batch_size: int, threads: int) -> LatencyStats:
+		for stats in self.measure(ir):
+			if stats.batch_size == batch_size and stats.threads == threads:
+				return stats
+		raise ValueError("Batch size and thread count not measured")
+	def get_cost(self, ir: list[IRNode]) -> float:
+		return self.get_stats(ir, self._cost_batch_size, self._cost_threads).p50
+	def __len__(self) -> int:
+		return len(self._cache)
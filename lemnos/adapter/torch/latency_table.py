@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from ...schema import IRNode
+from ...schema.components import Component, Conv, BatchNorm, Dropout, ChannelDropout, Sum, Concat
+from ...control import Cost, spearman_correlation
+from ...templates.torch import import_torch_
+from ...templates.python import concat_lines_
+from .formatter import DefaultComponentFormatter, TorchComponentFormatter, ShapeView
+from .benchmark import measure_latency
+from .latency import LatencyBenchmark, summarize_latency
+
+import os
+import json
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+
+from dataclasses import dataclass
+
+# A latency model of an ir, the sum of microbenchmarks of each of its components, which is cheap enough to rank candidates as they compile.
+#
+# A component is keyed by the module the formatter builds for it (its init source, which holds the kernel, stride, groups and channels),
+#	and the shape of its input, so every conv, mixed conv, linear, norm and activation of the same configuration shares one measurement.
+#	Merges of several inputs are keyed by the merge and the count of inputs.
+# The components are measured as the latency benchmark runs whole modules, in eval mode at one batch size and thread count,
+#	and the norms the benchmark folds into a conv, and dropouts, are taken as free.
+# The generated forward (its views and the python between the calls) is not measured, so the table tends to underestimate small models,
+#	compare reports the error against measured latencies, and ranking is what a search needs, which the rank correlation shows.
+#
+# The table is stored as json, with the batch size and thread count it was measured at, and written to a temporary name then renamed into place.
+
+@dataclass(frozen=True)
+class PredictionError:
+	predicted: tuple[float, ...]
+	measured: tuple[float, ...]
+	#mean absolute error relative to the measured latencies
+	relative_error: float
+	rank_correlation: float
+
+class LatencyTable(Cost):
+	def __init__(self,
+			path: str | None = None,
+			batch_size: int = 1,
+			threads: int = 1,
+			iterations: int = 32,
+			warmup: int = 8,
+			formatter: TorchComponentFormatter = DefaultComponentFormatter(),
+		) -> None:
+		self._path = path
+		self._batch_size = batch_size
+		self._threads = threads
+		self._iterations = iterations
+		self._warmup = warmup
+		self._formatter = formatter
+		self._entries: dict[str, float] = {}
+		self._namespace: dict | None = None
+		if path is not None and os.path.exists(path):
+			with open(path) as file:
+				table = json.load(file)
+			if table["batch_size"] != batch_size or table["threads"] != threads:
+				raise ValueError(f"Table at '{path}' was measured at batch size {table['batch_size']} with {table['threads']} threads")
+			self._entries = table["entries"]
+	def predict(self, ir: list[IRNode]) -> float:
+		#microseconds, components not yet in the table are measured
+		return sum(self._get_latency(key, factory) for node in ir for key, factory in self._get_operations(node))
+	def get_cost(self, ir: list[IRNode]) -> float:
+		return self.predict(ir)
+	def compare(self, irs: list[list[IRNode]], benchmark: LatencyBenchmark | None = None) -> PredictionError:
+		#measured by a latency benchmark at the batch size and thread count of the table
+		if benchmark is None:
+			benchmark = LatencyBenchmark((self._batch_size,), (self._threads,), self._iterations, self._warmup, formatter=self._formatter)
+		predicted = tuple(self.predict(ir) for ir in irs)
+		measured = tuple(benchmark.get_stats(ir, self._batch_size, self._threads).p50 * 1000 for ir in irs)
+		relative_error = sum(abs(p - m) / m for p, m in zip(predicted, measured)) / len(irs) if len(irs) > 0 else 0
+		return PredictionError(predicted, measured, relative_error, spearman_correlation(list(predicted), list(measured)) if len(irs) > 1 else 0)
+	def save(self, path: str | None = None) -> None:
+		if (path := path if path is not None else self._path) is None:
+			raise ValueError("No path to save to")
+		temporary = f"{path}.{os.getpid()}.tmp"
+		with open(temporary, "w") as file:
+			json.dump({"batch_size": self._batch_size, "threads": self._threads, "entries": self._entries}, file)
+		os.replace(temporary, path)
+	def __len__(self) -> int:
+		return len(self._entries)
+	def _get_operations(self, node: IRNode) -> list[tuple[str, tuple]]:
+		#the key of each component of the node, and how to build it: an init source (or merge) and the input shapes
+		schema_node = node.schema_node
+		folded = schema_node.get_activation() is None and isinstance(schema_node.get_transform(), Conv) and isinstance(schema_node.get_regularization(), BatchNorm)
+		shape = node.input_shape
+		operations: list[tuple[str, tuple]] = []
+		for component in schema_node.get_components():
+			if isinstance(component, (Sum, Concat)):
+				if len(node.parent_ids) > 1:
+					operations.append((f"{type(component).__name__}({len(node.parent_ids)}) {tuple(shape)}", (component, len(node.parent_ids), tuple(shape))))
+				continue
+			output_shape = node.output_shape if component is schema_node.get_transform() else shape
+			if not (isinstance(component, (Dropout, ChannelDropout)) or (folded and isinstance(component, BatchNorm))):
+				init = self._formatter.get_init(component, shape, output_shape)
+				view = tuple(shape) if self._formatter.get_shape_requirment(component) != ShapeView.FLAT else (shape.get_product(),)
+				if init != "":
+					operations.append((f"{init} {view}", (component, init, view)))
+			shape = output_shape
+		return operations
+	def _get_latency(self, key: str, factory: tuple) -> float:
+		if (latency := self._entries.get(key)) is None:
+			latency = self._measure(factory)
+			self._entries[key] = latency
+		return latency
+	def _measure(self, factory: tuple) -> float:
+		component: Component = factory[0]
+		if isinstance(component, (Sum, Concat)):
+			_, count, shape = factory
+			inputs = [torch.randn(self._batch_size, *shape) for _ in range(count)]
+			module: Module = _Merge(isinstance(component, Sum))
+		else:
+			_, init, view = factory
+			if self._namespace is None:
+				#the formatter's own classes, such as the mixed convs, are defined once to build its inits from
+				self._namespace = {}
+				exec(concat_lines_(import_torch_(), *self._formatter.get_class_definitions()), self._namespace)
+			module = eval(init, self._namespace)
+			inputs = [torch.randn(self._batch_size, *view)]
+		module.eval()
+		threads = torch.get_num_threads()
+		try:
+			torch.set_num_threads(self._threads)
+			times = measure_latency(module, inputs, self._iterations, self._warmup)
+		finally:
+			torch.set_num_threads(threads)
+		return summarize_latency(times, self._batch_size, self._threads).p50 * 1000
+
+class _Merge(Module):
+	def __init__(self, sum: bool) -> None:
+		super().__init__()
+		self._sum = sum
+	def forward(self, *inputs: Tensor) -> Tensor:
+		if self._sum:
+			output = inputs[0]
+			for input in inputs[1:]:
+				output = output + input
+			return output
+		return torch.cat(inputs, dim=1)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from ...shared import ID
+from ...schema import IRNode
+
+# Memory planning works on the per sample size of the tensors (output_shape.get_product()),
+# the batch dimension scales every tensor equally so it does not change the ordering.
+#
+# The ready nodes (all parents computed) are grouped into chains, a chain follows a node to its only child while that child has no other parent.
+# Chains are then scheduled greedily in the manner of Sethi-Ullman, the chain that frees the most memory relative to its own peak is run first,
+# as the memory it leaves behind is the least that will be held while the other branches are computed.
+# Ties are broken by the original IR order, so an already optimal order is left untouched.
+
+def plan_execution_order(ir: list[IRNode]) -> list[IRNode]:
+	consumers = _get_consumer_counts(ir)
+	sizes: dict[ID, int] = {node.id: node.output_shape.get_product() for node in ir}
+	pending_parents: dict[ID, int] = {node.id: len(node.parent_ids) for node in ir}
+	children: dict[ID, list[int]] = {}
+	for position, node in enumerate(ir):
+		for parent_id in node.parent_ids:
+			children.setdefault(parent_id, []).append(position)
+	order: list[IRNode] = []
+	ready: set[int] = {position for position, node in enumerate(ir) if len(node.parent_ids) == 0}
+	while len(ready) > 0:
+		if len(inputs := [position for position in ready if len(ir[position].parent_ids) == 0]) > 0:
+			chain = [min(inputs)]
+		else:
+			chains = [_get_chain(position, ir, children) for position in ready]
+			chain = min(chains, key=lambda chain: (_get_chain_score(chain, ir, sizes, consumers), chain[0]))
+		for position in chain:
+			ready.discard(position)
+			node = ir[position]
+			order.append(node)
+			for parent_id in node.parent_ids:
+				consumers[parent_id] -= 1
+			for child_position in children.get(node.id, []):
+				pending_parents[ir[child_position].id] -= 1
+				if pending_parents[ir[child_position].id] == 0:
+					ready.add(child_position)
+	if len(order) != len(ir):
+		raise ValueError("IR contains a cycle or references missing parents")
+	return order
+
+def get_peak_live_size(ir: list[IRNode]) -> int:
+	consumers = _get_consumer_counts(ir)
+	sizes: dict[ID, int] = {node.id: node.output_shape.get_product() for node in ir}
+	live = sum(node.input_shape.get_product() for node in ir if len(node.parent_ids) == 0)
+	peak = live
+	for node in ir:
+		live += sizes[node.id]
+		peak = max(peak, live)
+		if len(node.parent_ids) == 0:
+			live -= node.input_shape.get_product()
+		for parent_id in node.parent_ids:
+			consumers[parent_id] -= 1
+			if consumers[parent_id] == 0:
+				live -= sizes[parent_id]
+	return peak
+
+def _get_consumer_counts(ir: list[IRNode]) -> dict[ID, int]:
+	counts: dict[ID, int] = {}
+	for node in ir:
+		for parent_id in node.parent_ids:
+			counts[parent_id] = counts.get(parent_id, 0) + 1
+	return counts
+
+def _get_chain(position: int, ir: list[IRNode], children: dict[ID, list[int]]) -> list[int]:
+	chain = [position]
+	while (len(next_positions := children.get(ir[chain[-1]].id, [])) == 1
+			and len(ir[next_positions[0]].parent_ids) == 1):
+		chain.append(next_positions[0])
+	return chain
+
+def _get_chain_score(chain: list[int], ir: list[IRNode], sizes: dict[ID, int], consumers: dict[ID, int]) -> tuple[int, int]:
+	live = 0
+	peak = 0
+	for position in chain:
+		node = ir[position]
+		live += sizes[node.id]
+		peak = max(peak, live)
+		for parent_id in set(node.parent_ids):
+			if parent_id in sizes and consumers[parent_id] == node.parent_ids.count(parent_id):
+				live -= sizes[parent_id]
+	return live - peak, peak
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from ...schema import IRNode
+from .formatter import DefaultComponentFormatter, TorchComponentFormatter, create_module
+
+import copy
+import math
+import time
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+
+from typing import Any, Iterator
+from enum import Enum
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# A precision policy is how the evaluator runs a model: the autocast dtype, whether the gradients are scaled,
+#	the memory format, and on cpu the thread counts, along with whether torch is held to deterministic algorithms.
+#
+# Autocast and the scaler follow the device, fp16 is scaled with the scaler of that device, bf16 has the range of fp32 and is never scaled.
+# When no precision is given, cuda runs in fp16 as it always has, and cpu runs in fp32, where fp16 is slow and bf16 only pays with hardware support.
+# Thread counts are process wide settings, they are applied when the evaluator is made, and interop threads can only be set before torch first runs in parallel.
+#
+# benchmark_policies times a few training steps of a model under each policy and compares its loss to that of fp32,
+#	so select_policy can pick the fastest policy that still trains correctly on the device at hand.
+#	The error is of the loss of the first step, as the trajectories of a deep model drift apart within a few steps at any precision,
+#	and a policy that overflows shows as a final loss that is not finite.
+#	Each policy is applied only for its own measurement, the thread count and deterministic settings are restored after it,
+#	so timings do not depend on the order of the policies. Interop threads cannot be changed once torch has run, so every policy must keep them.
+
+class Precision(Enum):
+	FP32 = "fp32"
+	BF16 = "bf16"
+	FP16 = "fp16"
+
+_DTYPES = {
+	Precision.BF16: torch.bfloat16,
+	Precision.FP16: torch.float16,
+}
+
+class PrecisionPolicy:
+	__slots__ = ["_precision", "_channels_last", "_num_threads", "_interop_threads", "_deterministic"]
+	def __init__(self,
+			precision: Precision | None = None,
+			channels_last: bool = False,
+			num_threads: int | None = None,
+			interop_threads: int | None = None,
+			deterministic: bool = False,
+		) -> None:
+		if num_threads is not None and num_threads < 1:
+			raise ValueError("Thread count must be at least 1")
+		if interop_threads is not None and interop_threads < 1:
+			raise ValueError("Interop thread count must be at least 1")
+		self._precision: Precision | None = precision
+		self._channels_last: bool = channels_last
+		self._num_threads: int | None = num_threads
+		self._interop_threads: int | None = interop_threads
+		self._deterministic: bool = deterministic
+	def get_precision(self, device_type: str) -> Precision:
+		if self._precision is not None:
+			return self._precision
+		return Precision.FP16 if device_type == "cuda" else Precision.FP32
+	def apply(self) -> None:
+		if self._num_threads is not None:
+			torch.set_num_threads(self._num_threads)
+		if self._interop_threads is not None and self._interop_threads != torch.get_num_interop_threads():
+			try:
+				torch.set_num_interop_threads(self._interop_threads)
+			except RuntimeError:
+				raise ValueError("Interop threads can only be set before torch first runs in parallel")
+		if self._deterministic:
+			torch.use_deterministic_algorithms(True)
+			torch.backends.cudnn.deterministic = True
+			torch.backends.cudnn.benchmark = False
+	def get_interop_threads(self) -> int | None:
+		return self._interop_threads
+	def autocast(self, device_type: str) -> Any:
+		precision = self.get_precision(device_type)
+		return torch.autocast(device_type=device_type, dtype=_DTYPES.get(precision, torch.float32), enabled=precision != Precision.FP32)
+	def get_scaler(self, device_type: str) -> torch.amp.GradScaler:
+		return torch.amp.GradScaler(device_type, enabled=self.get_precision(device_type) == Precision.FP16)
+	def prepare_model(self, model: Module) -> Module:
+		return model.to(memory_format=torch.channels_last) if self._channels_last else model # type: ignore
+	def prepare_input(self, input: Tensor) -> Tensor:
+		#channels last is only defined for batches of images
+		return input.contiguous(memory_format=torch.channels_last) if self._channels_last and input.dim() == 4 else input
+	def __repr__(self) -> str:
+		precision = self._precision.value if self._precision is not None else "auto"
+		return f"PrecisionPolicy({precision}{', channels last' if self._channels_last else ''}{f', {self._num_threads} threads' if self._num_threads is not None else ''})"
+
+@dataclass(frozen=True)
+class PolicyTiming:
+	policy: PrecisionPolicy
+	seconds_per_step: float
+	#the loss of the last step
+	loss: float
+	#of the first step, relative to that of fp32 from the same initialization
+	loss_error: float
+
+def benchmark_policies(
+		ir: list[IRNode],
+		batch: tuple[Tensor, Tensor],
+		criterion: Module,
+		policies: list[PrecisionPolicy],
+		device: torch.device | str = "cpu",
+		steps: int = 8,
+		warmup: int = 2,
+		learning_rate: float = .01,
+		formatter: TorchComponentFormatter = DefaultComponentFormatter(),
+	) -> list[PolicyTiming]:
+	#every policy trains a copy of the same initial model on the same batch, with plain sgd, so the losses differ by precision alone
+	if steps < 1:
+		raise ValueError("Steps must be at least 1")
+	if any((interop_threads := policy.get_interop_threads()) is not None and interop_threads != torch.get_num_interop_threads() for policy in policies):
+		raise ValueError("Interop threads cannot be changed between policies")
+	device = torch.device(device)
+	initial = create_module("Model", ir, formatter).to(device)
+	input, truth = batch[0].to(device), batch[1].to(device)
+	reference = _train(copy.deepcopy(initial), input, truth, criterion, PrecisionPolicy(Precision.FP32), device.type, 1, 0, learning_rate)[1]
+	timings: list[PolicyTiming] = []
+	for policy in policies:
+		with _applied(policy):
+			seconds, first, last = _train(copy.deepcopy(initial), input, truth, criterion, policy, device.type, steps, warmup, learning_rate)
+		timings.append(PolicyTiming(policy, seconds, last, abs(first - reference) / max(abs(reference), 1e-12)))
+	return timings
+
+def select_policy(timings: list[PolicyTiming], tolerance: float = .05) -> PrecisionPolicy:
+	correct = [timing for timing in timings if math.isfinite(timing.loss) and timing.loss_error <= tolerance]
+	if len(correct) == 0:
+		raise ValueError("No policy trained within tolerance")
+	return min(correct, key=lambda timing: timing.seconds_per_step).policy
+
+def _train(model: Module, input: Tensor, truth: Tensor, criterion: Module, policy: PrecisionPolicy, device_type: str, steps: int, warmup: int, learning_rate: float) -> tuple[float, float, float]:
+	model = policy.prepare_model(model)
+	model.train()
+	input = policy.prepare_input(input)
+	optimizer = torch.optim.SGD(model.parameters(), lr=learning_rate)
+	scaler = policy.get_scaler(device_type)
+	#the warmup steps are undone, so every policy takes its first measured step from the same initialization
+	with _restored(model, optimizer):
+		for _ in range(warmup):
+			_step(model, input, truth, criterion, policy, device_type, optimizer, scaler)
+	_synchronize(device_type)
+	start = time.perf_counter()
+	losses = [_step(model, input, truth, criterion, policy, device_type, optimizer, scaler) for _ in range(steps)]
+	_synchronize(device_type)
+	return (time.perf_counter() - start) / steps, float(losses[0]), float(losses[-1])
+
+def _step(model: Module, input: Tensor, truth: Tensor, criterion: Module, policy: PrecisionPolicy, device_type: str, optimizer: torch.optim.Optimizer, scaler: torch.amp.GradScaler) -> Tensor:
+	optimizer.zero_grad(set_to_none=True)
+	with policy.autocast(device_type):
+		loss = criterion(model(input), truth)
+	scaler.scale(loss).backward()
+	scaler.step(optimizer)
+	scaler.update()
+	return loss.detach()
+
+@contextmanager
+def _applied(policy: PrecisionPolicy) -> Iterator[None]:
+	threads = torch.get_num_threads()
+	deterministic, warn_only = torch.are_deterministic_algorithms_enabled(), torch.is_deterministic_algorithms_warn_only_enabled()
+	cudnn_deterministic, cudnn_benchmark = torch.backends.cudnn.deterministic, torch.backends.cudnn.benchmark
+	try:
+		policy.apply()
+		yield
+	finally:
+		torch.set_num_threads(threads)
+		torch.use_deterministic_algorithms(deterministic, warn_only=warn_only)
+		torch.backends.cudnn.deterministic = cudnn_deterministic
+		torch.backends.cudnn.benchmark = cudnn_benchmark
+
+@contextmanager
+def _restored(model: Module, optimizer: torch.optim.Optimizer) -> Iterator[None]:
+	model_state = copy.deepcopy(model.state_dict())
+	optimizer_state = copy.deepcopy(optimizer.state_dict())
+	yield
+	model.load_state_dict(model_state)
+	optimizer.load_state_dict(optimizer_state)
+
+def _synchronize(device_type: str) -> None:
+	if device_type == "cuda":
+		torch.cuda.synchronize()
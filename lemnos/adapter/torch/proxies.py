@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from ...schema import IRNode
+from ...control import Prescreener
+from .formatter import DefaultComponentFormatter, TorchComponentFormatter, create_module
+from .evaluator import Optimizer, SGD, CUDA, CPU
+
+import math
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+from torch.utils.data import DataLoader
+
+from enum import Enum
+from typing import Hashable
+
+# Training free proxies of how well a freshly initialized model will train, all higher is better:
+#	- grad norm: the norm of the gradients of the loss on the batches
+#	- synflow: the sum of |parameter * gradient| of a linearized (absolute parameters, all ones input) network in float64, which needs no data
+#	- naswot: the log determinant of the kernel of binary relu activation codes across the first batch, how distinctly the model sees samples
+#	- loss drop: how much the loss falls over a few optimizer steps, divided by the log of the parameter count,
+#		so the drop of a bigger model has to be larger to rank the same
+#
+# The prescreener ranks a generation by each proxy and scores a candidate by its mean rank, as the proxies are on unrelated scales.
+# The batches are taken once from the loader and reused for every candidate.
+
+class Proxy(Enum):
+	GRAD_NORM = "grad_norm"
+	SYNFLOW = "synflow"
+	NASWOT = "naswot"
+	LOSS_DROP = "loss_drop"
+
+_ACTIVATIONS = (torch.nn.ReLU, torch.nn.ReLU6)
+
+def get_grad_norm(model: Module, batches: list[tuple[Tensor, Tensor]], criterion: Module) -> float:
+	model.train()
+	model.zero_grad(set_to_none=True)
+	for input, truth in batches:
+		criterion(model(input), truth).backward()
+	return math.sqrt(sum(float(parameter.grad.double().pow(2).sum()) for parameter in model.parameters() if parameter.grad is not None))
+
+def get_synflow(model: Module, input_shape: torch.Size) -> float:
+	model.eval()
+	model.double()
+	signs: list[Tensor] = []
+	with torch.no_grad():
+		for parameter in model.parameters():
+			signs.append(torch.sign(parameter))
+			parameter.abs_()
+	model.zero_grad(set_to_none=True)
+	model(torch.ones((1, *input_shape), dtype=torch.float64, device=next(model.parameters()).device)).sum().backward()
+	score = sum(float((parameter.detach() * parameter.grad).abs().sum()) for parameter in model.parameters() if parameter.grad is not None)
+	with torch.no_grad():
+		for parameter, sign in zip(model.parameters(), signs):
+			parameter.mul_(sign)
+	model.zero_grad(set_to_none=True)
+	model.float()
+	return score
+
+def get_naswot(model: Module, input: Tensor) -> float:
+	codes: list[Tensor] = []
+	def hook(module: Module, args: tuple, output: Tensor) -> None:
+		codes.append((output.detach() > 0).flatten(1).double())
+	handles = [module.register_forward_hook(hook) for module in model.modules() if isinstance(module, _ACTIVATIONS)]
+	model.eval()
+	with torch.no_grad():
+		model(input)
+	for handle in handles:
+		handle.remove()
+	if len(codes) == 0:
+		return 0
+	code = torch.cat(codes, dim=1)
+	kernel = code @ code.T + (1 - code) @ (1 - code).T
+	return float(torch.linalg.slogdet(kernel)[1])
+
+def get_loss_drop(model: Module, batches: list[tuple[Tensor, Tensor]], criterion: Module, optimizer: Optimizer, steps: int) -> float:
+	model.train()
+	torch_optimizer = optimizer.get(model)
+	with torch.no_grad():
+		before = sum(float(criterion(model(input), truth)) for input, truth in batches)
+	for _ in range(steps):
+		for input, truth in batches:
+			torch_optimizer.zero_grad(set_to_none=True)
+			criterion(model(input), truth).backward()
+			torch_optimizer.step()
+	with torch.no_grad():
+		after = sum(float(criterion(model(input), truth)) for input, truth in batches)
+	return (before - after) / math.log(max(sum(parameter.numel() for parameter in model.parameters()), 2))
+
+class TorchProxyPrescreener(Prescreener):
+	def __init__(self,
+			train_loader: DataLoader,
+			criterion: Module,
+			keep_fraction: float = .5,
+			proxies: tuple[Proxy, ...] = (Proxy.GRAD_NORM, Proxy.LOSS_DROP),
+			batches: int = 1,
+			optimizer: Optimizer = SGD(.01, .9),
+			loss_drop_steps: int = 2,
+			formatter: TorchComponentFormatter = DefaultComponentFormatter(),
+		) -> None:
+		super().__init__(keep_fraction)
+		if len(proxies) == 0:
+			raise ValueError("No proxies")
+		if batches < 1:
+			raise ValueError("Batches must be at least 1")
+		self._device = torch.device(CUDA if torch.cuda.is_available() else CPU)
+		self._train_loader = train_loader
+		self._criterion = criterion
+		self._proxies = proxies
+		self._batch_count = batches
+		self._optimizer = optimizer
+		self._loss_drop_steps = loss_drop_steps
+		self._formatter = formatter
+		self._batches: list[tuple[Tensor, Tensor]] | None = None
+	def get_proxies(self, ir: list[IRNode]) -> dict[Proxy, float]:
+		batches = self._get_batches()
+		model = create_module("Model", ir, self._formatter).to(self._device)
+		scores: dict[Proxy, float] = {}
+		#loss drop trains the model, so it is taken last
+		for proxy in sorted(self._proxies, key=lambda proxy: proxy == Proxy.LOSS_DROP):
+			try:
+				if proxy == Proxy.GRAD_NORM:
+					scores[proxy] = get_grad_norm(model, batches, self._criterion)
+				elif proxy == Proxy.SYNFLOW:
+					scores[proxy] = get_synflow(model, batches[0][0].shape[1:])
+				elif proxy == Proxy.NASWOT:
+					scores[proxy] = get_naswot(model, batches[0][0])
+				elif proxy == Proxy.LOSS_DROP:
+					scores[proxy] = get_loss_drop(model, batches, self._criterion, self._optimizer, self._loss_drop_steps)
+			except RuntimeError:
+				#a proxy that cannot run on a model, such as a singular naswot kernel, ranks it last
+				scores[proxy] = math.nan
+		return scores
+	def score(self, irs: list[list[IRNode]]) -> list[float]:
+		return self.score_components(irs)[0]
+	def score_components(self, irs: list[list[IRNode]]) -> tuple[list[float], list[dict[Hashable, float]]]:
+		#the raw proxy scores are the components, so the stats correlate each proxy with loss as well as the mean rank
+		proxy_scores = [self.get_proxies(ir) for ir in irs]
+		ranks = [0.0] * len(irs)
+		for proxy in self._proxies:
+			order = sorted(range(len(irs)), key=lambda i: proxy_scores[i][proxy] if math.isfinite(proxy_scores[i][proxy]) else -math.inf)
+			for rank, i in enumerate(order):
+				ranks[i] += rank / len(self._proxies)
+		return ranks, [dict(scores) for scores in proxy_scores]
+	def _get_batches(self) -> list[tuple[Tensor, Tensor]]:
+		if self._batches is None:
+			self._batches = []
+			for input, truth in self._train_loader:
+				self._batches.append((input.to(self._device), truth.to(self._device)))
+				if len(self._batches) >= self._batch_count:
+					break
+		return self._batches
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import resource
+
+import torch
+
+# Peak memory of an evaluation, the peak less the baseline taken as the peak is reset, in bytes.
+#
+# On cuda it is the peak of the tensors allocated on the current device.
+# On cpu it is the peak resident set size of the process, which linux resets by writing 5 to /proc/self/clear_refs.
+#	Where that cannot be reset, the peak is the lifetime peak of the process, so an evaluation is only charged for raising it.
+
+_STATUS = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+def reset_peak_memory(device_type: str) -> int:
+	#returns the baseline
+	if device_type == "cuda":
+		torch.cuda.reset_peak_memory_stats()
+		return torch.cuda.memory_allocated()
+	try:
+		with open(_CLEAR_REFS, "w") as file:
+			file.write("5")
+		return _read_status("VmRSS")
+	except OSError:
+		return _get_lifetime_peak()
+
+def get_peak_memory(device_type: str) -> int:
+	if device_type == "cuda":
+		return torch.cuda.max_memory_allocated()
+	try:
+		return _read_status("VmHWM")
+	except OSError:
+		return _get_lifetime_peak()
+
+def _read_status(field: str) -> int:
+	with open(_STATUS) as file:
+		for line in file:
+			if line.startswith(field + ":"):
+				return int(line.split()[1]) * 1024
+	raise OSError(f"No {field} in {_STATUS}")
+
+def _get_lifetime_peak() -> int:
+	#kilobytes on linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -1 +1,6 @@
 from .control import *
+from .surrogate import Surrogate, GaussianProcessSurrogate, SurrogateProposer, get_ir_features
+from .prescreen import Prescreener, PrescreenStats, spearman_correlation
+from .cost import Cost, ParameterCost, FlopCost, CostPrescreener
+from .run_store import RunStore, RunRecord
+from .events import EventBus, Event, EventRecord, EventSink, JsonlSink, CsvSink, PrintSink, CallbackSink, GenerationStarted, CompileStarted, CompileFinished, CompileFailed, BatchMetrics, EpochEnd, SelectionResult
@@ -1,25 +1,81 @@
 from __future__ import annotations
 
-from ..schema import Schema, BreedIndices, IRNode
+from ..schema import Schema, BreedIndices, IRNode, analyze_schema
 from ..shared import LockedShape, ID
+from .surrogate import SurrogateProposer
+from .prescreen import Prescreener
+from .cost import Cost
+from .events import EventBus, GenerationStarted, CompileStarted, CompileFinished, CompileFailed, SelectionResult
+
+import math
+import time
 
 from abc import ABC as Abstract, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+	from .run_store import RunStore
 
-def or_search(schema: Schema, evaluator: Evaluator, selector: Selector, max_id: ID | int, model_pool_size: int = 1, breed_iterations: int = 1) -> ModelPool:
+def or_search(schema: Schema, evaluator: Evaluator, selector: Selector, max_id: ID | int, model_pool_size: int = 1, breed_iterations: int = 1, 
+		proposer: SurrogateProposer | None = None, prescreener: Prescreener | None = None, run_store: RunStore | None = None, events: EventBus | None = None) -> ModelPool:
+	#with a proposer, each generation compiles oversample times as many candidates, and only those it ranks best go on
+	#with a prescreener, 1 / keep fraction times as many go on to it, and only the best model pool size of them are evaluated
+	#with a run store, every compiled candidate is recorded with the pool it was bred from, and the evaluated ones with their metrics
+	#with an event bus, the generations, compiles and selections are emitted to whatever subscribed, the bus is flushed on return
+	if (analysis := analyze_schema(schema, max_id)).has_errors():
+		raise ValueError("Schema cannot compile:\n" + "\n".join(str(issue) for issue in analysis.get_errors()))
+	screened_count = math.ceil(model_pool_size / prescreener.get_keep_fraction()) if prescreener is not None else model_pool_size
 	indices = BreedIndices()
 	model_pool: ModelPool = [] 
 	i = 0
-	while i < breed_iterations: #will switch this to use a call back? allowing for an interactive cli?
-		print(f"Breeding iteration {i} (this will be taken away when better logging is implemented)")
-		for j in range(model_pool_size):
+	while i < breed_iterations:
+		compile_count = screened_count * (proposer.get_oversample() if proposer is not None else 1)
+		if events is not None and events.wants(GenerationStarted):
+			events.emit(GenerationStarted(i, compile_count))
+		candidates: list[list[IRNode]] = []
+		for j in range(compile_count):
+			if events is not None and events.wants(CompileStarted):
+				events.emit(CompileStarted(i, j))
+			start = time.perf_counter()
 			if (ir := schema.compile_ir(evaluator.get_input_shapes(), indices, max_id)) is not None:
-				training_metrics, validation_metrics = evaluator.evaluate(ir)
-				model_pool.append((ir, training_metrics, validation_metrics))
+				candidates.append(ir)
+				if events is not None and events.wants(CompileFinished):
+					events.emit(CompileFinished(i, j, len(ir), time.perf_counter() - start))
 			else:
+				if events is not None:
+					if events.wants(CompileFailed):
+						events.emit(CompileFailed(i, j))
+					events.flush()
 				raise ValueError("Failed compilation")
+		if run_store is not None:
+			for ir in candidates:
+				#breed indices do not say which members of the pool a candidate took its indices from, so the whole breeding pool is recorded
+				run_store.record(ir, generation=i, parents=[ir for ir, _, _ in model_pool])
+		if proposer is not None:
+			candidates = proposer.select(candidates, screened_count)
+		if prescreener is not None:
+			candidates = prescreener.screen(candidates, model_pool_size)
+		for ir, (training_metrics, validation_metrics) in zip(candidates, evaluator.evaluate_many(candidates)):
+			model_pool.append((ir, training_metrics, validation_metrics))
+			if run_store is not None:
+				run_store.record(ir, training_metrics, validation_metrics, i)
+			if ((proposer is not None or prescreener is not None)
+					and math.isfinite(loss := (validation_metrics if validation_metrics is not None else training_metrics).get_tail_loss())):
+				if proposer is not None:
+					proposer.observe(ir, loss)
+				if prescreener is not None:
+					prescreener.observe(ir, loss)
+		evaluated_count = len(model_pool)
 		model_pool = selector.select(model_pool, model_pool_size)
+		if events is not None and events.wants(SelectionResult):
+			losses = [(validation_metrics if validation_metrics is not None else training_metrics).get_tail_loss() for _, training_metrics, validation_metrics in model_pool if len(validation_metrics if validation_metrics is not None else training_metrics) > 0]
+			events.emit(SelectionResult(i, evaluated_count, len(model_pool), min(losses) if len(losses) > 0 else None))
 		indices = BreedIndices([ir for ir, _, _ in model_pool], .2, .2, .2) 
 		i += 1
+	if run_store is not None:
+		run_store.flush()
+	if events is not None:
+		events.flush()
 	return model_pool
 
 class Selector(Abstract):
@@ -58,17 +114,43 @@ class AvgLossWindowSelector(Selector):
 		scores.sort(key=lambda pair: pair[0])
 		return [model for _, model in scores[:model_pool_size]]
 
+class ResourcePenaltySelector(Selector):
+	#ranks by tail loss plus penalties on what training a model cost, per microsecond per training sample and per MiB of peak memory
+	#	so a penalty of .01 per MiB trades a 100 MiB larger model for .01 less loss, a model without a measurement is not charged for it
+	#	a cost, such as a measured inference latency, is charged per unit of the cost
+	def __init__(self, time_penalty: float = 0, memory_penalty: float = 0, tail_fraction: float = .1, cost: Cost | None = None, cost_penalty: float = 0) -> None:
+		self._time_penalty = time_penalty
+		self._memory_penalty = memory_penalty
+		self._tail_fraction = tail_fraction
+		self._cost = cost
+		self._cost_penalty = cost_penalty
+	def get_score(self, ir: list[IRNode], training_metrics: Metrics, validation_metrics: Metrics | None) -> float:
+		score = (validation_metrics if validation_metrics is not None else training_metrics).get_tail_loss(self._tail_fraction)
+		if self._cost is not None and self._cost_penalty != 0:
+			score += self._cost_penalty * self._cost.get_cost(ir)
+		if self._time_penalty != 0 and (throughput := training_metrics.get_throughput()) is not None:
+			score += self._time_penalty * 1e6 / throughput
+		if self._memory_penalty != 0 and (peak_memory := training_metrics.get_peak_memory()) is not None:
+			score += self._memory_penalty * peak_memory / 2**20
+		return score
+	def select(self, models: ModelPool, model_pool_size: int) -> ModelPool:
+		return sorted(models, key=lambda model: self.get_score(*model))[:model_pool_size]
+
 class Evaluator(Abstract):
 	@abstractmethod
 	def evaluate(self, ir: list[IRNode]) -> tuple[Metrics, Metrics | None]:
 		pass
+	def evaluate_many(self, irs: list[list[IRNode]]) -> list[tuple[Metrics, Metrics | None]]:
+		#evaluators that can train several models at once override this, results are in the order of the irs
+		return [self.evaluate(ir) for ir in irs]
 	@abstractmethod
 	def get_input_shapes(self) -> list[LockedShape]:
 		pass
 
 class SampleCollection:
-	__slots__ = ["sample_size", "total_loss", "max_loss", "min_loss", "correct", "time", "epoch"]
-	def __init__(self, total_loss: float, max_loss: float, min_loss: float, total_correct: float | None, time: float | None, epoch: int | None, sample_size: int = 1) -> None:
+	#time is the compute time of the samples, and wait the time spent waiting on data for them, both in seconds
+	__slots__ = ["sample_size", "total_loss", "max_loss", "min_loss", "correct", "time", "epoch", "wait"]
+	def __init__(self, total_loss: float, max_loss: float, min_loss: float, total_correct: float | None, time: float | None, epoch: int | None, sample_size: int = 1, wait: float | None = None) -> None:
 		self.sample_size: int = sample_size 
 		self.total_loss: float = total_loss
 		self.max_loss: float = max_loss
@@ -76,6 +158,7 @@ class SampleCollection:
 		self.correct: float | None = total_correct 
 		self.time: float | None = time 
 		self.epoch: int | None = epoch
+		self.wait: float | None = wait
 	def merge(self, other: SampleCollection) -> SampleCollection:
 		return SampleCollection(
 			self.total_loss + other.total_loss,
@@ -85,14 +168,16 @@ class SampleCollection:
 			self.time + other.time if self.time is not None and other.time is not None else None,
 			max(self.epoch, other.epoch) if self.epoch is not None and other.epoch is not None else None,
 			self.sample_size + other.sample_size,
+			self.wait + other.wait if self.wait is not None and other.wait is not None else None,
 		)
 	def __copy__(self) -> SampleCollection:
-		return SampleCollection(self.total_loss, self.max_loss, self.min_loss, self.correct, self.time, self.epoch, self.sample_size,)
+		return SampleCollection(self.total_loss, self.max_loss, self.min_loss, self.correct, self.time, self.epoch, self.sample_size, self.wait)
 	def __str__(self) -> str:
 		return (f"loss: {self.total_loss}, max: {self.max_loss}, min: {self.min_loss}"
 			+ (f", accuracy: {self.correct / self.sample_size}" if self.correct is not None else "")
 			+ f", sample size: {self.sample_size}"
 			+ (f", time: {self.time}" if self.time is not None else "")
+			+ (f", wait: {self.wait}" if self.wait is not None else "")
 		  	+ (f", epoch: {self.epoch}" if self.epoch is not None else ""))
 	def __repr__(self) -> str:
 		return str(self)
@@ -102,6 +187,7 @@ class Metrics:
 		self._max_resolution: int = max_resolution
 		self._target_sample_size: int = 1
 		self._samples: list[SampleCollection] = []
+		self._peak_memory: int | None = None
 	def record(self, sample: SampleCollection) -> None:
 		if len(self._samples) == 0:
 			self._samples.append(sample)
@@ -137,6 +223,39 @@ class Metrics:
 		for i in range(start_index + 1, end_index):
 			output = output.merge(self._samples[i])
 		return output
+	def get_tail_loss(self, fraction: float = .1) -> float:
+		#mean loss per sample over the last fraction of the recorded samples, at least the last collection
+		#	a model that recorded nothing (an empty loader) scores infinite, so selectors rank it last rather than stopping the search
+		if fraction <= 0 or fraction > 1:
+			raise ValueError("Invalid fraction")
+		if len(self._samples) == 0:
+			return math.inf
+		tail = self._samples[-max(1, math.ceil(len(self._samples) * fraction)):]
+		return sum(sample.total_loss for sample in tail) / sum(sample.sample_size for sample in tail)
+	def get_compute_time(self) -> float | None:
+		#None unless every collection was timed
+		if len(self._samples) == 0 or any(sample.time is None for sample in self._samples):
+			return None
+		return sum(sample.time for sample in self._samples) # type: ignore
+	def get_wait_time(self) -> float | None:
+		if len(self._samples) == 0 or any(sample.wait is None for sample in self._samples):
+			return None
+		return sum(sample.wait for sample in self._samples) # type: ignore
+	def get_throughput(self) -> float | None:
+		#samples per second, of compute and waiting on data together
+		if (compute := self.get_compute_time()) is None:
+			return None
+		seconds = compute + (self.get_wait_time() or 0)
+		return self._total_samples / seconds if seconds > 0 else None
+	def get_wait_fraction(self) -> float | None:
+		if (compute := self.get_compute_time()) is None or (wait := self.get_wait_time()) is None or compute + wait <= 0:
+			return None
+		return wait / (compute + wait)
+	def set_peak_memory(self, peak_memory: int) -> None:
+		#in bytes, above what was in use before the model was made
+		self._peak_memory = peak_memory
+	def get_peak_memory(self) -> int | None:
+		return self._peak_memory
 	def get_fractional(self, position: float) -> SampleCollection:
 		return self._samples[int(len(self._samples) * position)]
 	def format(self, resolution: int | None) -> str:
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from ..schema import IRNode, get_parameter_count, get_flops
+from .prescreen import Prescreener
+
+from abc import ABC as Abstract, abstractmethod
+
+# A cost is what an ir would take to deploy, lower is better, such as its parameters, flops, or a measured latency.
+#
+# Costs are backend agnostic here, an adapter measures them, and a selector can penalize them
+#	or a prescreener can send only the cheapest candidates on to be evaluated.
+
+class Cost(Abstract):
+	@abstractmethod
+	def get_cost(self, ir: list[IRNode]) -> float:
+		pass
+
+class ParameterCost(Cost):
+	def get_cost(self, ir: list[IRNode]) -> float:
+		return get_parameter_count(ir)
+
+class FlopCost(Cost):
+	def get_cost(self, ir: list[IRNode]) -> float:
+		return get_flops(ir)
+
+class CostPrescreener(Prescreener):
+	def __init__(self, cost: Cost, keep_fraction: float = .5) -> None:
+		super().__init__(keep_fraction)
+		self._cost: Cost = cost
+	def score(self, irs: list[list[IRNode]]) -> list[float]:
+		return [-self._cost.get_cost(ir) for ir in irs]
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import csv
+import json
+import sys
+import time
+import queue
+import threading
+
+from abc import ABC as Abstract, abstractmethod
+from dataclasses import dataclass, fields, astuple
+from typing import Callable, TextIO
+
+# An event bus carries typed events from a search and its evaluator to sinks, in place of printing.
+#
+# Emitters ask wants(event type) before building an event, which is a set lookup, so with nothing subscribed to a type the hot loop pays only that,
+#	and evaluators check once per group of models rather than per batch.
+# A subscription takes the event types it wants (all when none are given), and keeps only every sample_every-th event of each type.
+# Events are stamped with the wall time, buffered, and handed in batches to a worker thread that writes them to the sinks,
+#	so a slow sink (a file on a network share) never stalls training. flush waits until every event emitted so far is written,
+#	an error raised by a sink is raised again from the next flush or close.
+
+@dataclass(frozen=True)
+class Event:
+	pass
+
+@dataclass(frozen=True)
+class GenerationStarted(Event):
+	generation: int
+	candidates: int
+
+@dataclass(frozen=True)
+class CompileStarted(Event):
+	generation: int
+	candidate: int
+
+@dataclass(frozen=True)
+class CompileFinished(Event):
+	generation: int
+	candidate: int
+	node_count: int
+	seconds: float
+
+@dataclass(frozen=True)
+class CompileFailed(Event):
+	generation: int
+	candidate: int
+
+@dataclass(frozen=True)
+class BatchMetrics(Event):
+	#models are identified by their structural hash
+	model: str
+	epoch: int
+	step: int
+	loss: float
+	accuracy: float | None
+	samples: int
+	#seconds of compute, and of waiting on the batch
+	seconds: float | None = None
+	wait: float | None = None
+
+@dataclass(frozen=True)
+class EpochEnd(Event):
+	model: str
+	epoch: int
+	training_loss: float
+	validation_loss: float | None
+	samples: int
+	seconds: float
+
+@dataclass(frozen=True)
+class SelectionResult(Event):
+	generation: int
+	evaluated: int
+	selected: int
+	best_loss: float | None
+
+EventRecord = tuple[float, Event]
+
+class EventSink(Abstract):
+	@abstractmethod
+	def write(self, records: list[EventRecord]) -> None:
+		pass
+	def close(self) -> None:
+		pass
+
+class JsonlSink(EventSink):
+	def __init__(self, path: str) -> None:
+		self._file: TextIO = open(path, "a")
+	def write(self, records: list[EventRecord]) -> None:
+		self._file.write("".join(json.dumps({"time": stamp, "event": type(event).__name__, **event.__dict__}) + "\n" for stamp, event in records))
+		self._file.flush()
+	def close(self) -> None:
+		self._file.close()
+
+class CsvSink(EventSink):
+	#the columns differ by event type, so a csv takes one type, and is subscribed to only that type
+	def __init__(self, path: str, event_type: type[Event]) -> None:
+		self._event_type: type[Event] = event_type
+		self._file: TextIO = open(path, "a", newline="")
+		self._writer = csv.writer(self._file)
+		if self._file.tell() == 0:
+			self._writer.writerow(["time"] + [field.name for field in fields(event_type)])
+	def get_event_type(self) -> type[Event]:
+		return self._event_type
+	def write(self, records: list[EventRecord]) -> None:
+		self._writer.writerows((stamp, *astuple(event)) for stamp, event in records if type(event) is self._event_type)
+		self._file.flush()
+	def close(self) -> None:
+		self._file.close()
+
+class PrintSink(EventSink):
+	def __init__(self, file: TextIO = sys.stdout) -> None:
+		self._file: TextIO = file
+	def write(self, records: list[EventRecord]) -> None:
+		for _, event in records:
+			print(event, file=self._file)
+
+class CallbackSink(EventSink):
+	def __init__(self, callback: Callable[[Event], None]) -> None:
+		self._callback: Callable[[Event], None] = callback
+	def write(self, records: list[EventRecord]) -> None:
+		for _, event in records:
+			self._callback(event)
+
+class _Subscription:
+	__slots__ = ["sink", "event_types", "sample_every", "counts", "buffer"]
+	def __init__(self, sink: EventSink, event_types: frozenset[type[Event]] | None, sample_every: int) -> None:
+		self.sink: EventSink = sink
+		self.event_types: frozenset[type[Event]] | None = event_types
+		self.sample_every: int = sample_every
+		self.counts: dict[type[Event], int] = {}
+		self.buffer: list[EventRecord] = []
+
+class EventBus:
+	def __init__(self, buffer_size: int = 256) -> None:
+		if buffer_size < 1:
+			raise ValueError("Buffer size must be at least 1")
+		self._buffer_size: int = buffer_size
+		self._subscriptions: list[_Subscription] = []
+		self._wanted: set[type[Event]] = set()
+		self._wants_all: bool = False
+		self._queue: queue.Queue[tuple[_Subscription, list[EventRecord]] | None] = queue.Queue()
+		self._worker: threading.Thread | None = None
+		self._error: BaseException | None = None
+	def subscribe(self, sink: EventSink, event_types: tuple[type[Event], ...] | None = None, sample_every: int = 1) -> None:
+		if sample_every < 1:
+			raise ValueError("Sample every must be at least 1")
+		if isinstance(sink, CsvSink) and event_types is None:
+			event_types = (sink.get_event_type(),)
+		self._subscriptions.append(_Subscription(sink, frozenset(event_types) if event_types is not None else None, sample_every))
+		if event_types is None:
+			self._wants_all = True
+		else:
+			self._wanted.update(event_types)
+		if self._worker is None:
+			self._worker = threading.Thread(target=self._work, daemon=True)
+			self._worker.start()
+	def wants(self, event_type: type[Event]) -> bool:
+		return self._wants_all or event_type in self._wanted
+	def emit(self, event: Event) -> None:
+		stamp = time.time()
+		event_type = type(event)
+		for subscription in self._subscriptions:
+			if subscription.event_types is not None and event_type not in subscription.event_types:
+				continue
+			count = subscription.counts.get(event_type, 0)
+			subscription.counts[event_type] = count + 1
+			if count % subscription.sample_every != 0:
+				continue
+			subscription.buffer.append((stamp, event))
+			if len(subscription.buffer) >= self._buffer_size:
+				self._queue.put((subscription, subscription.buffer))
+				subscription.buffer = []
+	def flush(self) -> None:
+		for subscription in self._subscriptions:
+			if len(subscription.buffer) > 0:
+				self._queue.put((subscription, subscription.buffer))
+				subscription.buffer = []
+		self._queue.join()
+		if self._error is not None:
+			error, self._error = self._error, None
+			raise error
+	def close(self) -> None:
+		try:
+			self.flush()
+		finally:
+			if self._worker is not None:
+				self._queue.put(None)
+				self._worker.join()
+				self._worker = None
+			for subscription in self._subscriptions:
+				subscription.sink.close()
+			self._subscriptions = []
+			self._wanted = set()
+			self._wants_all = False
+	def __enter__(self) -> EventBus:
+		return self
+	def __exit__(self, *args) -> None:
+		self.close()
+	def _work(self) -> None:
+		while (item := self._queue.get()) is not None:
+			subscription, records = item
+			try:
+				subscription.sink.write(records)
+			except BaseException as error:
+				self._error = error
+			finally:
+				self._queue.task_done()
+		self._queue.task_done()
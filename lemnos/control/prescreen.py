@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from ..schema import IRNode
+
+import math
+import time
+
+from abc import ABC as Abstract, abstractmethod
+from typing import Hashable
+
+# A prescreener scores candidates cheaply before they are evaluated, higher is better,
+#	and only the best keep_fraction of a generation goes on to be evaluated.
+#
+# The stats record every score and the time spent scoring, and the loss of the candidates that were then evaluated,
+#	so the rank correlation between scores and losses shows how far the scores can be trusted.
+#	The correlation only covers the kept candidates, so it understates a good prescreener as the keep fraction shrinks.
+# A score made from several raw scores (the proxies of the torch prescreener) records them as its components,
+#	and the correlation of each component with loss is taken the same way as that of the score.
+
+class PrescreenStats:
+	__slots__ = ["_scores", "_components", "_losses", "_seconds"]
+	def __init__(self) -> None:
+		self._scores: list[float] = []
+		self._components: list[dict[Hashable, float]] = []
+		self._losses: list[float | None] = []
+		self._seconds: float = 0
+	def record(self, scores: list[float], seconds: float, components: list[dict[Hashable, float]] | None = None) -> list[int]:
+		#returns the positions of the scores, to attach losses to
+		self._seconds += seconds
+		start = len(self._scores)
+		self._scores += scores
+		self._components += components if components is not None else [{} for _ in scores]
+		self._losses += [None] * len(scores)
+		return list(range(start, len(self._scores)))
+	def record_loss(self, position: int, loss: float) -> None:
+		self._losses[position] = loss
+	def get_total_time(self) -> float:
+		return self._seconds
+	def get_time_per_candidate(self) -> float:
+		return self._seconds / len(self._scores) if len(self._scores) > 0 else 0
+	def get_correlation(self, component: Hashable | None = None) -> float | None:
+		#spearman correlation between score (or one component of it) and negated loss, so a prescreener that ranks well is positive
+		scores = self._scores if component is None else [components.get(component, math.nan) for components in self._components]
+		pairs = [(score, -loss) for score, loss in zip(scores, self._losses) if loss is not None and math.isfinite(loss) and math.isfinite(score)]
+		if len(pairs) < 2:
+			return None
+		return spearman_correlation([score for score, _ in pairs], [loss for _, loss in pairs])
+	def get_correlations(self) -> dict[Hashable, float | None]:
+		#the correlation of each component recorded
+		return {component: self.get_correlation(component) for component in dict.fromkeys(component for components in self._components for component in components)}
+	def __len__(self) -> int:
+		return len(self._scores)
+
+class Prescreener(Abstract):
+	def __init__(self, keep_fraction: float) -> None:
+		if keep_fraction <= 0 or keep_fraction > 1:
+			raise ValueError("Invalid keep fraction")
+		self._keep_fraction: float = keep_fraction
+		self._stats: PrescreenStats = PrescreenStats()
+		self._pending: dict[int, tuple[list[IRNode], int]] = {}
+	@abstractmethod
+	def score(self, irs: list[list[IRNode]]) -> list[float]:
+		pass
+	def score_components(self, irs: list[list[IRNode]]) -> tuple[list[float], list[dict[Hashable, float]]]:
+		#the scores, and the raw scores each was made from, for the stats to correlate separately
+		return self.score(irs), [{} for _ in irs]
+	def get_keep_fraction(self) -> float:
+		return self._keep_fraction
+	def get_stats(self) -> PrescreenStats:
+		return self._stats
+	def screen(self, candidates: list[list[IRNode]], count: int) -> list[list[IRNode]]:
+		start = time.perf_counter()
+		scores, components = self.score_components(candidates)
+		positions = self._stats.record(scores, time.perf_counter() - start, components)
+		#nan scores (a proxy that blew up) are ranked last
+		order = sorted(range(len(candidates)), key=lambda i: -scores[i] if math.isfinite(scores[i]) else math.inf)[:count]
+		#the ir is held so its id cannot be reused before its loss is observed
+		self._pending = {id(candidates[i]): (candidates[i], positions[i]) for i in order}
+		return [candidates[i] for i in order]
+	def observe(self, ir: list[IRNode], loss: float) -> None:
+		if (pending := self._pending.pop(id(ir), None)) is not None and pending[0] is ir:
+			self._stats.record_loss(pending[1], loss)
+
+def spearman_correlation(a: list[float], b: list[float]) -> float:
+	rank_a, rank_b = _rank(a), _rank(b)
+	mean_a, mean_b = sum(rank_a) / len(rank_a), sum(rank_b) / len(rank_b)
+	covariance = sum((x - mean_a) * (y - mean_b) for x, y in zip(rank_a, rank_b))
+	deviation = math.sqrt(sum((x - mean_a) ** 2 for x in rank_a) * sum((y - mean_b) ** 2 for y in rank_b))
+	return covariance / deviation if deviation > 0 else 0
+
+def _rank(values: list[float]) -> list[float]:
+	#ties are given the mean of their ranks
+	order = sorted(range(len(values)), key=lambda i: values[i])
+	ranks = [0.0] * len(values)
+	i = 0
+	while i < len(order):
+		j = i
+		while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+			j += 1
+		for k in range(i, j + 1):
+			ranks[order[k]] = (i + j) / 2
+		i = j + 1
+	return ranks
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from ..schema import IRNode, get_parameter_count, get_flops, get_depth, get_structural_hash
+from ..shared import LockedShape
+from .control import Metrics
+
+import json
+import sqlite3
+
+from dataclasses import dataclass
+
+# An sqlite store of every ir a search compiles, evaluated or not, so a search can be analysed and resumed without holding it in memory.
+#
+# Rows are keyed by the structural hash of the ir, an ir compiled again keeps its first row and only gains parents and metrics.
+# Parents are whatever the caller records. or_search records the breeding pool a candidate was bred from,
+#	its indices can be drawn from any member of the pool, so these are the possible parents, not the ones it took indices from.
+# Writes are buffered and inserted in one transaction per batch, queries flush first, so reads through the store always see every record.
+# The compilation indices (in id order) and input shapes are stored with each row, so the ir can be compiled again from the same schema.
+
+_SCHEMA = """
+create table if not exists models (
+	hash text primary key,
+	generation integer,
+	parameters integer not null,
+	flops integer not null,
+	depth integer not null,
+	node_count integer not null,
+	training_loss real,
+	validation_loss real,
+	training_samples integer,
+	input_shapes text not null,
+	indices text not null
+);
+create table if not exists parents (
+	child text not null,
+	parent text not null,
+	primary key (child, parent)
+);
+create index if not exists models_parameters on models (parameters);
+create index if not exists models_validation_loss on models (validation_loss);
+create index if not exists models_training_loss on models (training_loss);
+create index if not exists models_generation on models (generation);
+create index if not exists parents_parent on parents (parent);
+"""
+
+@dataclass(frozen=True)
+class RunRecord:
+	hash: str
+	generation: int | None
+	parameters: int
+	flops: int
+	depth: int
+	node_count: int
+	training_loss: float | None
+	validation_loss: float | None
+	training_samples: int | None
+	input_shapes: tuple[LockedShape, ...]
+	indices: tuple[int, ...]
+	def get_loss(self) -> float | None:
+		return self.validation_loss if self.validation_loss is not None else self.training_loss
+
+class RunStore:
+	def __init__(self, path: str = ":memory:", batch_size: int = 256, tail_fraction: float = .1) -> None:
+		if batch_size < 1:
+			raise ValueError("Batch size must be at least 1")
+		self._connection: sqlite3.Connection = sqlite3.connect(path)
+		self._connection.executescript(_SCHEMA)
+		self._batch_size: int = batch_size
+		self._tail_fraction: float = tail_fraction
+		self._models: list[tuple] = []
+		self._parents: list[tuple[str, str]] = []
+	def record(self, ir: list[IRNode], training_metrics: Metrics | None = None, validation_metrics: Metrics | None = None,
+			generation: int | None = None, parents: list[list[IRNode]] = []) -> str:
+		structural_hash = get_structural_hash(ir)
+		self._models.append((
+			structural_hash,
+			generation,
+			get_parameter_count(ir),
+			get_flops(ir),
+			get_depth(ir),
+			len(ir),
+			training_metrics.get_tail_loss(self._tail_fraction) if training_metrics is not None and len(training_metrics) > 0 else None,
+			validation_metrics.get_tail_loss(self._tail_fraction) if validation_metrics is not None and len(validation_metrics) > 0 else None,
+			training_metrics.get_total_samples() if training_metrics is not None else None,
+			json.dumps([list(node.input_shape) for node in ir if len(node.parent_ids) == 0]),
+			json.dumps([node.index.get() for node in sorted(ir, key=lambda node: node.id)])))
+		self._parents += [(structural_hash, get_structural_hash(parent)) for parent in parents]
+		if len(self._models) >= self._batch_size:
+			self.flush()
+		return structural_hash
+	def flush(self) -> None:
+		if len(self._models) == 0 and len(self._parents) == 0:
+			return
+		with self._connection:
+			#a model evaluated after it was first recorded fills in the metrics it was missing
+			self._connection.executemany("""insert into models values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+				on conflict (hash) do update set
+					generation = coalesce(models.generation, excluded.generation),
+					training_loss = coalesce(excluded.training_loss, models.training_loss),
+					validation_loss = coalesce(excluded.validation_loss, models.validation_loss),
+					training_samples = coalesce(excluded.training_samples, models.training_samples)""", self._models)
+			self._connection.executemany("insert or ignore into parents values (?, ?)", self._parents)
+		self._models = []
+		self._parents = []
+	def get(self, structural_hash: str) -> RunRecord | None:
+		records = self._query("select * from models where hash = ?", (structural_hash,))
+		return records[0] if len(records) > 0 else None
+	def get_best(self, limit: int = 1, max_parameters: int | None = None, max_flops: int | None = None) -> list[RunRecord]:
+		#best by validation loss where there is one, otherwise training loss
+		return self._query("""select * from models
+			where coalesce(validation_loss, training_loss) is not null and (? is null or parameters <= ?) and (? is null or flops <= ?)
+			order by coalesce(validation_loss, training_loss) limit ?""", (max_parameters, max_parameters, max_flops, max_flops, limit))
+	def get_children(self, structural_hash: str) -> list[RunRecord]:
+		return self._query("select models.* from parents join models on models.hash = parents.child where parents.parent = ?", (structural_hash,))
+	def get_parents(self, structural_hash: str) -> list[RunRecord]:
+		return self._query("select models.* from parents join models on models.hash = parents.parent where parents.child = ?", (structural_hash,))
+	def get_generation(self, generation: int) -> list[RunRecord]:
+		return self._query("select * from models where generation = ?", (generation,))
+	def query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+		#for anything the helpers do not cover, the tables are models and parents
+		self.flush()
+		return self._connection.execute(sql, parameters).fetchall()
+	def __len__(self) -> int:
+		return self.query("select count(*) from models")[0][0]
+	def close(self) -> None:
+		self.flush()
+		self._connection.close()
+	def __enter__(self) -> RunStore:
+		return self
+	def __exit__(self, *args) -> None:
+		self.close()
+	def _query(self, sql: str, parameters: tuple) -> list[RunRecord]:
+		return [RunRecord(*row[:9], tuple(LockedShape(*shape) for shape in json.loads(row[9])), tuple(json.loads(row[10]))) for row in self.query(sql, parameters)]
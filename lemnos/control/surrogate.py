@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from ..schema import Schema, IRNode, get_parameter_count, get_flops, get_depth
+
+import math
+
+from abc import ABC as Abstract, abstractmethod
+
+import numpy as np
+from numpy.typing import NDArray
+
+# A surrogate predicts the loss of an ir from its features, so a generation can be oversampled and only the most promising candidates evaluated.
+#
+# Features are the count of nodes of each schema node, log params, log flops, depth, node count, and log channel and spatial size statistics.
+# The gaussian process works on standardized features and losses with an rbf kernel, it is refit from scratch on every observation set,
+#	which is cheap for the few hundred models a search evaluates, and keeps only the most recent max_observations.
+# Candidates are ranked by a lower confidence bound, mean - exploration * std, so candidates unlike anything evaluated still get picked.
+
+def get_ir_features(schema: Schema, ir: list[IRNode]) -> NDArray[np.float64]:
+	schema.freeze()
+	counts = np.zeros(len(schema.get_nodes()), dtype=np.float64)
+	for node in ir:
+		if (schema_id := node.schema_node.get_schema_id()) is not None and schema_id < len(counts):
+			counts[schema_id] += 1
+	channels = np.log2([node.output_shape[0] for node in ir]) if len(ir) > 0 else np.zeros(1)
+	spatial = np.log2([max(node.output_shape.get_product() // node.output_shape[0], 1) for node in ir]) if len(ir) > 0 else np.zeros(1)
+	return np.concatenate([counts, np.array([
+		math.log1p(get_parameter_count(ir)),
+		math.log1p(get_flops(ir)),
+		get_depth(ir),
+		len(ir),
+		channels.mean(),
+		channels.max(),
+		spatial.mean(),
+		spatial.max()])])
+
+class Surrogate(Abstract):
+	@abstractmethod
+	def fit(self, features: NDArray[np.float64], losses: NDArray[np.float64]) -> None:
+		pass
+	@abstractmethod
+	def predict(self, features: NDArray[np.float64]) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+		#mean and standard deviation of the predicted losses
+		pass
+
+class GaussianProcessSurrogate(Surrogate):
+	__slots__ = ["_length_scale", "_noise", "_features", "_feature_mean", "_feature_std", "_loss_mean", "_loss_std", "_cholesky", "_alpha"]
+	def __init__(self, length_scale: float | None = None, noise: float = 1e-2) -> None:
+		#the length scale is in standardized feature units, by default the square root of the feature count
+		if noise <= 0:
+			raise ValueError("Noise must be positive")
+		self._length_scale: float | None = length_scale
+		self._noise: float = noise
+		self._features: NDArray[np.float64] | None = None
+		self._feature_mean: NDArray[np.float64] = np.zeros(0)
+		self._feature_std: NDArray[np.float64] = np.ones(0)
+		self._loss_mean: float = 0
+		self._loss_std: float = 1
+		self._cholesky: NDArray[np.float64] = np.zeros((0, 0))
+		self._alpha: NDArray[np.float64] = np.zeros(0)
+	def fit(self, features: NDArray[np.float64], losses: NDArray[np.float64]) -> None:
+		if len(features) != len(losses) or len(features) == 0:
+			raise ValueError("Features and losses must be non empty and of the same length")
+		self._feature_mean = features.mean(axis=0)
+		self._feature_std = np.where((std := features.std(axis=0)) > 0, std, 1)
+		self._loss_mean = float(losses.mean())
+		self._loss_std = float(losses.std()) if losses.std() > 0 else 1
+		self._features = (features - self._feature_mean) / self._feature_std
+		self._cholesky = np.linalg.cholesky(self._kernel(self._features, self._features) + self._noise * np.eye(len(features)))
+		self._alpha = np.linalg.solve(self._cholesky.T, np.linalg.solve(self._cholesky, (losses - self._loss_mean) / self._loss_std))
+	def predict(self, features: NDArray[np.float64]) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+		if self._features is None:
+			raise ValueError("Surrogate has not been fit")
+		cross = self._kernel((features - self._feature_mean) / self._feature_std, self._features)
+		mean = cross @ self._alpha
+		variance = np.clip(1 - (np.linalg.solve(self._cholesky, cross.T) ** 2).sum(axis=0), 0, None)
+		return mean * self._loss_std + self._loss_mean, np.sqrt(variance) * self._loss_std
+	def _kernel(self, a: NDArray[np.float64], b: NDArray[np.float64]) -> NDArray[np.float64]:
+		length_scale = self._length_scale if self._length_scale is not None else math.sqrt(max(a.shape[1], 1))
+		distances = (a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2 * a @ b.T
+		return np.exp(-np.clip(distances, 0, None) / (2 * length_scale ** 2))
+
+class SurrogateProposer:
+	__slots__ = ["_schema", "_surrogate", "_oversample", "_exploration", "_min_observations", "_max_observations", "_features", "_losses", "_fitted"]
+	def __init__(self, schema: Schema, surrogate: Surrogate | None = None, oversample: int = 4, exploration: float = 1, min_observations: int = 4, max_observations: int = 512) -> None:
+		if oversample < 1:
+			raise ValueError("Oversample must be at least 1")
+		self._schema: Schema = schema
+		self._surrogate: Surrogate = surrogate if surrogate is not None else GaussianProcessSurrogate()
+		self._oversample: int = oversample
+		self._exploration: float = exploration
+		self._min_observations: int = min_observations
+		self._max_observations: int = max_observations
+		self._features: list[NDArray[np.float64]] = []
+		self._losses: list[float] = []
+		self._fitted: bool = False
+	def get_oversample(self) -> int:
+		return self._oversample
+	def observe(self, ir: list[IRNode], loss: float) -> None:
+		if not math.isfinite(loss):
+			return
+		self._features.append(get_ir_features(self._schema, ir))
+		self._losses.append(loss)
+		if len(self._losses) > self._max_observations:
+			self._features.pop(0)
+			self._losses.pop(0)
+		self._fitted = False
+	def select(self, candidates: list[list[IRNode]], count: int) -> list[list[IRNode]]:
+		#until there are enough observations to fit, the candidates are taken in the order they were compiled
+		if len(self._losses) < self._min_observations or len(candidates) <= count:
+			return candidates[:count]
+		if not self._fitted:
+			self._surrogate.fit(np.stack(self._features), np.array(self._losses))
+			self._fitted = True
+		mean, std = self._surrogate.predict(np.stack([get_ir_features(self._schema, candidate) for candidate in candidates]))
+		order = np.argsort(mean - self._exploration * std, kind="stable")
+		return [candidates[i] for i in order[:count]]
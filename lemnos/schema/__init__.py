@@ -1,4 +1,8 @@
 from .schema_graph import SchemaNode, Transition, TransitionGroup, IRNode, CompilationIndex, New, Existing, Auto
 from .schema import Schema
+from .channel_solver import ChannelSolver, ChannelConstraint
+from .analysis import analyze_schema, estimate_search_space, SchemaAnalysis, SchemaIssue, IssueKind, IssueSeverity
 from .compilation_indices import *
+from .ir_properties import get_parameter_count, get_flops, get_depth, get_structural_hash
+from .genome import Genome, GenomePool, Crossover
 from .growth_functions import *
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from ..shared import ID
+from .schema import Schema
+from .schema_graph import SchemaNode, New, Existing
+from .components.transform import Conv
+
+import math
+
+from dataclasses import dataclass
+from enum import Enum
+
+# Static analysis of a schema, this only looks at the graph, the components and the bounds, nothing is compiled.
+#
+# The checks are conservative in the direction of letting schemas through,
+#	errors are only raised for what can never compile, everything that merely could fail is a warning.
+#
+# The search space size is an upper bound on the number of distinct transition group choices,
+#	it does not count the shape choices made by growth functions, and assumes every Auto creates a new node.
+#	Counts saturate at SEARCH_SPACE_LIMIT, as looping splits grow them doubly exponentially.
+
+SEARCH_SPACE_LIMIT: int = 2**128
+
+class IssueSeverity(Enum):
+	ERROR = "error"
+	WARNING = "warning"
+
+class IssueKind(Enum):
+	UNREACHABLE_END = "unreachable_end"
+	NON_TERMINATING = "non_terminating"
+	UNBOUNDED_LOOP = "unbounded_loop"
+	UNJOINABLE_EXISTING = "unjoinable_existing"
+	MISSING_MERGE_METHOD = "missing_merge_method"
+	LOOKAHEAD = "lookahead"
+
+@dataclass(frozen=True)
+class SchemaIssue:
+	kind: IssueKind
+	severity: IssueSeverity
+	nodes: tuple[SchemaNode, ...]
+	message: str
+	def __str__(self) -> str:
+		return f"{self.severity.value} ({self.kind.value}): {self.message}"
+
+@dataclass(frozen=True)
+class SchemaAnalysis:
+	issues: tuple[SchemaIssue, ...]
+	search_space_size: int | None
+	def get_errors(self) -> list[SchemaIssue]:
+		return [issue for issue in self.issues if issue.severity == IssueSeverity.ERROR]
+	def get_warnings(self) -> list[SchemaIssue]:
+		return [issue for issue in self.issues if issue.severity == IssueSeverity.WARNING]
+	def has_errors(self) -> bool:
+		return len(self.get_errors()) > 0
+	def __str__(self) -> str:
+		return "\n".join([str(issue) for issue in self.issues] + [f"search space size: {self.search_space_size if self.search_space_size is not None else 'unbounded'}"])
+
+def analyze_schema(schema: Schema, max_id: ID | int | None = None) -> SchemaAnalysis:
+	nodes = _get_reachable(schema.get_starts())
+	issues: list[SchemaIssue] = []
+	issues += _check_ends(schema, set(nodes))
+	issues += _check_merge_methods(nodes)
+	issues += _check_termination(schema, nodes)
+	issues += _check_loops(nodes)
+	issues += _check_existing(schema, nodes)
+	issues += _check_lookahead(nodes)
+	return SchemaAnalysis(tuple(issues), estimate_search_space(schema, max_id))
+
+def estimate_search_space(schema: Schema, max_id: ID | int | None = None) -> int | None:
+	nodes = _get_reachable(schema.get_starts())
+	if max_id is not None:
+		depth = int(max_id)
+	elif not any(node in _get_reachable(list({transition.get_next() for group in node for transition in group})) for node in nodes):
+		depth = len(nodes)
+	else:
+		return None
+	#counts[node][d] is the number of choices of a node given d remaining ids down the path, filled bottom up to avoid recursion on deep budgets
+	counts: dict[SchemaNode, list[int]] = {node: [1 if len(node) == 0 else 0] for node in nodes}
+	for d in range(1, depth + 1):
+		for node in nodes:
+			if len(node) == 0:
+				counts[node].append(1)
+			else:
+				counts[node].append(min(sum(math.prod(counts[transition.get_next()][d - 1] for transition in group if not isinstance(transition, Existing)) for group in node), SEARCH_SPACE_LIMIT))
+	return min(math.prod(counts[start][depth] for start in schema.get_starts()), SEARCH_SPACE_LIMIT)
+
+def _get_reachable(starts: list[SchemaNode]) -> list[SchemaNode]:
+	nodes: list[SchemaNode] = []
+	seen: set[SchemaNode] = set()
+	for node in starts:
+		if node not in seen:
+			seen.add(node)
+			nodes.append(node)
+	i = 0
+	while i < len(nodes):
+		for group in nodes[i]:
+			for transition in group:
+				if (next_node := transition.get_next()) not in seen:
+					seen.add(next_node)
+					nodes.append(next_node)
+		i += 1
+	return nodes
+
+def _check_ends(schema: Schema, nodes: set[SchemaNode]) -> list[SchemaIssue]:
+	return [SchemaIssue(IssueKind.UNREACHABLE_END, IssueSeverity.ERROR, (end,), f"end {_get_name(end)} is not reachable from any start")
+		for end in schema.get_ends() if end not in nodes]
+
+def _check_merge_methods(nodes: list[SchemaNode]) -> list[SchemaIssue]:
+	issues: list[SchemaIssue] = []
+	for node in nodes:
+		for group in node:
+			for transition in group:
+				if not isinstance(transition, New) and transition.get_next().get_merge_method() is None:
+					#an existing join always merges, an auto join only fails once a second parent joins
+					severity = IssueSeverity.ERROR if isinstance(transition, Existing) else IssueSeverity.WARNING
+					issues.append(SchemaIssue(IssueKind.MISSING_MERGE_METHOD, severity, (node, transition.get_next()),
+						f"{_get_name(node)} joins {_get_name(transition.get_next())}, which has no merge method"))
+	return issues
+
+def _check_termination(schema: Schema, nodes: list[SchemaNode]) -> list[SchemaIssue]:
+	#a node terminates if it has no groups, or has a group where every node it creates terminates
+	terminating: set[SchemaNode] = {node for node in nodes if len(node) == 0}
+	changed = True
+	while changed:
+		changed = False
+		for node in nodes:
+			if node not in terminating and any(all(transition.get_next() in terminating for transition in group if not isinstance(transition, Existing)) for group in node):
+				terminating.add(node)
+				changed = True
+	issues: list[SchemaIssue] = []
+	for node in nodes:
+		if node not in terminating:
+			severity = IssueSeverity.ERROR if node in schema.get_starts() else IssueSeverity.WARNING
+			issues.append(SchemaIssue(IssueKind.NON_TERMINATING, severity, (node,), f"{_get_name(node)} can never reach a node without transitions"))
+	return issues
+
+def _check_loops(nodes: list[SchemaNode]) -> list[SchemaIssue]:
+	#a loop is bounded if it passes through a node that always shrinks the shape, so only loops of the other nodes are looked for
+	#	nodes are in the same loop if they reach each other through non shrinking nodes
+	unbounded = [node for node in nodes if not (isinstance(transform := node.get_transform(), Conv) and transform.is_reducing(node.dimensionality()))]
+	successors: dict[SchemaNode, list[SchemaNode]] = {node: [] for node in unbounded}
+	for node in unbounded:
+		successors[node] = [next_node for next_node in {transition.get_next() for group in node for transition in group} if next_node in successors]
+	reachable_from = {node: _get_reachable_within(node, successors) for node in unbounded}
+	issues: list[SchemaIssue] = []
+	seen: set[SchemaNode] = set()
+	for node in unbounded:
+		if node in seen or not any(node in reachable_from[next_node] for next_node in successors[node]):
+			continue
+		loop = tuple(other for other in unbounded if other in reachable_from[node] and node in reachable_from[other])
+		seen.update(loop)
+		issues.append(SchemaIssue(IssueKind.UNBOUNDED_LOOP, IssueSeverity.WARNING, loop,
+			f"loop through {', '.join(_get_name(other) for other in loop)} has no shrinking transform, it is bounded only by max id"))
+	return issues
+
+def _get_reachable_within(start: SchemaNode, successors: dict[SchemaNode, list[SchemaNode]]) -> set[SchemaNode]:
+	reachable: set[SchemaNode] = {start}
+	pending = [start]
+	while len(pending) > 0:
+		for next_node in successors[pending.pop()]:
+			if next_node not in reachable:
+				reachable.add(next_node)
+				pending.append(next_node)
+	return reachable
+
+def _check_existing(schema: Schema, nodes: list[SchemaNode]) -> list[SchemaIssue]:
+	#a node can only be joined once something creates it, the starts are created by the compiler
+	created: set[SchemaNode] = set(schema.get_starts())
+	created.update(transition.get_next() for node in nodes for group in node for transition in group if not isinstance(transition, Existing))
+	issues: list[SchemaIssue] = []
+	for node in nodes:
+		for group in node:
+			for transition in group:
+				if isinstance(transition, Existing) and (target := transition.get_next()) not in created:
+					issues.append(SchemaIssue(IssueKind.UNJOINABLE_EXISTING, IssueSeverity.ERROR, (node, target),
+						f"{_get_name(node)} can never join {_get_name(target)}, nothing creates it"))
+	return issues
+
+def _check_lookahead(nodes: list[SchemaNode]) -> list[SchemaIssue]:
+	#the compiler only sees the conformance of the direct children when choosing an output shape,
+	#	so constraints behind a node without a transform (which cannot change the shape) are not seen
+	issues: list[SchemaIssue] = []
+	for node in nodes:
+		if node.get_transform() is None:
+			continue
+		for child in {transition.get_next() for group in node for transition in group}:
+			if child.get_transform() is not None:
+				continue
+			divisor, joins, depth = _get_passthrough_requirements(child, set())
+			if divisor != child.get_divisor() or joins:
+				issues.append(SchemaIssue(IssueKind.LOOKAHEAD, IssueSeverity.WARNING, (node, child),
+					f"output of {_get_name(node)} is constrained through {_get_name(child)} which has no transform, solving it needs a lookahead of {depth}"
+						+ (f", divisor {divisor} is not visible" if divisor != child.get_divisor() else "") + (", joins are not visible" if joins else "")))
+	return issues
+
+def _get_passthrough_requirements(node: SchemaNode, visited: set[SchemaNode]) -> tuple[int, bool, int]:
+	#the divisor required of the shape flowing through a chain of nodes without transforms, whether it is joined, and the lookahead needed
+	visited.add(node)
+	divisor = node.get_divisor()
+	joins = False
+	depth = 1
+	for group in node:
+		for transition in group:
+			next_node = transition.get_next()
+			joins = joins or not isinstance(transition, New)
+			if next_node.get_transform() is None and next_node not in visited:
+				next_divisor, next_joins, next_depth = _get_passthrough_requirements(next_node, visited)
+				divisor, joins, depth = math.lcm(divisor, next_divisor), joins or next_joins, max(depth, next_depth + 1)
+			else:
+				divisor, depth = math.lcm(divisor, next_node.get_divisor()), max(depth, 2)
+	return divisor, joins, depth
+
+def _get_name(node: SchemaNode) -> str:
+	return repr(node.debug_name) if node.debug_name != "" else f"<unnamed {hex(id(node))}>"
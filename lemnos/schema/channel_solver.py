@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from ..shared import LockedShape, OpenShape
+from .schema_graph import SchemaNode, TransitionGroup, Transition, Existing, Auto, Conformance, CompilationIndex, _CompilationTracker
+
+import math
+from dataclasses import dataclass
+
+# The default compiler picks the channels of a node greedily from its direct children,
+# so a constraint that sits behind a node without a transform (which passes its channels straight through) is only found once it fails.
+#
+# The solver collects the channel constraints a transition group places on the output of the node, following the nodes without a transform
+# up to a depth, and solves them jointly before the node commits to a shape:
+#	- divisors of the nodes reached, combined by lcm
+#	- channel bounds of the nodes passed through, combined by intersection
+#	- equalities from joining a Sum (or any locked conformance) that is already pending in the tracker
+# Each group choice of a passed through node is an alternative, the alternatives are searched up to max_alternatives,
+# and the feasible shape closest to the greedy choice is used, so schemas that never needed the solver compile as before.
+
+@dataclass(frozen=True)
+class ChannelConstraint:
+	divisor: int = 1
+	lower: int = 1
+	upper: int | None = None
+	equal: int | None = None
+	def join(self, other: ChannelConstraint) -> ChannelConstraint | None:
+		divisor = math.lcm(self.divisor, other.divisor)
+		lower = max(self.lower, other.lower)
+		upper = other.upper if self.upper is None else (self.upper if other.upper is None else min(self.upper, other.upper))
+		if self.equal is not None and other.equal is not None and self.equal != other.equal:
+			return None
+		equal = self.equal if self.equal is not None else other.equal
+		#the lower bound is rounded up to the first multiple, so an empty range is found here rather than by the search
+		lower = -(-lower // divisor) * divisor
+		if upper is not None and lower > upper:
+			return None
+		if equal is not None and not (equal % divisor == 0 and lower <= equal and (upper is None or equal <= upper)):
+			return None
+		return ChannelConstraint(divisor, lower, upper, equal)
+	def is_satisfied(self, channels: int) -> bool:
+		return (channels % self.divisor == 0 and channels >= self.lower and (self.upper is None or channels <= self.upper)
+			and (self.equal is None or channels == self.equal))
+
+class ChannelSolver:
+	__slots__ = ["_depth", "_max_alternatives"]
+	def __init__(self, depth: int = 3, max_alternatives: int = 32) -> None:
+		if depth < 1:
+			raise ValueError("Depth must be at least 1")
+		if max_alternatives < 1:
+			raise ValueError("Max alternatives must be at least 1")
+		self._depth: int = depth
+		self._max_alternatives: int = max_alternatives
+	def get_output_shape(self, node: SchemaNode, group: TransitionGroup, tracker: _CompilationTracker, input_shape: LockedShape, conformance: Conformance, index: CompilationIndex) -> LockedShape | None:
+		output_shape = node.get_output_shape(input_shape, conformance, index)
+		if (node.get_transform() is None or not _passes_channels(node)):
+			return output_shape
+		upper_shape = node.get_transform().get_output_upper_shape(input_shape.squash(node.dimensionality()))
+		alternatives = self._get_group_alternatives(group, node, tracker, upper_shape, ChannelConstraint(), 1)
+		if output_shape is not None and any(alternative.is_satisfied(output_shape[0]) for alternative in alternatives):
+			return output_shape
+		best: LockedShape | None = None
+		for alternative in alternatives:
+			if alternative.equal is not None:
+				if (alternative_conformance := conformance.common_shape(upper_shape.to_locked(alternative.equal))) is None:
+					continue
+			else:
+				alternative_conformance = conformance
+			alternative_conformance = alternative_conformance.common_divisor(alternative.divisor)
+			if ((solved_shape := node.get_output_shape(input_shape, alternative_conformance, index, (alternative.lower, alternative.upper))) is not None
+					and alternative.is_satisfied(solved_shape[0])
+					and (best is None or output_shape is None or abs(solved_shape[0] - output_shape[0]) < abs(best[0] - output_shape[0]))):
+				best = solved_shape
+		return best
+	def _get_group_alternatives(self, group: TransitionGroup, parent: SchemaNode, tracker: _CompilationTracker, upper_shape: OpenShape, base: ChannelConstraint, depth: int) -> list[ChannelConstraint]:
+		alternatives = [base]
+		for transition in group:
+			alternatives = [joined for alternative in alternatives for other in self._get_transition_alternatives(transition, parent, tracker, upper_shape, depth)
+				if (joined := alternative.join(other)) is not None][:self._max_alternatives]
+		return alternatives
+	def _get_transition_alternatives(self, transition: Transition, parent: SchemaNode, tracker: _CompilationTracker, upper_shape: OpenShape, depth: int) -> list[ChannelConstraint]:
+		next_node = transition.get_next()
+		if next_node.dimensionality() != len(upper_shape) + 1:
+			#the shape is squashed on the way in, so the channels are no longer the same variable
+			return [ChannelConstraint()]
+		if (isinstance(transition, Existing) or isinstance(transition, Auto)) and (pending := tracker.get_immutable(next_node).get_immutable(parent)) is not None:
+			if (conformance := next_node.get_conformance([pending.input_shape])) is None:
+				return []
+			if conformance.shape.is_locked() and len(conformance.shape) == len(upper_shape) + 1:
+				if conformance.shape.get_product() % upper_shape.get_product() != 0 or conformance.shape.to_open() != upper_shape:
+					return []
+				return [ChannelConstraint(conformance.divisor, equal=conformance.shape.get_product() // upper_shape.get_product())]
+			return [ChannelConstraint(conformance.divisor)]
+		if next_node.get_transform() is not None or not _passes_channels(next_node) or depth >= self._depth:
+			return [ChannelConstraint(next_node.get_divisor())]
+		lower, upper = next_node.get_shape_bounds().get_bounds()[0]
+		base = ChannelConstraint(next_node.get_divisor(), lower if lower is not None else 1, upper)
+		if len(next_node) == 0:
+			return [base]
+		alternatives: list[ChannelConstraint] = []
+		for group in next_node:
+			alternatives += self._get_group_alternatives(group, next_node, tracker, upper_shape, base, depth + 1)
+		return alternatives[:self._max_alternatives]
+
+def _passes_channels(node: SchemaNode) -> bool:
+	#activations that rescale the channels (GLU) would need the constraints scaled too, so they are left to the greedy compiler
+	return node.get_activation() is None or node.get_activation().get_divisor(1) == 1
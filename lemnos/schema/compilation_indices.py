@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from ..shared import LockedShape, ID 
+from ..shared import LockedShape
 from .schema_graph import SchemaNode, CompilationIndices, CompilationIndex, IRNode
 
 import random
@@ -9,9 +9,12 @@ from copy import copy
 class SequenceIndices(CompilationIndices):
 	__slots__ = ["_indices"]
 	def __init__(self, ir: list[IRNode]) -> None:
-		self._indices: dict[ID, CompilationIndex] = {node.id: node.index for node in ir} 
-	def get_index(self, id: ID, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
-		return self._indices[id] 
+		#the indices of the ir are shared, not copied, so a lookup allocates nothing
+		self._indices: dict[int, CompilationIndex] = {node.id: node.index for node in ir}
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		if (index := self._indices.get(id)) is None:
+			raise KeyError(f"No index for id {id}")
+		return index
 
 class BreedIndices(CompilationIndices):
 	__slots__ = ["_sequences", "_sequence_change_prob", "_ignore_shape_prob", "_mutate_prob", "_sequence_index", "_previous_id"]
@@ -25,9 +28,9 @@ class BreedIndices(CompilationIndices):
 		self._ignore_shape_prob: float = ignore_shape_prob
 		self._mutate_prob: float = mutate_prob
 		self._sequence_index: int = 0
-		self._previous_id: ID = ID(0)
-	def get_index(self, id: ID, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
-		def search_sequence(sequence_index: int, previous_id: ID) -> tuple[CompilationIndex, ID] | None:
+		self._previous_id: int = -1
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		def search_sequence(sequence_index: int, previous_id: int) -> tuple[CompilationIndex, int] | None:
 			sequence_index %= len(self._sequences)
 			min_diff: int = 2**32
 			result: IRNode | None = None
@@ -53,7 +56,7 @@ class BreedIndices(CompilationIndices):
 				sequence_indices: list[int] = list(range(self._sequence_index)) + list(range(self._sequence_index + 1, len(self._sequences)))
 				random.shuffle(sequence_indices)
 				for sequence in sequence_indices:
-					if (result := search_sequence(sequence, ID(0))) is not None:
+					if (result := search_sequence(sequence, -1)) is not None:
 						index, self._previous_id = result
 						return index 
 		return CompilationIndex.random() 
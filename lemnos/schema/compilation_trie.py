@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from ..shared import LockedShape
+from .schema_graph import SchemaNode, IRNode, CompilationIndex, CompilationIndices, _CompilationSnapshot
+
+from typing import Hashable
+
+# A trie over the compilation indices of the successful compilations of a schema.
+#
+# A path from a root (keyed by the input shapes and compile settings) follows the index used at each id,
+# and each trie node holds the snapshot to compile the next id from, as well as the ir node the step produced.
+# A new compilation asks its indices for each id along the trie while a child matches, and resumes from the deepest match,
+# so compilations that share a prefix of indices, as children bred from the same parents do, skip the shared prefix.
+#
+# Reusing a prefix fixes the decisions made in it to those of the compilation that recorded it,
+# a full compilation could instead backtrack into the prefix if everything after it failed, so the caller falls back to one on failure.
+#
+# The trie is bounded by its number of nodes, once over, the least recently used leaves are evicted down to three quarters of the bound.
+
+class _TrieNode:
+	__slots__ = ["snapshot", "ir_node", "children", "parent", "key", "last_used"]
+	def __init__(self, snapshot: _CompilationSnapshot, ir_node: IRNode | None, parent: _TrieNode | None, key: Hashable, last_used: int) -> None:
+		self.snapshot: _CompilationSnapshot = snapshot
+		self.ir_node: IRNode | None = ir_node
+		self.children: dict[int, _TrieNode] = {}
+		self.parent: _TrieNode | None = parent
+		self.key: Hashable = key
+		self.last_used: int = last_used
+
+class _CompilationTrie:
+	__slots__ = ["_roots", "_max_nodes", "_size", "_clock"]
+	def __init__(self, max_nodes: int) -> None:
+		self._roots: dict[Hashable, _TrieNode] = {}
+		self._max_nodes: int = max_nodes
+		self._size: int = 0
+		self._clock: int = 0
+	def is_enabled(self) -> bool:
+		return self._max_nodes > 0
+	def walk(self, root_key: Hashable, indices: CompilationIndices, max_id: int) -> tuple[list[IRNode], list[_CompilationSnapshot]]:
+		#returns the ir prefix and the snapshots of the deepest match, the last snapshot is the one to resume from
+		prefix: list[IRNode] = []
+		snapshots: list[_CompilationSnapshot] = []
+		if (trie_node := self._roots.get(root_key)) is None:
+			return prefix, snapshots
+		self._clock += 1
+		while True:
+			trie_node.last_used = self._clock
+			snapshots.append(trie_node.snapshot)
+			if len(trie_node.children) == 0 or len(prefix) + 1 >= max_id:
+				return prefix, snapshots
+			schema_node = trie_node.snapshot.schema_node
+			index = indices.get_index(len(prefix), schema_node, schema_node.get_input_shape([trie_node.snapshot.node.input_shape]))
+			if (child := trie_node.children.get(index.get())) is None:
+				return prefix, snapshots
+			trie_node = child
+			if trie_node.ir_node is not None:
+				prefix.append(trie_node.ir_node)
+	def insert(self, root_key: Hashable, ir: list[IRNode], snapshots: list[_CompilationSnapshot]) -> None:
+		if not self.is_enabled() or len(snapshots) == 0:
+			return
+		self._clock += 1
+		if (trie_node := self._roots.get(root_key)) is None:
+			trie_node = self._roots[root_key] = _TrieNode(snapshots[0], None, None, root_key, self._clock)
+			self._size += 1
+		trie_node.last_used = self._clock
+		#the last node has nothing left to resume, so it is not given a trie node
+		for ir_node, snapshot in zip(ir, snapshots[1:]):
+			if (child := trie_node.children.get(ir_node.index.get())) is None:
+				child = trie_node.children[ir_node.index.get()] = _TrieNode(snapshot, ir_node, trie_node, ir_node.index.get(), self._clock)
+				self._size += 1
+			trie_node = child
+			trie_node.last_used = self._clock
+		if self._size > self._max_nodes:
+			self._evict()
+	def _evict(self) -> None:
+		leaves: list[_TrieNode] = []
+		pending = list(self._roots.values())
+		while len(pending) > 0:
+			trie_node = pending.pop()
+			if len(trie_node.children) == 0:
+				leaves.append(trie_node)
+			else:
+				pending.extend(trie_node.children.values())
+		leaves.sort(key=lambda leaf: leaf.last_used, reverse=True)
+		target = self._max_nodes * 3 // 4
+		while self._size > target and len(leaves) > 0:
+			leaf = leaves.pop()
+			siblings = self._roots if leaf.parent is None else leaf.parent.children
+			del siblings[leaf.key] # type: ignore
+			self._size -= 1
+			if leaf.parent is not None and len(leaf.parent.children) == 0:
+				#the parent is now a leaf, it is placed by its own last use among the remaining leaves
+				position = len(leaves)
+				while position > 0 and leaves[position - 1].last_used < leaf.parent.last_used:
+					position -= 1
+				leaves.insert(position, leaf.parent)
+	def clear(self) -> None:
+		self._roots = {}
+		self._size = 0
+	def __len__(self) -> int:
+		return self._size
+
+class _MemoIndices(CompilationIndices):
+	#the indices given to a walk are handed out again on resuming or falling back, as breeding indices are random,
+	#	indices asked for outside of the walk are passed through, so backtracking still sees fresh indices
+	__slots__ = ["_indices", "_memo", "recording"]
+	def __init__(self, indices: CompilationIndices) -> None:
+		self._indices: CompilationIndices = indices
+		self._memo: dict[tuple[int, SchemaNode, LockedShape], CompilationIndex] = {}
+		self.recording: bool = True
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		if (index := self._memo.get((id, schema_node, shape_in))) is None:
+			index = self._indices.get_index(id, schema_node, shape_in)
+			if self.recording:
+				self._memo[(id, schema_node, shape_in)] = index
+		return index
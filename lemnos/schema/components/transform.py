@@ -3,6 +3,7 @@ from __future__ import annotations
 from ...shared import Shape, LockedShape, OpenShape, ShapeBound 
 
 import math
+from copy import copy
 
 from abc import ABC as Abstract, abstractmethod 
 from enum import Enum
@@ -16,6 +17,8 @@ class Transform(Abstract):
 		pass
 	def get_divisor(self) -> int:
 		return 1 
+	def get_output_upper_shape(self, input_shape: LockedShape) -> OpenShape:
+		return input_shape.to_open()
 
 class Full(Transform):
 	def __init__(self) -> None:
@@ -59,6 +62,9 @@ class Conv(Transform):
 	def output_dim_to_input_dim(self, output_shape: LockedShape, i: int) -> int:
 		i -= 1
 		return (output_shape[i + 1] - 1) * self._stride[i] + (self._kernel[i] * self._dilation[i] - (self._dilation[i] - 1)) - self._padding[i] * 2
+	def is_reducing(self, dimensionality: int) -> bool:
+		#whether every application strictly shrinks some spatial dim, which bounds any loop it sits in
+		return any(self._stride[i] > 1 or (self._kernel[i] - 1) * self._dilation[i] > self._padding[i] * 2 for i in range(dimensionality - 1))
 	def input_dim_to_output_dim(self, input_shape: LockedShape, i: int) -> int:
 		i -= 1
 		return ((input_shape[i + 1] + self._padding[i] * 2) - (self._kernel[i] * self._dilation[i] - (self._dilation[i] - 1))) // self._stride[i] + 1
@@ -74,7 +80,7 @@ class Conv(Transform):
 			groups = input_shape[0]
 		else:
 			raise NotImplementedError("group type not supported yet")
-		upper_shape = OpenShape(*(self.input_dim_to_output_dim(input_shape, i) for i in range(1, len(input_shape))))
+		upper_shape = self.get_output_upper_shape(input_shape)
 		if output_conformance.is_locked():
 			channels = output_conformance.get_product() // upper_shape.get_product()
 			if input_shape[0] % groups == 0 and channels % divisor == 0 and shape_bounds.contains_value(channels, 0):
@@ -88,6 +94,8 @@ class Conv(Transform):
 				return upper_shape.to_locked(channels)
 			else:
 				return None
+	def get_output_upper_shape(self, input_shape: LockedShape) -> OpenShape:
+		return OpenShape(*(self.input_dim_to_output_dim(input_shape, i) for i in range(1, len(input_shape))))
 	def validate_output_shape_transform(self, shape_in: LockedShape, shape_out: LockedShape) -> bool:
 		i = 1
 		while i < len(shape_out) and self.output_dim_to_input_dim(shape_out, i) == shape_in[i]:
@@ -112,6 +120,10 @@ class Conv(Transform):
 		return self._groups if isinstance(self._groups, int) else input_shape[0]
 	def get_mix_groups(self) -> bool:
 		return self._mix_groups
+	def get_unmixed(self) -> Conv:
+		unmixed = copy(self)
+		unmixed._mix_groups = False
+		return unmixed
 
 def _closest_divisible(value: int, divisor: int, shape_bound: ShapeBound) -> int | None:
 	lower, upper = _closest_divisibles(value, divisor)
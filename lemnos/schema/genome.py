@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from ..shared import LockedShape
+from .schema import Schema
+from .schema_graph import SchemaNode, CompilationIndices, CompilationIndex, IRNode
+
+import random
+from bisect import bisect_left
+from enum import Enum
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Genomes are the compilation indices of irs, aligned by schema node rather than by id,
+#	gene [n, k] of a genome is the index of the k-th node (in id order) compiled from the schema node with schema id n.
+# Aligning by schema node means a gene is given to the same kind of node in a child, even once the ids of the parents have drifted apart.
+#
+# A pool holds the genomes of its parents in one array of shape (parents, schema nodes, max occurrences),
+#	missing genes are MISSING_GENE, and crossover and mutation are done for a whole generation at once.
+# When a child's chosen parent is missing a gene, it is taken from the first of its other parents that has it,
+#	and genes missing from all parents are left for the genome to fill randomly.
+
+MISSING_GENE: int = -1
+
+class Crossover(Enum):
+	UNIFORM = "uniform"
+	#with more than two parents, parents - 1 points are used
+	ONE_POINT = "one_point"
+
+class Genome(CompilationIndices):
+	__slots__ = ["_genes", "_asked"]
+	def __init__(self, genes: NDArray[np.int64]) -> None:
+		self._genes: NDArray[np.int64] = genes
+		#the ids asked for by each schema node, the occurrence of an id is its position among them
+		#	ids of failed branches are counted too, as with breed indices, the alignment is best effort
+		self._asked: dict[SchemaNode, list[int]] = {}
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		if (asked := self._asked.get(schema_node)) is None:
+			asked = self._asked[schema_node] = []
+		occurrence = bisect_left(asked, id)
+		if occurrence == len(asked) or asked[occurrence] != id:
+			asked.insert(occurrence, id)
+		if ((schema_id := schema_node.get_schema_id()) is not None and schema_id < self._genes.shape[0] and occurrence < self._genes.shape[1]
+				and (gene := int(self._genes[schema_id, occurrence])) != MISSING_GENE):
+			return CompilationIndex(gene)
+		return CompilationIndex.random()
+	def get_genes(self) -> NDArray[np.int64]:
+		return self._genes
+
+class GenomePool:
+	__slots__ = ["_genes"]
+	def __init__(self, schema: Schema, irs: list[list[IRNode]]) -> None:
+		if len(irs) == 0:
+			raise ValueError("No irs to encode")
+		schema.freeze()
+		nodes = schema.get_nodes()
+		encoded: list[list[list[int]]] = []
+		for ir in irs:
+			genome: list[list[int]] = [[] for _ in nodes]
+			for node in sorted(ir, key=lambda node: node.id):
+				if (schema_id := node.schema_node.get_schema_id()) is None or schema_id >= len(nodes) or nodes[schema_id] is not node.schema_node:
+					raise ValueError("IR was not compiled from this schema")
+				genome[schema_id].append(node.index.get())
+			encoded.append(genome)
+		occurrences = max(1, max(len(genes) for genome in encoded for genes in genome))
+		self._genes: NDArray[np.int64] = np.full((len(irs), len(nodes), occurrences), MISSING_GENE, dtype=np.int64)
+		for i, genome in enumerate(encoded):
+			for schema_id, genes in enumerate(genome):
+				self._genes[i, schema_id, :len(genes)] = genes
+	def get_genes(self) -> NDArray[np.int64]:
+		return self._genes
+	def __len__(self) -> int:
+		return self._genes.shape[0]
+	def breed(self, count: int, crossover: Crossover = Crossover.UNIFORM, parents_per_child: int = 2, mutate_prob: float = 0,
+			parents: NDArray[np.int64] | None = None, rng: np.random.Generator | None = None) -> list[Genome]:
+		#parents is an optional (count, parents per child) array of pool positions, otherwise parents are drawn uniformly
+		#the default generator is seeded from random, so seeding random seeds breeding as it does for breed indices
+		if mutate_prob < 0 or mutate_prob > 1:
+			raise ValueError("Invalid probabilities")
+		if parents_per_child < 1:
+			raise ValueError("Parents per child must be at least 1")
+		if rng is None:
+			rng = np.random.default_rng(random.getrandbits(64))
+		if parents is None:
+			parents = rng.integers(0, len(self), (count, parents_per_child))
+		elif parents.shape != (count, parents_per_child):
+			raise ValueError("Parents do not match count and parents per child")
+		genes = mutate(cross(self._genes, parents, crossover, rng), mutate_prob, rng)
+		return [Genome(child) for child in genes]
+
+def cross(genes: NDArray[np.int64], parents: NDArray[np.int64], crossover: Crossover, rng: np.random.Generator) -> NDArray[np.int64]:
+	#genes of the pool (pool, nodes, occurrences), and the pool positions of the parents of each child (children, parents per child)
+	children, parents_per_child = parents.shape
+	parent_genes = genes[parents]
+	gene_shape = genes.shape[1:]
+	if crossover == Crossover.UNIFORM:
+		choice = rng.integers(0, parents_per_child, (children, *gene_shape))
+	elif crossover == Crossover.ONE_POINT:
+		#the genes are cut in schema node order, so a child takes whole regions of the schema from each parent
+		gene_count = int(np.prod(gene_shape))
+		points = np.sort(rng.integers(0, gene_count + 1, (children, parents_per_child - 1)), axis=1)
+		positions = np.arange(gene_count)
+		choice = (positions[None, :, None] >= points[:, None, :]).sum(axis=2).reshape(children, *gene_shape)
+	else:
+		raise ValueError(f"Unknown crossover {crossover}")
+	child_genes = np.take_along_axis(parent_genes, choice[:, None], axis=1)[:, 0]
+	present = parent_genes != MISSING_GENE
+	fallback = np.take_along_axis(parent_genes, present.argmax(axis=1)[:, None], axis=1)[:, 0]
+	return np.where(child_genes == MISSING_GENE, fallback, child_genes)
+
+def mutate(genes: NDArray[np.int64], mutate_prob: float, rng: np.random.Generator) -> NDArray[np.int64]:
+	#mutated genes are replaced with random indices, missing genes included, so a mutation can add to a child as well as change it
+	if mutate_prob <= 0:
+		return genes
+	mask = rng.random(genes.shape) < mutate_prob
+	genes = genes.copy()
+	genes[mask] = rng.integers(0, 2**31, int(mask.sum()))
+	return genes
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from ..shared import LockedShape
+from .schema_graph import SchemaNode, IRNode
+from .components import Conv, Full, BatchNorm, LayerNorm, Sum, Activation
+
+import math
+import hashlib
+
+from enum import Enum
+from typing import Any
+
+# Static costs of an ir, counted the way the torch adapter builds it,
+#	every component of a node is given the node's input and output shape.
+# Flops count a multiply accumulate as two, elementwise components (activations, norms, sums) as one per element.
+# An activation that changes the channels (a glu halves them) is given the transform's output, which is the node's output scaled back by the activation.
+
+def get_parameter_count(ir: list[IRNode]) -> int:
+	return sum(_get_node_parameter_count(node) for node in ir)
+
+def get_flops(ir: list[IRNode]) -> int:
+	return sum(_get_node_flops(node) for node in ir)
+
+def get_depth(ir: list[IRNode]) -> int:
+	#the longest path of nodes from an input, ir nodes always come after their parents
+	depths: dict[int, int] = {}
+	for node in ir:
+		depths[node.id] = 1 + max((depths[parent_id] for parent_id in node.parent_ids), default=0)
+	return max(depths.values(), default=0)
+
+def _get_transform_shape(node: IRNode) -> LockedShape:
+	activation = node.schema_node.get_activation()
+	return activation.scale_output_shape(node.output_shape) if activation is not None else node.output_shape
+
+def _get_node_parameter_count(node: IRNode) -> int:
+	count = 0
+	transform_shape = _get_transform_shape(node)
+	for component in node.schema_node.get_components():
+		if isinstance(component, Conv):
+			count += (node.input_shape[0] // component.get_groups(node.input_shape)) * transform_shape[0] * math.prod(component.get_kernel(node.input_shape)) + transform_shape[0]
+		elif isinstance(component, Full):
+			count += node.input_shape.get_product() * transform_shape.get_product() + transform_shape.get_product()
+		elif isinstance(component, BatchNorm):
+			count += 2 * node.output_shape[0]
+		elif isinstance(component, LayerNorm):
+			count += 2 * node.output_shape[-1]
+	return count
+
+def _get_node_flops(node: IRNode) -> int:
+	flops = 0
+	transform_shape = _get_transform_shape(node)
+	for component in node.schema_node.get_components():
+		if isinstance(component, Conv):
+			flops += 2 * transform_shape.get_product() * (node.input_shape[0] // component.get_groups(node.input_shape)) * math.prod(component.get_kernel(node.input_shape))
+		elif isinstance(component, Full):
+			flops += 2 * node.input_shape.get_product() * transform_shape.get_product()
+		elif isinstance(component, Sum):
+			flops += max(len(node.parent_ids) - 1, 0) * node.input_shape.get_product()
+		elif isinstance(component, Activation):
+			flops += transform_shape.get_product()
+		elif isinstance(component, BatchNorm) or isinstance(component, LayerNorm):
+			flops += node.output_shape.get_product()
+	return flops
+
+def get_structural_hash(ir: list[IRNode]) -> str:
+	#equal for irs that build the same model, the compilation indices are left out as they only decide how the ir was reached
+	#	schema nodes are identified by their schema id and name, and by their components (kernel, stride, activation and so on),
+	#	so hashes match across processes for the same schema, and nodes of different schemas that happen to share a name differ
+	digest = hashlib.sha256()
+	#an ir repeats a few schema nodes many times, so each is described once
+	descriptions: dict[SchemaNode, str] = {}
+	for node in ir:
+		schema_node = node.schema_node
+		if (description := descriptions.get(schema_node)) is None:
+			description = descriptions[schema_node] = repr((schema_node.get_schema_id(), schema_node.debug_name,
+				tuple(_describe(component) for component in (schema_node.get_merge_method(), schema_node.get_transform(), schema_node.get_activation(), schema_node.get_regularization()))))
+		digest.update(repr((description, node.id, node.parent_ids, tuple(node.input_shape), tuple(node.output_shape))).encode())
+	return digest.hexdigest()[:32]
+
+def _describe(value: Any) -> Any:
+	#the class and attributes of a component, recursively, as the default repr of an object holds its address, which differs between processes
+	if value is None or isinstance(value, (bool, int, float, str, Enum)):
+		return value
+	if isinstance(value, tuple):
+		return tuple(_describe(item) for item in value)
+	attributes: dict[str, Any] = dict(getattr(value, "__dict__", {}))
+	for cls in type(value).__mro__:
+		for name in ((slots,) if isinstance(slots := getattr(cls, "__slots__", ()), str) else slots):
+			if hasattr(value, name):
+				attributes[name] = getattr(value, name)
+	return (type(value).__name__, tuple((name, _describe(attributes[name])) for name in sorted(attributes)))
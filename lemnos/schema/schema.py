@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from typing_extensions import Self
+
 from ..shared import LockedShape, ID
-from .schema_graph import SchemaNode, IRNode, CompilationIndices, _CompilationTracker, _CompilationNode, _CompilationNodeStack
+from .channel_solver import ChannelSolver
+from .schema_graph import SchemaNode, IRNode, CompilationIndices, CompilationIndex, Transition, _CompilationTracker, _CompilationNode, _CompilationNodeStack, _CompilationSnapshot
+from .compilation_trie import _CompilationTrie, _MemoIndices
+
+from typing import Iterable
 
 class Schema:
-	def __init__(self, starts: list[SchemaNode], ends: list[SchemaNode]) -> None:
+	def __init__(self, starts: list[SchemaNode], ends: list[SchemaNode], prefix_cache_size: int = 4096) -> None:
 		if len(starts) == 0 or len(ends) == 0:
 			raise ValueError("No start or end patterns")
 		for end in ends:
@@ -12,16 +18,105 @@ class Schema:
 				raise ValueError("End patterns cannot not have transitions out")
 		self._starts: list[SchemaNode] = starts 
 		self._ends: list[SchemaNode] = ends 
-	def compile_ir(self, input_shapes: list[LockedShape], build_indices: CompilationIndices, max_id: ID | int) -> list[IRNode] | None:
-		max_id = ID(max_id)
+		#filled by freeze, node and transition ids are dense and given in breadth first order from the starts
+		self._nodes: tuple[SchemaNode, ...] = ()
+		self._transitions: tuple[Transition, ...] = ()
+		self._starts_lookup: dict[SchemaNode, int] = {}
+		#snapshots along the indices of recent successful compilations, bounded by the number of trie nodes, 0 disables it
+		self._prefixes: _CompilationTrie = _CompilationTrie(prefix_cache_size)
+	def freeze(self) -> Self:
+		#nodes are frozen again after a group is added to any of them, or another schema sharing them freezes,
+		#	the prefixes were compiled through the old graph, so they are dropped
+		if self.is_frozen():
+			return self
+		self._prefixes.clear()
+		nodes: list[SchemaNode] = []
+		node_ids: dict[SchemaNode, int] = {}
+		transitions: list[Transition] = []
+		for node in self._starts:
+			if node not in node_ids:
+				node_ids[node] = len(nodes)
+				nodes.append(node)
+		i = 0
+		while i < len(nodes):
+			for group in nodes[i]:
+				for transition in group:
+					transitions.append(transition)
+					if (next_node := transition.get_next()) not in node_ids:
+						node_ids[next_node] = len(nodes)
+						nodes.append(next_node)
+			i += 1
+		for end in self._ends:
+			if end not in node_ids:
+				raise ValueError(f"End schema node '{end.debug_name}' is not reachable from the starts")
+		for schema_id, node in enumerate(nodes):
+			node._freeze(schema_id)
+		self._starts = list(self._starts)
+		self._ends = list(self._ends)
+		self._nodes = tuple(nodes)
+		self._transitions = tuple(transitions)
+		self._starts_lookup = {node: i for i, node in enumerate(self._starts)}
+		return self
+	def get_starts(self) -> list[SchemaNode]:
+		return self._starts
+	def get_ends(self) -> list[SchemaNode]:
+		return self._ends
+	def is_frozen(self) -> bool:
+		return len(self._nodes) > 0 and all(node.get_schema_id() == schema_id for schema_id, node in enumerate(self._nodes))
+	def get_nodes(self) -> tuple[SchemaNode, ...]:
+		return self._nodes
+	def get_transitions(self) -> tuple[Transition, ...]:
+		return self._transitions
+	def compile_ir(self, input_shapes: list[LockedShape], build_indices: CompilationIndices, max_id: ID | int, lookahead: int = 1, solver: ChannelSolver | None = None) -> list[IRNode] | None:
+		#a lookahead greater than one prunes transition groups that cannot compile within that many further nodes,
+		#	at the cost of checking them before every step
+		#a channel solver chooses channels against the constraints of the nodes past the children, rather than greedily
+		#the compilation resumes from the deepest prefix of indices shared with a recent compilation, see compilation_trie,
+		#	if the resumed compilation fails, it falls back to a full compilation
+		max_id = int(ID(max_id))
+		self.freeze()
+		root_key = (tuple(input_shapes), lookahead, solver)
+		indices = _MemoIndices(build_indices)
+		prefix, path = self._prefixes.walk(root_key, indices, max_id)
+		indices.recording = False
+		if len(prefix) > 0:
+			snapshot = path[-1]
+			snapshots: list[_CompilationSnapshot] | None = [] if self._prefixes.is_enabled() else None
+			if (tail := snapshot.schema_node._compile(snapshot.node, snapshot.tracker, indices, len(prefix), max_id, lookahead, solver, snapshots)) is not None:
+				tail.reverse()
+				ir = prefix + tail
+				if snapshots is not None:
+					snapshots.reverse()
+					self._prefixes.insert(root_key, ir, path[:-1] + snapshots)
+				return ir
+		#the start lookup is shared with the tracker, which copies it the first time a stack is added
 		tracker = _CompilationTracker(
 			[_CompilationNodeStack(schema_node, [_CompilationNode(set(), [], shape, i-len(input_shapes))]) for i, (schema_node, shape) in enumerate(zip(self._starts, input_shapes))], 
-			None)
+			self._starts_lookup if len(input_shapes) == len(self._starts) else None, True)
 		schema, node = tracker.pop_min()
-		ir = schema._compile(node, tracker, build_indices, ID(0), max_id)
+		snapshots = [] if self._prefixes.is_enabled() else None
+		ir = schema._compile(node, tracker, indices, 0, max_id, lookahead, solver, snapshots)
 		if ir is not None:
 			ir.reverse()
+			if snapshots is not None:
+				snapshots.reverse()
+				self._prefixes.insert(root_key, ir, snapshots)
 			return ir 
 		return None
+	def recompile_ir(self, parent_ir: list[IRNode], changed_ids: Iterable[ID | int], build_indices: CompilationIndices, max_id: ID | int, lookahead: int = 1, solver: ChannelSolver | None = None) -> list[IRNode] | None:
+		#compiles with the parent's indices before the first changed node, so while the parent's path is held by the prefix cache,
+		#	the parent's nodes before it are reused and build indices are only asked for the changed node onwards
+		first_id = min((int(id) for id in changed_ids), default=len(parent_ir))
+		return self.compile_ir([node.input_shape for node in parent_ir if len(node.parent_ids) == 0], _PrefixIndices(parent_ir, first_id, build_indices), max_id, lookahead, solver)
 	def search(self, ) -> None:
 		pass
+
+class _PrefixIndices(CompilationIndices):
+	__slots__ = ["_prefix", "_indices"]
+	def __init__(self, ir: list[IRNode], length: int, indices: CompilationIndices) -> None:
+		self._prefix: dict[int, CompilationIndex] = {node.id: node.index for node in ir if node.id < length}
+		self._indices: CompilationIndices = indices
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		if (index := self._prefix.get(id)) is not None:
+			return index
+		return self._indices.get_index(id, schema_node, shape_in)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from ..shared import LockedShape, OpenShape, Shape, ShapeBound, ID
+from ..shared import LockedShape, OpenShape, Shape, ShapeBound
 from .components.transform import Transform
 from .components.activation import Activation
 from .components.regularization import Regularization
@@ -11,18 +11,21 @@ import random
 import math
 from copy import copy
 
-from typing import Iterator, Iterable, Callable, Any
+from typing import Iterator, Iterable, Callable, Any, TYPE_CHECKING
 from typing_extensions import Self
 
 from dataclasses import dataclass
 from abc import ABC as Abstract, abstractmethod
 
+if TYPE_CHECKING:
+	from .channel_solver import ChannelSolver
+
 
 @dataclass(frozen=True)
 class IRNode:
 	schema_node: SchemaNode
-	parent_ids: tuple[ID, ...]
-	id: ID 
+	parent_ids: tuple[int, ...]
+	id: int
 	input_shape: LockedShape
 	output_shape: LockedShape
 	index: CompilationIndex
@@ -49,7 +52,8 @@ class IRNode:
 
 
 class SchemaNode:
-	__slots__ = ["_transform", "_transition_groups", "_growth_function", "_divisor_hint", "_merge_method", "debug_name", "_activation", "_regularization", "_shape_bounds"]
+	__slots__ = ["_transform", "_transition_groups", "_growth_function", "_divisor_hint", "_merge_method", "debug_name", "_activation", "_regularization", "_shape_bounds", 
+		"_schema_id", "_divisor", "_build_bounds", "_new_conformance", "_lookahead_divisors"]
 	def __init__(self, 
 			shape_bounds: ShapeBound,
 			growth_function: Callable[[LockedShape, CompilationIndex], float] | None = None,
@@ -68,23 +72,81 @@ class SchemaNode:
 		self._regularization: Regularization | None = regularization 
 		self._divisor_hint: int = divisor_hint 
 		self.debug_name: str = debug_name 
-	def _compile(self, node: _CompilationNode, tracker: _CompilationTracker, indices: CompilationIndices, id: ID, max_id: ID) -> list[IRNode] | None:
+		#static facts of the node, the components are fixed at construction so these never change
+		divisor = math.lcm(divisor_hint, transform.get_divisor()) if transform is not None else divisor_hint
+		self._divisor: int = activation.get_divisor(divisor) if activation is not None else divisor
+		self._build_bounds: ShapeBound = activation.get_bounds(shape_bounds) if activation is not None else shape_bounds
+		#set by Schema.freeze, and cleared with the caches below when a group is added, the schema then freezes again before compiling
+		self._schema_id: int | None = None
+		self._new_conformance: Conformance | None = None
+		self._lookahead_divisors: dict[int, int] = {}
+	def _compile(self, node: _CompilationNode, tracker: _CompilationTracker, indices: CompilationIndices, id: int, max_id: int, lookahead: int = 1, solver: ChannelSolver | None = None, 
+			snapshots: list[_CompilationSnapshot] | None = None) -> list[IRNode] | None:
+		#ids are kept as plain ints within the compiler, the range is validated once by the schema
 		if id >= max_id:
 			return None
 		input_shape = self.get_input_shape([node.input_shape])
 		index = indices.get_index(id, self, input_shape)
 		offset: int = int(index.get_shuffled(len(self), 0))
 		for group in (self[(i + offset) % len(self)] for i in range(len(self))):
-			if ((conformance := group.get_conformance(tracker, self)) is not None
-					and (output_shape := self.get_output_shape(input_shape, conformance, index)) is not None):
+			if ((conformance := group.get_conformance(tracker, self, lookahead)) is not None
+					and (output_shape := (self.get_output_shape(input_shape, conformance, index) if solver is None 
+						else solver.get_output_shape(self, group, tracker, input_shape, conformance, index))) is not None
+					and (lookahead <= 1 or group.is_feasible(tracker, self, output_shape, True, lookahead - 1))):
 				next_tracker = group.join_nodes(tracker, self, output_shape, id)
 				next_schema, next_node = next_tracker.pop_min()
-				if (ir := next_schema._compile(next_node, next_tracker, indices, id + 1, max_id)) is not None:
-					return ir + [IRNode(self, tuple(node.parent_ids), id, input_shape, output_shape, index)]
+				if (ir := next_schema._compile(next_node, next_tracker, indices, id + 1, max_id, lookahead, solver, snapshots)) is not None:
+					ir.append(IRNode(self, tuple(node.parent_ids), id, input_shape, output_shape, index))
+					if snapshots is not None:
+						snapshots.append(_CompilationSnapshot(self, node, tracker))
+					return ir
 		if (len(self) == 0
 				and (output_shape := self.get_output_shape(input_shape, Conformance(OpenShape(), 1), index)) is not None):
+			if snapshots is not None:
+				snapshots.append(_CompilationSnapshot(self, node, tracker))
 			return [IRNode(self, tuple(node.parent_ids), id, input_shape, output_shape, index)]
 		return None
+	def _is_feasible(self, input_shape: LockedShape, channels_known: bool, tracker: _CompilationTracker, depth: int) -> bool:
+		#a necessary condition for the node to compile given its input, looking depth nodes further
+		#	spatial dims are fixed by the transforms, so they are always checked,
+		#	channels are only known while no transform has chosen them, ie through the nodes without a transform
+		input_shape = input_shape.squash(self.dimensionality())
+		if channels_known and input_shape[0] % self._divisor != 0:
+			return False
+		if self._transform is None:
+			output_shape = self._activation.scale_output_shape(input_shape) if self._activation is not None else input_shape
+		else:
+			output_shape = self._transform.get_output_upper_shape(input_shape).to_locked(1)
+			channels_known = False
+		if channels_known and output_shape not in self._shape_bounds:
+			return False
+		for i in range(1, len(output_shape)):
+			if not self._shape_bounds.contains_value(output_shape[-i], -i):
+				return False
+		if depth <= 1 or len(self) == 0:
+			return True
+		return any(group.is_feasible(tracker, self, output_shape, channels_known, depth - 1) for group in self)
+	def _get_lookahead_divisor(self, depth: int) -> int:
+		#the divisor required of the input, seen depth nodes ahead,
+		#	a node without a transform passes its input channels on, so the divisors its children require in every group are required of it too
+		if (divisor := self._lookahead_divisors.get(depth)) is not None:
+			return divisor
+		divisor = self._divisor
+		if (self._transform is None and depth > 1 and len(self) > 0
+				and (self._activation is None or self._activation.get_divisor(1) == 1)):
+			divisor = math.lcm(divisor, math.gcd(*(math.lcm(*(transition.get_next()._get_lookahead_divisor(depth - 1) for transition in group)) for group in self)))
+		if self.is_frozen():
+			self._lookahead_divisors[depth] = divisor
+		return divisor
+	def _is_join_feasible(self, pending_shape: LockedShape, parent_shape: LockedShape, channels_known: bool, tracker: _CompilationTracker, depth: int) -> bool:
+		parent_shape = parent_shape.squash(self.dimensionality())
+		if channels_known:
+			if (conformance := self.get_conformance([pending_shape])) is None or not conformance.shape.compatible(parent_shape):
+				return False
+		elif pending_shape.squash(self.dimensionality()).to_open() != parent_shape.to_open():
+			return False
+		#other parents may still join, so only the spatial dims of the merged input are certain
+		return self._is_feasible(self.get_input_shape([pending_shape, parent_shape]), False, tracker, depth)
 	def get_input_shape(self, input_shapes: list[LockedShape]) -> LockedShape:
 		if self._merge_method is None:
 			if len(input_shapes) > 1:
@@ -92,13 +154,18 @@ class SchemaNode:
 			return input_shapes[0].squash(self.dimensionality())
 		else:
 			return self._merge_method.get_merged_shape(input_shapes).squash(self.dimensionality())
-	def get_output_shape(self, input_shape: LockedShape, conformance: Conformance, index: CompilationIndex) -> LockedShape | None:
+	def get_output_shape(self, input_shape: LockedShape, conformance: Conformance, index: CompilationIndex, channel_bounds: tuple[int, int | None] | None = None) -> LockedShape | None:
+		#channel bounds narrow the bounds the transform chooses within, they are only given by the channel solver
+		bounds = self._build_bounds if channel_bounds is None else _narrow_channels(self._build_bounds, channel_bounds)
+		if bounds is None:
+			return None
 		conformance_divisor = math.lcm(conformance.divisor, self._divisor_hint)
 		growth_factor = self._growth_function(input_shape, index) if self._growth_function is not None else 1
 		conformance_shape = conformance.shape
-		bounds = self._shape_bounds
 		if self._activation is not None:
-			conformance_shape, bounds, conformance_divisor, growth_factor = self._activation.scale_build_conformances(conformance_shape, bounds, conformance_divisor, growth_factor)
+			conformance_shape = self._activation.get_conformance(conformance_shape)
+			conformance_divisor = self._activation.get_divisor(conformance_divisor)
+			growth_factor = self._activation.get_growth_factor(growth_factor)
 		output_shape = self._transform.get_output_shape(input_shape, conformance_shape, bounds, conformance_divisor, growth_factor) if self._transform is not None else input_shape
 		if output_shape is not None:
 			output_shape = self._activation.scale_output_shape(output_shape) if self._activation is not None else output_shape
@@ -107,19 +174,38 @@ class SchemaNode:
 		else:
 			return None
 	def get_conformance(self, parent_shapes: list[LockedShape]) -> Conformance | None:
+		if len(parent_shapes) == 0 and self._new_conformance is not None:
+			return self._new_conformance
 		conformance_shape = OpenShape()
 		if self._merge_method is not None:
 			if (conformance_shape := self._merge_method.get_conformance_shape(parent_shapes)) is None:
 				return None
 		elif len(parent_shapes) > 1:
 			raise ValueError(f"No merge method defined for multiple inputs '{self.debug_name}'")
-		divisor = math.lcm(self._divisor_hint, self._transform.get_divisor()) if self._transform is not None else self._divisor_hint 
-		return Conformance(conformance_shape, self._activation.get_divisor(divisor) if self._activation is not None else divisor)
+		return Conformance(conformance_shape, self._divisor)
 	def add_group(self, *transitions: Transition) -> Self:
+		self._thaw()
 		self._transition_groups.append(TransitionGroup(transitions))
 		return self
+	def _freeze(self, schema_id: int) -> None:
+		#the lookahead divisors depend on the groups of the nodes ahead, so they are cleared on every freeze
+		self._thaw()
+		self._schema_id = schema_id
+		self._new_conformance = self.get_conformance([])
+	def _thaw(self) -> None:
+		self._schema_id = None
+		self._new_conformance = None
+		self._lookahead_divisors = {}
+	def is_frozen(self) -> bool:
+		return self._schema_id is not None
+	def get_schema_id(self) -> int | None:
+		return self._schema_id
+	def get_divisor(self) -> int:
+		return self._divisor
 	def get_merge_method(self) -> MergeMethod | None:
 		return self._merge_method
+	def get_shape_bounds(self) -> ShapeBound:
+		return self._shape_bounds
 	def get_transform(self) -> Transform | None:
 		return self._transform
 	def get_activation(self) -> Activation | None:
@@ -137,6 +223,15 @@ class SchemaNode:
 	def __len__(self) -> int:
 		return len(self._transition_groups)
 
+def _narrow_channels(bounds: ShapeBound, channel_bounds: tuple[int, int | None]) -> ShapeBound | None:
+	bound_list = bounds.get_bounds()
+	lower, upper = bound_list[0]
+	lower = channel_bounds[0] if lower is None else max(lower, channel_bounds[0])
+	upper = channel_bounds[1] if upper is None else (upper if channel_bounds[1] is None else min(upper, channel_bounds[1]))
+	if upper is not None and lower > upper:
+		return None
+	return ShapeBound((lower, upper), *bound_list[1:])
+
 class TransitionGroup:
 	__slots__ = ["_transitions"]
 	def __init__(self, transitions: Iterable[Transition]) -> None:
@@ -146,16 +241,23 @@ class TransitionGroup:
 				raise ValueError("Duplicate state in transition group")
 			pattern_set.add(transition.get_next())
 		self._transitions: tuple[Transition, ...] = tuple(transitions) 
-	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode) -> Conformance | None:
+	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode, lookahead: int = 1) -> Conformance | None:
 		conformance: Conformance = Conformance(OpenShape(), 1)
 		for transition in self._transitions:
 			if ((next_conformance := transition.get_conformance(tracker, parent)) is not None
 					and (next_conformance := conformance.common(next_conformance)) is not None):
 				conformance = next_conformance 
+				if lookahead > 1:
+					conformance = conformance.common_divisor(transition.get_next()._get_lookahead_divisor(lookahead))
 			else:
 				return None
 		return conformance
-	def join_nodes(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, id: ID) -> _CompilationTracker:
+	def is_feasible(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, channels_known: bool, depth: int) -> bool:
+		for transition in self._transitions:
+			if not transition.is_feasible(tracker, parent, parent_shape, channels_known, depth):
+				return False
+		return True
+	def join_nodes(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, id: int) -> _CompilationTracker:
 		next_tracker = copy(tracker)
 		for transition in self._transitions:
 			transition.join_node(next_tracker, parent, parent_shape, id)
@@ -182,37 +284,51 @@ class Transition(Abstract):
 	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode) -> Conformance | None:
 		pass
 	@abstractmethod
-	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: ID) -> _CompilationTracker:
+	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: int) -> _CompilationTracker:
+		pass
+	@abstractmethod
+	def is_feasible(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, channels_known: bool, depth: int) -> bool:
 		pass
 
 class New(Transition):
 	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode) -> Conformance | None:
 		return self._next.get_conformance([])
-	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: ID) -> _CompilationTracker:
+	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: int) -> _CompilationTracker:
 		tracker.get_mutable(self._next).push(_CompilationNode({parent}, [parent_id], parent_shape, self._priority))
 		return tracker 
+	def is_feasible(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, channels_known: bool, depth: int) -> bool:
+		return self._next._is_feasible(parent_shape, channels_known, tracker, depth)
 
 class Existing(Transition):
 	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode) -> Conformance | None:
 		if (compilation_node := tracker.get_immutable(self._next).get_immutable(parent)) is not None:
 			return self._next.get_conformance([compilation_node.input_shape])
 		return None
-	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: ID) -> _CompilationTracker:
+	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: int) -> _CompilationTracker:
 		if (compilation_node := tracker.get_mutable(self._next).get_mutable(parent)) is not None:
 			compilation_node.record(parent, parent_id, self._next.get_input_shape([compilation_node.input_shape, parent_shape]), self._priority)
 		return tracker
+	def is_feasible(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, channels_known: bool, depth: int) -> bool:
+		#past the first step the node to join may be created by a sibling, which is not yet in the tracker, so it is given the benefit of the doubt
+		if (compilation_node := tracker.get_immutable(self._next).get_immutable(parent)) is not None:
+			return self._next._is_join_feasible(compilation_node.input_shape, parent_shape, channels_known, tracker, depth)
+		return True
 
 class Auto(Transition):
 	def get_conformance(self, tracker: _CompilationTracker, parent: SchemaNode) -> Conformance | None:
 		if (compilation_node := tracker.get_immutable(self._next).get_immutable(parent)) is not None:
 			return self._next.get_conformance([compilation_node.input_shape])
 		return self._next.get_conformance([])
-	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: ID) -> _CompilationTracker:
+	def join_node(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, parent_id: int) -> _CompilationTracker:
 		stack = tracker.get_mutable(self._next)
 		if (compilation_node := stack.get_mutable(parent)) is not None:
 			compilation_node.record(parent, parent_id, self._next.get_input_shape([compilation_node.input_shape, parent_shape]), self._priority)
 		stack.push(_CompilationNode({parent}, [parent_id], parent_shape, self._priority))
 		return tracker
+	def is_feasible(self, tracker: _CompilationTracker, parent: SchemaNode, parent_shape: LockedShape, channels_known: bool, depth: int) -> bool:
+		if (compilation_node := tracker.get_immutable(self._next).get_immutable(parent)) is not None:
+			return self._next._is_join_feasible(compilation_node.input_shape, parent_shape, channels_known, tracker, depth)
+		return self._next._is_feasible(parent_shape, channels_known, tracker, depth)
 
 @dataclass(frozen=False)
 class Conformance:
@@ -229,10 +345,13 @@ class Conformance:
 		return self.common(Conformance(shape, 1))
 
 class _CompilationTracker:
-	__slots__ = ["_stacks", "_stacks_lookup", "_id", "_max_id"]
-	def __init__(self, stacks: list[_CompilationNodeStack], stacks_lookup: dict[SchemaNode, int] | None) -> None:
+	__slots__ = ["_stacks", "_stacks_lookup", "_lookup_shared"]
+	def __init__(self, stacks: list[_CompilationNodeStack], stacks_lookup: dict[SchemaNode, int] | None, lookup_shared: bool = False) -> None:
 		self._stacks: list[_CompilationNodeStack] = stacks 
 		self._stacks_lookup: dict[SchemaNode, int] = {}
+		#the lookup only changes when a stack is added, so it is shared between copies until then
+		#	compile_ir seeds it with the stacks of the starts, so a compilation copies it only as stacks for other nodes are first added
+		self._lookup_shared: bool = lookup_shared
 		if stacks_lookup is not None:
 			self._stacks_lookup = stacks_lookup
 		else:
@@ -249,6 +368,9 @@ class _CompilationTracker:
 		if node in self._stacks_lookup:
 			self._stacks[self._stacks_lookup[node]] = copy(self._stacks[self._stacks_lookup[node]])
 			return self._stacks[self._stacks_lookup[node]]
+		if self._lookup_shared:
+			self._stacks_lookup = copy(self._stacks_lookup)
+			self._lookup_shared = False
 		self._stacks.append(_CompilationNodeStack(node, []))
 		self._stacks_lookup[node] = len(self._stacks) - 1
 		return self._stacks[-1]
@@ -261,7 +383,8 @@ class _CompilationTracker:
 	def __len__(self) -> int:
 		return len(self._stacks)
 	def __copy__(self) -> _CompilationTracker:
-		return _CompilationTracker(copy(self._stacks), copy(self._stacks_lookup))
+		self._lookup_shared = True
+		return _CompilationTracker(copy(self._stacks), self._stacks_lookup, True)
 
 class _CompilationNodeStack:
 	__slots__ = ["_stack", "_schema_node"]
@@ -300,10 +423,10 @@ class _CompilationNodeStack:
 @dataclass(frozen=False)
 class _CompilationNode:
 	parent_nodes: set[SchemaNode]
-	parent_ids: list[ID]
+	parent_ids: list[int]
 	input_shape: LockedShape 
 	priority: int
-	def record(self, parent: SchemaNode, parent_id: ID, new_input_shape: LockedShape, priority: int) -> None:
+	def record(self, parent: SchemaNode, parent_id: int, new_input_shape: LockedShape, priority: int) -> None:
 		self.parent_nodes.add(parent)
 		self.parent_ids.append(parent_id)
 		self.input_shape = new_input_shape
@@ -311,24 +434,39 @@ class _CompilationNode:
 	def __copy__(self) -> _CompilationNode:
 		return _CompilationNode(copy(self.parent_nodes), copy(self.parent_ids), self.input_shape, self.priority)
 
+@dataclass(frozen=True)
+class _CompilationSnapshot:
+	#the state a node was compiled from on the successful path, trackers are copy on write so holding them is cheap
+	schema_node: SchemaNode
+	node: _CompilationNode
+	tracker: _CompilationTracker
+
 class CompilationIndices(Abstract):
 	@abstractmethod
-	def get_index(self, id: ID, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:	
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:	
 		pass
 
+_MASK_64: int = 2**64 - 1
+def _mix_64(value: int) -> float:
+	#splitmix64 finalizer, a stateless stand in for seeding a fresh random.Random on every lookup
+	value = (value + 0x9E3779B97F4A7C15) & _MASK_64
+	value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+	value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK_64
+	return ((value ^ (value >> 31)) >> 11) * 2**-53
+
 class CompilationIndex:
 	__slots__ = ["_index"]
 	def __init__(self, index: int = 0) -> None:
 		self._index: int = index
 	@staticmethod
 	def random() -> CompilationIndex:
-		return CompilationIndex(random.randint(0, 2**31 - 1))
+		return CompilationIndex(random.getrandbits(31))
 	def get_shuffled(self, bounds: tuple[float, float] | float, salt: int = 0) -> float:
 		if isinstance(bounds, float) or isinstance(bounds, int):
-			bounds = (0, bounds)
-		elif bounds[0] > bounds[1]:
-			bounds = (bounds[1], bounds[0])
-		return random.Random(self._index + salt).uniform(*bounds)
+			lower, upper = 0, bounds
+		else:
+			lower, upper = bounds
+		return lower + (upper - lower) * _mix_64(self._index + salt)
 	def get(self) -> int:
 		return self._index
 	def __eq__(self, other: Any) -> bool:
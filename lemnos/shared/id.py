@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 class ID(int):
+	__slots__ = ()
 	def __new__(cls, value: int | ID) -> ID:
 		if value < 0:
 			raise ValueError("ID must be non-negative")
@@ -15,24 +15,56 @@ from abc import ABC as Abstract, abstractmethod
 #	if remaining open dims
 #		dims to the right must be the same
 
+#shapes are immutable and interned, so the same dims always give the same instance,
+#	identity is used as the fast path of equality, and results of the shape algebra are memoized on the pairs of instances
+#	both caches are bounded, once full they are cleared rather than evicted, a dropped shape is only ever rebuilt, never invalid
+_INTERN_LIMIT = 1 << 16
+_interned: dict[tuple[type, tuple[int, ...]], Shape] = {}
+_COMMON_LIMIT = 1 << 16
+_common_cache: dict[tuple[Shape, Shape], Shape | None] = {}
+_common_lossless_cache: dict[tuple[Shape, Shape], Shape | None] = {}
+_MISSING: Any = object()
+
 class Shape(Abstract):
-	__slots__ = ("_shape", "_product_cache")
-	def __init__(self, *shape: int) -> None:
-		self._shape: tuple[int, ...] = tuple(shape)
-		self._product_cache: int = max(prod(self._shape), 1)
+	__slots__ = ("_shape", "_product_cache", "_lower_products", "_hash")
+	def __new__(cls, *shape: int) -> Shape:
+		key = (cls, shape)
+		if (interned := _interned.get(key)) is not None:
+			return interned
+		cls._validate(shape)
+		self = super().__new__(cls)
+		self._shape: tuple[int, ...] = shape
+		#lower_products[i] is the product of the first i dims
+		lower_products = [1]
+		for dim in shape:
+			lower_products.append(lower_products[-1] * dim)
+		self._lower_products: tuple[int, ...] = tuple(lower_products)
+		self._product_cache: int = max(lower_products[-1], 1)
+		self._hash: int = hash(key)
+		if len(_interned) >= _INTERN_LIMIT:
+			_interned.clear()
+		_interned[key] = self
+		return self
+	@classmethod
+	def _validate(cls, shape: tuple[int, ...]) -> None:
+		pass
 	@abstractmethod
 	def upper_length(self) -> int:
 		pass
 	def reverse_upper_equal(self, reverse_index: int, other: Shape) -> bool:
-		for i in range(1, reverse_index + 1):
-			if self._shape[-i] != other._shape[-i]:
-				return False
-		return True
+		if reverse_index <= 0:
+			return True
+		return self._shape[-reverse_index:] == other._shape[-reverse_index:]
 	def upper_equal(self, other: Shape) -> bool:
 		reverse_index = min(self.upper_length(), other.upper_length())
 		return self.reverse_upper_equal(reverse_index, other)
 	def reverse_lower_product(self, reverse_index: int) -> int:
-		return prod(self._shape[:-reverse_index])
+		#matches prod(self._shape[:-reverse_index]), which is empty for a reverse index of 0
+		if reverse_index == 0:
+			return 1
+		elif reverse_index < 0:
+			return self._lower_products[min(-reverse_index, len(self._shape))]
+		return self._lower_products[max(len(self._shape) - reverse_index, 0)]
 	@abstractmethod
 	def dimensionality(self) -> int:
 		pass
@@ -49,11 +81,25 @@ class Shape(Abstract):
 		pass
 	def compatible(self, other: Shape) -> bool:
 		return self.common(other) is not None
-	@abstractmethod
 	def common(self, other: Shape) -> Shape | None:
+		if (common := _common_cache.get((self, other), _MISSING)) is not _MISSING:
+			return common
+		common = self._common(other)
+		if len(_common_cache) >= _COMMON_LIMIT:
+			_common_cache.clear()
+		_common_cache[(self, other)] = common
+		return common
+	@abstractmethod
+	def _common(self, other: Shape) -> Shape | None:
 		pass
 	def common_lossless(self, other: Shape) -> Shape | None:
-		return self.common(other) if self.dimensionality() > other.dimensionality() else other.common(self)
+		if (common := _common_lossless_cache.get((self, other), _MISSING)) is not _MISSING:
+			return common
+		common = self.common(other) if self.dimensionality() > other.dimensionality() else other.common(self)
+		if len(_common_lossless_cache) >= _COMMON_LIMIT:
+			_common_lossless_cache.clear()
+		_common_lossless_cache[(self, other)] = common
+		return common
 	@staticmethod
 	def reduce_common_lossless(shapes: Iterable[Shape]) -> Shape | None:
 		common = OpenShape()
@@ -68,22 +114,27 @@ class Shape(Abstract):
 		return len(self._shape)
 	def __iter__(self) -> Iterable[int]:
 		return iter(self._shape)
-	@abstractmethod
 	def __eq__(self, other: Any) -> bool:
-		pass
-	@abstractmethod
+		return self is other or (type(self) is type(other) and self._shape == other._shape)
+	def __hash__(self) -> int:
+		return self._hash
 	def __copy__(self) -> Shape:
-		pass
+		return self
+	def __deepcopy__(self, memo: dict[int, Any]) -> Shape:
+		return self
+	def __reduce__(self) -> tuple[type, tuple[int, ...]]:
+		return type(self), self._shape
 	def get_product(self) -> int:
 		return self._product_cache
 	def __repr__(self) -> str:
 		return str(self)
 
 class LockedShape(Shape):
-	def __init__(self, *shape: int) -> None:
+	__slots__ = ()
+	@classmethod
+	def _validate(cls, shape: tuple[int, ...]) -> None:
 		if len(shape) == 0:
 			raise Exception("locked shape cannot be empty")
-		super().__init__(*shape)
 	def upper_length(self) -> int:
 		return len(self) - 1
 	def dimensionality(self) -> int:
@@ -104,7 +155,7 @@ class LockedShape(Shape):
 			return LockedShape(self.reverse_lower_product(dimensionality - 1), *(self._shape[-(dimensionality - 1):]))
 		else:
 			return LockedShape(self.get_product())
-	def common(self, other: Shape) -> Shape | None:
+	def _common(self, other: Shape) -> Shape | None:
 		reverse_index = min(self.upper_length(), other.upper_length())
 		if other.is_locked():
 			if self.reverse_lower_product(reverse_index) != other.reverse_lower_product(reverse_index):
@@ -114,14 +165,11 @@ class LockedShape(Shape):
 		return self if self.reverse_upper_equal(reverse_index, other) else None 
 	def scale(self, scalars: list[float]) -> LockedShape:
 		return LockedShape(*[int(scalar * element) for element, scalar in zip(self._shape, scalars)])
-	def __eq__(self, other: Any) -> bool:
-		return other is not None and isinstance(other, LockedShape) and self._shape == other._shape
-	def __copy__(self) -> LockedShape:
-		return LockedShape(*self._shape)
 	def __str__(self) -> str:
 		return f"LS({self._shape})"
 		
 class OpenShape(Shape):
+	__slots__ = ()
 	def upper_length(self) -> int:
 		return len(self)
 	def dimensionality(self) -> int:
@@ -135,7 +183,7 @@ class OpenShape(Shape):
 			return self
 		else:
 			return OpenShape(*self._shape[-(dimensionality - 1):])
-	def common(self, other: Shape) -> Shape | None:
+	def _common(self, other: Shape) -> Shape | None:
 		common = self
 		reverse_index = min(self.upper_length(), other.upper_length())
 		if other.is_locked():
@@ -145,10 +193,6 @@ class OpenShape(Shape):
 				return None
 			common = self.to_locked(other_product // self_product)
 		return common if self.reverse_upper_equal(reverse_index, other) else None 
-	def __eq__(self, other: Any) -> bool:
-		return other is not None and isinstance(other, OpenShape) and self._shape == other._shape
-	def __copy__(self) -> OpenShape:
-		return OpenShape(*self._shape)
 	def __str__(self) -> str:
 		return f"OS({self._shape})"
 	def get_upper_diff(self, other: Shape) -> int:
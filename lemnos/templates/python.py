@@ -15,6 +15,8 @@ def self_(register: str) -> str:
 	return f"self.{register}"
 def return_(*exprs: str) -> str:
 	return f"return {arg_list_(*exprs)}"
+def del_(*exprs: str) -> str:
+	return f"del {arg_list_(*exprs)}"
 def call_(function: str, *exprs: str) -> str:
 	return f"{function}({arg_list_(*exprs)})"
 def function_(name: str, args: list[str], statements: list[str]) -> list[str]:
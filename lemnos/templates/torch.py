@@ -42,12 +42,12 @@ def conv_init_(input_shape: LockedShape, output_shape: LockedShape, kernel: tupl
 	return nn_(base) if not mixed else base
 def full_init_(input_shape: LockedShape, output_shape: LockedShape) -> str:
 	return nn_(f"Linear({input_shape.get_product()}, {output_shape.get_product()}, bias=True)") 
-def relu_init_() -> str:
-	return nn_("ReLU()")
-def relu6_init_() -> str:
-	return nn_("ReLU6()")
-def silu_init_() -> str:
-	return nn_("SiLU()")
+def relu_init_(inplace: bool = False) -> str:
+	return nn_(f"ReLU(inplace={inplace})")
+def relu6_init_(inplace: bool = False) -> str:
+	return nn_(f"ReLU6(inplace={inplace})")
+def silu_init_(inplace: bool = False) -> str:
+	return nn_(f"SiLU(inplace={inplace})")
 def sigmoid_init_() -> str:
 	return nn_("Sigmoid()")
 def softmax_init_() -> str:
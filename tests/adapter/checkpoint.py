@@ -0,0 +1,92 @@
+import unittest
+import random
+import os
+import tempfile
+
+import torch
+from torch import Tensor
+from torch.utils.data import DataLoader, TensorDataset
+
+from typing import Iterator
+
+from lemnos.schema.components import Dropout
+from lemnos.shared import ShapeBound
+from lemnos.control import Metrics
+from lemnos.adapter.torch import TorchEvaluator, Adam, StepLR, DeviceLoader, Checkpointer
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class _Preempted(Exception):
+	pass
+
+class _PreemptingLoader:
+	#raises after a number of batches, as the process being killed would
+	def __init__(self, loader: DeviceLoader | DataLoader, batches: int) -> None:
+		self._loader = loader
+		self._batches = batches
+	def __iter__(self) -> Iterator[tuple[Tensor, Tensor]]:
+		for batch in self._loader:
+			if self._batches == 0:
+				raise _Preempted()
+			self._batches -= 1
+			yield batch
+	def __len__(self) -> int:
+		return len(self._loader)
+
+def _losses(metrics: Metrics) -> list[float]:
+	return [metrics[i].total_loss for i in range(len(metrics))]
+
+class TestCheckpoint(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		inputs = torch.randn(64, 2, 8)
+		labels = (inputs.sum(dim=(1, 2)) > 0).long() + 2 * (inputs[:, 0].sum(dim=1) > 0).long()
+		self.loader = DeviceLoader(inputs, labels, 16, shuffle=True, device="cpu")
+		#a data loader draws its base seed as it is iterated, before its sampler draws the order
+		self.data_loader = DataLoader(TensorDataset(inputs, labels), 16, shuffle=True)
+		self.irs = get_loop_irs(2, schema=get_loop_schema(ShapeBound((1, 16), (1, 8)), ShapeBound((4, 4)), 4, start_regularization=Dropout(.2)))
+	def _evaluator(self, loader: DeviceLoader | DataLoader | _PreemptingLoader, checkpointer: Checkpointer | None) -> TorchEvaluator:
+		return TorchEvaluator(loader, self.loader, 3, torch.nn.CrossEntropyLoss(), None, Adam(.01), StepLR(1, .5), False, # type: ignore
+			model_group_size=2, checkpointer=checkpointer)
+	def _resume(self, every_steps: int, preempt_after: int) -> None:
+		self._resume_with(self.loader, every_steps, preempt_after)
+		self._resume_with(self.data_loader, every_steps, preempt_after)
+	def _resume_with(self, loader: DeviceLoader | DataLoader, every_steps: int, preempt_after: int) -> None:
+		torch.manual_seed(1)
+		uninterrupted = self._evaluator(loader, None).evaluate_many(self.irs)
+		with tempfile.TemporaryDirectory() as directory:
+			torch.manual_seed(1)
+			with self.assertRaises(_Preempted):
+				self._evaluator(_PreemptingLoader(loader, preempt_after), Checkpointer(directory, every_steps)).evaluate_many(self.irs)
+			self.assertEqual(len(os.listdir(directory)), 1)
+			#a new process starts from a different random state, the checkpoint restores the state it was saved with
+			torch.manual_seed(2)
+			resumed = self._evaluator(loader, Checkpointer(directory, every_steps)).evaluate_many(self.irs)
+			self.assertEqual(os.listdir(directory), [])
+		for (training, validation), (resumed_training, resumed_validation) in zip(uninterrupted, resumed):
+			self.assertEqual(training.get_total_samples(), resumed_training.get_total_samples())
+			self.assertEqual(_losses(training), _losses(resumed_training))
+			if validation is None or resumed_validation is None:
+				self.fail()
+			self.assertEqual(_losses(validation), _losses(resumed_validation))
+	def test_resume_mid_epoch(self):
+		#saved after the second batch of the second epoch, killed as the fourth is loaded
+		self._resume(6, 7)
+	def test_resume_at_epoch_end(self):
+		#saved as the first epoch ends, killed in the second
+		self._resume(4, 4 + 2)
+	def test_interval(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with self.assertRaises(ValueError):
+				Checkpointer(directory, None)
+			checkpointer = Checkpointer(directory, 2)
+			self.assertEqual([checkpointer.tick() for _ in range(3)], [False, True, True])
+			path = checkpointer.get_path(["a", "b"], 3)
+			self.assertNotEqual(path, checkpointer.get_path(["b", "a"], 3))
+			self.assertNotEqual(path, checkpointer.get_path(["a", "b"], 4))
+			checkpointer.save(path, {"step": 1})
+			self.assertFalse(checkpointer.tick())
+			self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+			self.assertEqual(checkpointer.load(path, "cpu"), {"step": 1})
+			checkpointer.remove(path)
+			self.assertIsNone(checkpointer.load(path, "cpu"))
@@ -0,0 +1,56 @@
+import unittest
+import random
+import math
+
+import torch
+
+from lemnos.adapter.torch import CompileCache, CompileStats, create_module
+from tests.helpers import get_conv_ir
+
+class TestCompileStats(unittest.TestCase):
+	def test_payback(self):
+		stats = CompileStats()
+		self.assertIsNone(stats.get_payback_steps())
+		stats.record_compile(10, 3, 1)
+		self.assertEqual(stats.get_payback_steps(), 5)
+		self.assertEqual(stats.get_speedup(), 3)
+		stats.record_compile(10, 1, 3)
+		self.assertEqual(stats.get_payback_steps(), math.inf)
+
+class TestCompileCache(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		self.ir = get_conv_ir()
+		self.input = torch.randn(4, 2, 8)
+		self.builds = 0
+	def _build(self) -> torch.nn.Module:
+		self.builds += 1
+		return create_module("Model", self.ir)
+	def _probe(self, model: torch.nn.Module) -> None:
+		model(self.input).sum().backward()
+	def test_hit(self):
+		cache = CompileCache()
+		first = cache.acquire(self.ir, self._build, self._probe, 100)
+		#an entry in use is not lent twice
+		second = cache.acquire(self.ir, self._build, self._probe, 100)
+		self.assertIsNot(first, second)
+		cache.release(first)
+		cache.release(second)
+		parameters = [parameter.clone() for parameter in first.parameters()]
+		third = cache.acquire(self.ir, self._build, self._probe, 100)
+		self.assertIs(third, first)
+		self.assertEqual(self.builds, 2)
+		self.assertEqual(cache.get_stats().get_hits(), 1)
+		self.assertEqual(len(cache), 1)
+		#a hit is reinitialized
+		self.assertFalse(all(torch.equal(a, b) for a, b in zip(parameters, third.parameters())))
+		self.assertEqual(third(self.input).shape, (4, 4))
+	def test_skip(self):
+		cache = CompileCache()
+		cache.get_stats().record_compile(10, 2, 1)
+		#ten steps pay back the measured compile
+		self.assertEqual(cache.acquire(self.ir, self._build, self._probe, 9)(self.input).shape, (4, 4))
+		self.assertEqual(cache.get_stats().get_compiles(), 1)
+		self.assertEqual(cache.get_stats().get_skips(), 1)
+		self.assertEqual(len(cache), 0)
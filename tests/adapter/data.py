@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+
+import torch
+from torch.utils.data import TensorDataset
+
+from lemnos.adapter.torch import cache_dataset, DatasetCache, CachedLoader, DeviceLoader, BatchTransform
+from lemnos.adapter.torch.data import _random_crop
+
+class TestDatasetCache(unittest.TestCase):
+	def setUp(self) -> None:
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, "train")
+		torch.manual_seed(0)
+		self.inputs = torch.randint(0, 256, (50, 3, 6, 6)).float() / 255
+		self.labels = torch.randint(0, 10, (50,))
+		self.cache = cache_dataset(TensorDataset(self.inputs, self.labels), self.path)
+	def tearDown(self) -> None:
+		self.directory.cleanup()
+	def test_round_trip(self):
+		loader = CachedLoader(self.cache, 16, shuffle=False)
+		inputs, labels = zip(*loader)
+		self.assertEqual(len(loader), 4)
+		self.assertTrue(torch.allclose(torch.cat(inputs), self.inputs))
+		self.assertTrue(torch.equal(torch.cat(labels), self.labels))
+	def test_reused(self):
+		self.assertEqual(len(cache_dataset(TensorDataset(self.inputs[:10], self.labels[:10]), self.path)), 50)
+		self.assertEqual(len(DatasetCache(self.path)), 50)
+	def test_shuffle(self):
+		loader = CachedLoader(self.cache, 16, drop_last=True)
+		inputs, labels = zip(*loader)
+		self.assertEqual(len(inputs), 3)
+		for input, label in zip(torch.cat(inputs), torch.cat(labels)):
+			i = int((self.inputs - input).abs().flatten(1).sum(dim=1).argmin())
+			self.assertEqual(label, self.labels[i])
+	def test_augmentation(self):
+		loader = CachedLoader(self.cache, 50, shuffle=False, flip=True, crop_padding=2, mean=(.5, .5, .5), std=(.25, .25, .25))
+		inputs, _ = next(iter(loader))
+		self.assertEqual(inputs.shape, self.inputs.shape)
+	def test_crop(self):
+		inputs = torch.arange(2 * 4 * 4).float().reshape(2, 1, 4, 4) + 1
+		cropped = _random_crop(inputs, 1)
+		for input, crop in zip(inputs, cropped):
+			#every non padded value of a crop is in place relative to its neighbours
+			nonzero = crop[crop != 0]
+			self.assertTrue(all(value in input for value in nonzero))
+			self.assertGreaterEqual(len(nonzero), 9)
+
+class TestDeviceLoader(unittest.TestCase):
+	def setUp(self) -> None:
+		torch.manual_seed(0)
+		self.inputs = torch.randint(0, 256, (50, 3, 6, 6), dtype=torch.uint8)
+		self.labels = torch.randint(0, 10, (50,))
+	def test_order(self):
+		loader = DeviceLoader(self.inputs, self.labels, 16, shuffle=False, device="cpu")
+		inputs, labels = zip(*loader)
+		self.assertEqual(len(loader), 4)
+		self.assertTrue(torch.equal(torch.cat(inputs), self.inputs))
+		self.assertTrue(torch.equal(torch.cat(labels), self.labels))
+	def test_shuffle(self):
+		loader = DeviceLoader(self.inputs, torch.arange(50), 16, drop_last=True, transform=BatchTransform(255, True, 1), device="cpu")
+		inputs, labels = zip(*loader)
+		self.assertEqual(len(torch.cat(labels).unique()), 48)
+		self.assertEqual(torch.cat(inputs).dtype, torch.float32)
+	def test_from_dataset(self):
+		loader = DeviceLoader.from_dataset(TensorDataset(self.inputs.float() / 255, self.labels), 25, shuffle=False, device="cpu")
+		self.assertTrue(torch.allclose(next(iter(loader))[0], self.inputs[:25].float() / 255))
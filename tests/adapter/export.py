@@ -0,0 +1,54 @@
+import unittest
+
+from lemnos.schema import SchemaNode, Schema, BreedIndices, New
+from lemnos.schema.components import Conv, ReLU, BatchNorm, Dropout
+from lemnos.shared import LockedShape, ShapeBound, ID
+from lemnos.adapter.torch import create_module
+from lemnos.adapter.torch.export import ExportFormat, export_ir, load_module, prepare_for_inference, benchmark_export, get_example_inputs, onnx_available
+import torch
+
+import tempfile
+import os
+
+class TestExport(unittest.TestCase):
+	def setUp(self):
+		start = SchemaNode(ShapeBound((4, 4), (1, 8)), None, None, Conv(kernel=1), None, BatchNorm(), 1, "start")
+		mid = SchemaNode(ShapeBound((4, 4), (1, 8)), None, None, Conv(kernel=2, stride=2), ReLU(), Dropout(.5), 1, "mid")
+		end = SchemaNode(ShapeBound((2, 2), (1, 1)), None, None, Conv(kernel=4), None, None, 1, "end")
+		start.add_group(New(mid, 0))
+		mid.add_group(New(end, 0))
+		ir = Schema([start], [end]).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(10))
+		if ir is None:
+			self.fail()
+		self.ir = ir
+	def test_prepare(self):
+		module = prepare_for_inference(create_module("Test", self.ir), self.ir)
+		self.assertFalse(any(isinstance(child, (torch.nn.Dropout, torch.nn.BatchNorm1d)) for child in module.children()))
+	def test_export(self):
+		trained = create_module("Test", self.ir)
+		trained(torch.rand(4, 1, 8))
+		with tempfile.TemporaryDirectory() as directory:
+			paths = export_ir(self.ir, directory, "Test", trained.state_dict(), (ExportFormat.SOURCE, ExportFormat.TORCHSCRIPT))
+			loaded = load_module(paths[ExportFormat.SOURCE], "Test")
+			loaded.load_state_dict(torch.load(os.path.join(directory, "Test.pt")))
+			loaded.eval()
+			scripted = torch.jit.load(paths[ExportFormat.TORCHSCRIPT])
+			input = torch.rand(3, 1, 8)
+			self.assertTrue(torch.allclose(loaded(input), scripted(input), atol=1e-5))
+			self.assertEqual(len(benchmark_export(paths[ExportFormat.TORCHSCRIPT], self.ir, 2, 3, 1)), 3)
+	def test_example_inputs(self):
+		self.assertEqual(get_example_inputs(self.ir, 2)[0].shape, torch.Size([2, 1, 8]))
+	@unittest.skipUnless(onnx_available(), "onnx is not installed")
+	def test_export_onnx(self):
+		with tempfile.TemporaryDirectory() as directory:
+			paths = export_ir(self.ir, directory, "Test", formats=(ExportFormat.ONNX,))
+			self.assertTrue(os.path.getsize(paths[ExportFormat.ONNX]) > 0)
+	@unittest.skipIf(onnx_available(), "onnx is installed")
+	def test_export_onnx_missing(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with self.assertRaises(ImportError):
+				export_ir(self.ir, directory, "Test", formats=(ExportFormat.SOURCE, ExportFormat.ONNX))
+			self.assertEqual(os.listdir(directory), [])
+	def test_export_default(self):
+		with tempfile.TemporaryDirectory() as directory:
+			self.assertEqual(set(export_ir(self.ir, directory, "Test")), {ExportFormat.SOURCE, ExportFormat.TORCHSCRIPT})
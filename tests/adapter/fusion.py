@@ -0,0 +1,59 @@
+import unittest
+
+from lemnos.schema import SchemaNode, Schema, BreedIndices, New
+from lemnos.schema.components import Conv, ReLU, ReLU6, Softmax, Sigmoid, SiLU, BatchNorm, Full
+from lemnos.shared import LockedShape, ShapeBound, ID
+from lemnos.adapter.torch import create_module, generate_source
+from lemnos.adapter.torch.fusion import fold_batchnorm
+import torch
+
+def _schema(mix_groups: bool, groups: int) -> Schema:
+	start = SchemaNode(ShapeBound((4, 4), (1, 8)), None, None, Conv(kernel=1), ReLU(), BatchNorm(), 1, "start")
+	mixed = SchemaNode(ShapeBound((8, 8), (1, 8)), None, None, Conv(kernel=2, stride=2, groups=groups, mix_groups=mix_groups), None, BatchNorm(), 1, "mixed")
+	end = SchemaNode(ShapeBound((2, 2), (1, 1)), None, None, Conv(kernel=4), None, None, 1, "end")
+	start.add_group(New(mixed, 0))
+	mixed.add_group(New(end, 0))
+	return Schema([start], [end])
+
+class TestFusion(unittest.TestCase):
+	def test_views_removed(self):
+		ir = _schema(False, 1).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(10))
+		if ir is None:
+			self.fail()
+		self.assertEqual(generate_source("Test", ir).count(".view("), 2)
+		self.assertGreater(generate_source("Test", ir, fusion=False).count(".view("), 2)
+	def test_mix_folded(self):
+		ir = _schema(True, 2).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(10))
+		if ir is None:
+			self.fail()
+		self.assertNotIn("ConvMix1d(", generate_source("Test", ir).split("def __init__(self):")[1])
+		self.assertIn("ConvMix1d(", generate_source("Test", ir, fusion=False).split("def __init__(self):")[1])
+	def test_fold_batchnorm(self):
+		for fusion in (True, False):
+			ir = _schema(True, 2).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(10))
+			if ir is None:
+				self.fail()
+			module = create_module("Test", ir, fusion=fusion)
+			module.train()
+			for _ in range(4):
+				module(torch.rand(8, 1, 8))
+			module.eval()
+			input = torch.rand(3, 1, 8)
+			expected = module(input)
+			self.assertRaises(ValueError, fold_batchnorm, create_module("Test", ir), ir)
+			folded = fold_batchnorm(module, ir)
+			self.assertTrue(torch.allclose(folded(input), expected, atol=1e-5))
+			self.assertEqual(sum(isinstance(child, torch.nn.BatchNorm1d) for child in folded.children()), 1)
+	def test_activations_unchanged(self):
+		for activation in (ReLU(), ReLU6(), Softmax(), Sigmoid(), SiLU()):
+			start = SchemaNode(ShapeBound((4, 4), (1, 8)), None, None, Conv(kernel=1), None, None, 1, "start")
+			end = SchemaNode(ShapeBound((4, 4), (1, 8)), None, None, None, activation, None, 1, "end")
+			start.add_group(New(end, 0))
+			ir = Schema([start], [end]).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(10))
+			if ir is None:
+				self.fail()
+			fused = create_module("Test", ir)
+			unfused = create_module("Test", ir, fusion=False)
+			unfused.load_state_dict(fused.state_dict())
+			input = torch.rand(3, 1, 8)
+			self.assertTrue(torch.allclose(fused(input), unfused(input), atol=1e-6), type(activation).__name__)
@@ -0,0 +1,49 @@
+import unittest
+import random
+
+import torch
+
+from lemnos.schema.components import BatchNorm
+from lemnos.shared import LockedShape, ShapeBound
+from lemnos.control import CostPrescreener, ParameterCost, ResourcePenaltySelector, Metrics, SampleCollection
+from lemnos.adapter.torch import LatencyBenchmark, summarize_latency
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class TestSummarize(unittest.TestCase):
+	def test_outliers(self):
+		stats = summarize_latency([1.0] * 50 + [1.1] * 48 + [40.0, 50.0], 4, 1)
+		self.assertEqual(stats.rejected, 2)
+		self.assertLess(stats.p99, 1.2)
+		self.assertAlmostEqual(stats.p50, 1.0)
+		self.assertAlmostEqual(stats.throughput, 4 * 98 / (50 + 48 * 1.1) * 1000)
+
+class TestLatencyBenchmark(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		self.irs = get_loop_irs(4, LockedShape(2, 16), 12, get_loop_schema(ShapeBound((1, 32), (1, 16)), ShapeBound((4, 4)), 4, start_regularization=BatchNorm()))
+	def test_measure(self):
+		benchmark = LatencyBenchmark((1, 4), (1, 2), iterations=4, warmup=1, cost_batch_size=4)
+		threads = torch.get_num_threads()
+		stats = benchmark.measure(self.irs[0])
+		self.assertEqual(torch.get_num_threads(), threads)
+		self.assertEqual({(stat.batch_size, stat.threads) for stat in stats}, {(1, 1), (4, 1), (1, 2), (4, 2)})
+		for stat in stats:
+			self.assertLessEqual(stat.p50, stat.p99)
+			self.assertGreater(stat.throughput, 0)
+		#cached by structural hash
+		self.assertIs(benchmark.measure(self.irs[0]), stats)
+		self.assertEqual(benchmark.get_cost(self.irs[0]), benchmark.get_stats(self.irs[0], 4, 1).p50)
+		self.assertEqual(len(benchmark), 1)
+		with self.assertRaises(ValueError):
+			LatencyBenchmark((1,), cost_batch_size=8)
+	def test_cost_hooks(self):
+		benchmark = LatencyBenchmark((1,), iterations=4, warmup=1)
+		kept = CostPrescreener(benchmark, .5).screen(self.irs, 2)
+		costs = sorted(benchmark.get_cost(ir) for ir in self.irs)
+		self.assertEqual(sorted(benchmark.get_cost(ir) for ir in kept), costs[:2])
+		metrics = Metrics()
+		metrics.record(SampleCollection(1, 1, 1, None, None, 0))
+		models = [(ir, metrics, None) for ir in self.irs]
+		selected = ResourcePenaltySelector(cost=ParameterCost(), cost_penalty=1).select(models, 1)[0][0]
+		self.assertEqual(ParameterCost().get_cost(selected), min(ParameterCost().get_cost(ir) for ir in self.irs))
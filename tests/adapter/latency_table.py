@@ -0,0 +1,55 @@
+import unittest
+import random
+import os
+import json
+import tempfile
+
+import torch
+
+from lemnos.schema.components import BatchNorm, Dropout
+from lemnos.shared import LockedShape, ShapeBound
+from lemnos.adapter.torch import LatencyTable, LatencyBenchmark
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class TestLatencyTable(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		self.irs = get_loop_irs(4, LockedShape(2, 16), 12, get_loop_schema(ShapeBound((1, 32), (1, 16)), ShapeBound((4, 4)), 4, start_regularization=BatchNorm(), loop_activation=False, loop_regularization=BatchNorm(), end_regularization=Dropout(.1)))
+	def test_predict(self):
+		table = LatencyTable(iterations=4, warmup=1)
+		threads = torch.get_num_threads()
+		prediction = table.predict(self.irs[0])
+		self.assertEqual(torch.get_num_threads(), threads)
+		self.assertGreater(prediction, 0)
+		#one entry per distinct component, the folded norms of the loop and the dropout are not measured
+		keys = set(table._entries)
+		self.assertFalse(any("Dropout" in key for key in keys))
+		self.assertEqual(sum(1 for key in keys if "BatchNorm" in key), 1)
+		size = len(table)
+		self.assertEqual(table.predict(self.irs[0]), prediction)
+		self.assertEqual(len(table), size)
+		self.assertEqual(table.get_cost(self.irs[0]), prediction)
+	def test_persist(self):
+		table = LatencyTable(iterations=4, warmup=1)
+		predictions = [table.predict(ir) for ir in self.irs]
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "table.json")
+			with self.assertRaises(ValueError):
+				table.save()
+			table.save(path)
+			self.assertEqual(os.listdir(directory), ["table.json"])
+			loaded = LatencyTable(path, iterations=4, warmup=1)
+			self.assertEqual(len(loaded), len(table))
+			self.assertEqual([loaded.predict(ir) for ir in self.irs], predictions)
+			with open(path) as file:
+				self.assertEqual(json.load(file)["batch_size"], 1)
+			with self.assertRaises(ValueError):
+				LatencyTable(path, batch_size=8)
+	def test_compare(self):
+		table = LatencyTable(iterations=4, warmup=1)
+		error = table.compare(self.irs, LatencyBenchmark((1,), iterations=4, warmup=1))
+		self.assertEqual(len(error.predicted), len(self.irs))
+		self.assertEqual(len(error.measured), len(self.irs))
+		self.assertGreaterEqual(error.relative_error, 0)
+		self.assertLessEqual(abs(error.rank_correlation), 1)
@@ -0,0 +1,57 @@
+import unittest
+
+from lemnos.schema import SchemaNode, IRNode, CompilationIndex, Schema, BreedIndices, New, Existing
+from lemnos.schema.components import Sum, Conv, ReLU, BatchNorm, Full
+from lemnos.shared import LockedShape, ShapeBound, ID
+from lemnos.adapter.torch import create_module, generate_source
+from lemnos.adapter.torch.memory_planner import plan_execution_order, get_peak_live_size
+import torch
+
+def _node(id: int, parent_ids: tuple[int, ...], size: int) -> IRNode:
+	return IRNode(SchemaNode(ShapeBound(None)), tuple(ID(i) for i in parent_ids), ID(id), LockedShape(1), LockedShape(size), CompilationIndex())
+
+class TestMemoryPlanner(unittest.TestCase):
+	def setUp(self):
+		#the small branch is listed first, so the large branch is computed while the small output is held
+		self.ir = [
+			_node(0, (), 8),
+			_node(1, (0,), 50),
+			_node(2, (0,), 100),
+			_node(3, (2,), 1),
+			_node(4, (1, 3), 1),
+		]
+	def test_order_valid(self):
+		order = plan_execution_order(self.ir)
+		self.assertEqual(len(order), len(self.ir))
+		seen: set[ID] = set()
+		for node in order:
+			for parent_id in node.parent_ids:
+				self.assertIn(parent_id, seen)
+			seen.add(node.id)
+	def test_peak_reduced(self):
+		self.assertEqual(get_peak_live_size(self.ir), 158)
+		self.assertEqual(get_peak_live_size(plan_execution_order(self.ir)), 109)
+	def test_optimal_unchanged(self):
+		order = plan_execution_order(self.ir)
+		self.assertEqual(plan_execution_order(order), order)
+
+class TestPlannedSource(unittest.TestCase):
+	def test_equivalent(self):
+		main = SchemaNode(ShapeBound(None, None), None, Sum(), None, None, None, 1, "main")
+		split_1 = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=2, stride=2), ReLU(), BatchNorm(), 1, "split_1")
+		split_2 = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=2, stride=2), ReLU(), BatchNorm(), 1, "split_2")
+		end_node = SchemaNode(ShapeBound((1, 1), (1, 1)), None, None, Full(), None, None, 1, "end")
+		main.add_group(New(split_1, 0), New(split_2, 1))
+		split_1.add_group(New(main, 2))
+		split_2.add_group(Existing(main, 2))
+		main.add_group(New(end_node, 0))
+		ir = Schema([main], [end_node]).compile_ir([LockedShape(1, 8)], BreedIndices(), ID(15))
+		if ir is None:
+			self.fail()
+		self.assertIn("inplace=True", generate_source("Test", ir))
+		torch.manual_seed(0)
+		planned = create_module("Test", ir)
+		unplanned = create_module("Test", ir, memory_planning=False)
+		unplanned.load_state_dict(planned.state_dict())
+		input = torch.rand(2, 1, 8)
+		self.assertTrue(torch.allclose(planned(input), unplanned(input)))
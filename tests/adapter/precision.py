@@ -0,0 +1,62 @@
+import unittest
+import random
+
+import torch
+
+from lemnos.adapter.torch import Precision, PrecisionPolicy, PolicyTiming, benchmark_policies, select_policy
+from tests.helpers import get_conv_ir
+
+class TestPrecisionPolicy(unittest.TestCase):
+	def test_device_defaults(self):
+		policy = PrecisionPolicy()
+		self.assertEqual(policy.get_precision("cuda"), Precision.FP16)
+		self.assertEqual(policy.get_precision("cpu"), Precision.FP32)
+		self.assertFalse(policy.get_scaler("cpu").is_enabled())
+		self.assertEqual(PrecisionPolicy(Precision.BF16).get_precision("cuda"), Precision.BF16)
+	def test_autocast(self):
+		linear = torch.nn.Linear(4, 4)
+		with PrecisionPolicy(Precision.BF16).autocast("cpu"):
+			self.assertEqual(linear(torch.randn(2, 4)).dtype, torch.bfloat16)
+		with PrecisionPolicy(Precision.FP32).autocast("cpu"):
+			self.assertEqual(linear(torch.randn(2, 4)).dtype, torch.float32)
+	def test_channels_last(self):
+		policy = PrecisionPolicy(channels_last=True)
+		self.assertTrue(policy.prepare_input(torch.randn(2, 3, 4, 4)).is_contiguous(memory_format=torch.channels_last))
+		self.assertEqual(policy.prepare_input(torch.randn(2, 3, 4)).shape, (2, 3, 4))
+		conv = policy.prepare_model(torch.nn.Conv2d(3, 3, 3))
+		self.assertTrue(conv.weight.is_contiguous(memory_format=torch.channels_last))
+	def test_invalid_threads(self):
+		with self.assertRaises(ValueError):
+			PrecisionPolicy(num_threads=0)
+
+class TestBenchmarkPolicies(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		self.ir = get_conv_ir()
+		input = torch.randn(16, 2, 8)
+		self.batch = (input, (input.sum(dim=(1, 2)) > 0).long())
+	def test_select(self):
+		timings = benchmark_policies(self.ir, self.batch, torch.nn.CrossEntropyLoss(), [PrecisionPolicy(Precision.FP32), PrecisionPolicy(Precision.BF16)], steps=2, warmup=1)
+		self.assertEqual(len(timings), 2)
+		#the warmup is undone, so fp32 starts from exactly the reference loss
+		self.assertEqual(timings[0].loss_error, 0)
+		self.assertGreater(timings[1].seconds_per_step, 0)
+		self.assertIs(select_policy(timings, tolerance=float("inf")), min(timings, key=lambda timing: timing.seconds_per_step).policy)
+		with self.assertRaises(ValueError):
+			select_policy([PolicyTiming(PrecisionPolicy(), 1, float("nan"), float("nan"))])
+	def test_benchmark_restores(self):
+		#the criterion sees the settings each policy runs under
+		settings: list[tuple[int, bool]] = []
+		cross_entropy = torch.nn.CrossEntropyLoss()
+		def criterion(output: torch.Tensor, truth: torch.Tensor) -> torch.Tensor:
+			settings.append((torch.get_num_threads(), torch.are_deterministic_algorithms_enabled()))
+			return cross_entropy(output, truth)
+		threads = torch.get_num_threads()
+		policies = [PrecisionPolicy(num_threads=threads + 1, deterministic=True), PrecisionPolicy()]
+		benchmark_policies(self.ir, self.batch, criterion, policies, steps=1, warmup=0) # type: ignore
+		self.assertEqual(settings, [(threads, False), (threads + 1, True), (threads, False)])
+		self.assertEqual(torch.get_num_threads(), threads)
+		self.assertFalse(torch.are_deterministic_algorithms_enabled())
+		with self.assertRaises(ValueError):
+			benchmark_policies(self.ir, self.batch, cross_entropy, [PrecisionPolicy(interop_threads=torch.get_num_interop_threads() + 1)])
@@ -0,0 +1,44 @@
+import unittest
+import random
+import math
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from lemnos.shared import LockedShape, ShapeBound
+from lemnos.adapter.torch import TorchProxyPrescreener, Proxy, create_module, get_synflow
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class TestProxies(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		self.irs = get_loop_irs(6, LockedShape(3, 8, 8), 8, get_loop_schema(ShapeBound((1, 16), (1, 8), (1, 8)), ShapeBound((4, 4)), 4))
+		self.loader = DataLoader(TensorDataset(torch.randn(64, 3, 8, 8), torch.randint(0, 4, (64,))), batch_size=16)
+	def test_proxies(self):
+		prescreener = TorchProxyPrescreener(self.loader, torch.nn.CrossEntropyLoss(), .5, tuple(Proxy), 2)
+		scores = prescreener.get_proxies(self.irs[0])
+		self.assertEqual(set(scores), set(Proxy))
+		for proxy in (Proxy.GRAD_NORM, Proxy.SYNFLOW, Proxy.NASWOT):
+			self.assertTrue(math.isfinite(scores[proxy]))
+			self.assertGreater(scores[proxy], 0)
+	def test_synflow_restores(self):
+		model = create_module("Model", self.irs[0])
+		before = [parameter.detach().clone() for parameter in model.parameters()]
+		get_synflow(model, torch.Size((3, 8, 8)))
+		for parameter, original in zip(model.parameters(), before):
+			self.assertEqual(parameter.dtype, torch.float32)
+			self.assertTrue(torch.allclose(parameter, original))
+	def test_screen(self):
+		prescreener = TorchProxyPrescreener(self.loader, torch.nn.CrossEntropyLoss(), .5)
+		kept = prescreener.screen(self.irs, 3)
+		self.assertEqual(len(kept), 3)
+		self.assertEqual(len(prescreener.get_stats()), len(self.irs))
+		self.assertGreater(prescreener.get_stats().get_total_time(), 0)
+		#each proxy is correlated with the losses observed, as well as the mean rank
+		for i, ir in enumerate(kept):
+			prescreener.observe(ir, float(i))
+		correlations = prescreener.get_stats().get_correlations()
+		self.assertEqual(set(correlations), {Proxy.GRAD_NORM, Proxy.LOSS_DROP})
+		for correlation in correlations.values():
+			self.assertLessEqual(abs(correlation or 0), 1)
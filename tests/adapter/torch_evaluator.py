@@ -1 +1,67 @@
 import unittest
+import random
+
+import torch
+
+from lemnos.schema import get_structural_hash
+from lemnos.control import EventBus, Event, CallbackSink, BatchMetrics, EpochEnd
+from lemnos.adapter.torch import TorchEvaluator, Adam, DeviceLoader, CompileCache
+from tests.helpers import get_loop_irs
+
+class TestTorchEvaluator(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		torch.manual_seed(0)
+		inputs = torch.randn(64, 2, 8)
+		labels = (inputs.sum(dim=(1, 2)) > 0).long() + 2 * (inputs[:, 0].sum(dim=1) > 0).long()
+		#a data loader draws from the global generator every epoch, which would shift the initialization of models made after it
+		self.loader = DeviceLoader(inputs, labels, 16, shuffle=False, device="cpu")
+		self.irs = get_loop_irs(3)
+	def _evaluator(self, model_group_size: int, events: EventBus | None = None) -> TorchEvaluator:
+		return TorchEvaluator(self.loader, self.loader, 3, torch.nn.CrossEntropyLoss(), None, Adam(.01), None, False, model_group_size=model_group_size, events=events)
+	def test_evaluate_many(self):
+		results = self._evaluator(2).evaluate_many(self.irs)
+		self.assertEqual(len(results), 3)
+		for training, validation in results:
+			self.assertEqual(training.get_total_samples(), 3 * 64)
+			if validation is None:
+				self.fail()
+			self.assertEqual(validation.get_total_samples(), 3 * 64)
+			self.assertLess(training.get_tail_loss(.25), training[0].total_loss / training[0].sample_size)
+			self.assertGreater(training.get_throughput() or 0, 0)
+			self.assertIsNotNone(training.get_wait_fraction())
+			self.assertIsNotNone(validation.get_compute_time())
+			self.assertGreaterEqual(training.get_peak_memory() or 0, 0)
+	def test_grouped_matches_single(self):
+		#the models of a group only get their own gradients, so training them together matches training them alone, up to the rounding of the summed backward pass
+		torch.manual_seed(1)
+		single = [self._evaluator(1).evaluate(ir)[0] for ir in self.irs]
+		torch.manual_seed(1)
+		grouped = [training for training, _ in self._evaluator(3).evaluate_many(self.irs)]
+		for single_metrics, grouped_metrics in zip(single, grouped):
+			self.assertAlmostEqual(single_metrics.get_tail_loss(), grouped_metrics.get_tail_loss(), delta=1e-4 * single_metrics.get_tail_loss())
+	def test_compile_cache(self):
+		cache = CompileCache()
+		evaluator = TorchEvaluator(self.loader, None, 1, torch.nn.CrossEntropyLoss(), None, Adam(.01), None, False, compile_cache=cache)
+		for _ in range(2):
+			training, _ = evaluator.evaluate(self.irs[0])
+			self.assertEqual(training.get_total_samples(), 64)
+		self.assertEqual(cache.get_stats().get_compiles(), 1)
+		self.assertEqual(cache.get_stats().get_hits(), 1)
+	def test_events(self):
+		received: list[Event] = []
+		bus = EventBus()
+		bus.subscribe(CallbackSink(received.append), (BatchMetrics, EpochEnd))
+		self._evaluator(2, bus).evaluate_many(self.irs[:2])
+		bus.close()
+		batches = [event for event in received if isinstance(event, BatchMetrics)]
+		epochs = [event for event in received if isinstance(event, EpochEnd)]
+		self.assertEqual(len(batches), 2 * 3 * 4)
+		self.assertEqual(len(epochs), 2 * 3)
+		self.assertEqual({event.model for event in epochs}, {get_structural_hash(ir) for ir in self.irs[:2]})
+		for event in epochs:
+			if event.validation_loss is None:
+				self.fail()
+			self.assertEqual(event.samples, 64)
+			mean = sum(batch.loss * batch.samples for batch in batches if batch.model == event.model and batch.epoch == event.epoch) / 64
+			self.assertAlmostEqual(event.training_loss, mean)
@@ -0,0 +1,97 @@
+import unittest
+import random
+import os
+import csv
+import json
+import tempfile
+
+from lemnos.schema import IRNode
+from lemnos.shared import LockedShape, ID
+from lemnos.control import (EventBus, Event, EventRecord, EventSink, JsonlSink, CsvSink, CallbackSink, GenerationStarted, CompileStarted, CompileFinished,
+	SelectionResult, BatchMetrics, Metrics, SampleCollection, or_search, Evaluator, Selector, ModelPool)
+from tests.helpers import get_loop_schema
+
+class _LengthEvaluator(Evaluator):
+	def evaluate(self, ir: list[IRNode]) -> tuple[Metrics, Metrics | None]:
+		metrics = Metrics()
+		metrics.record(SampleCollection(len(ir), len(ir), len(ir), None, None, 0))
+		return metrics, None
+	def get_input_shapes(self) -> list[LockedShape]:
+		return [LockedShape(4, 16)]
+
+class _LossSelector(Selector):
+	def select(self, models: ModelPool, model_pool_size: int) -> ModelPool:
+		return sorted(models, key=lambda model: model[1].get_tail_loss())[:model_pool_size]
+
+class _FailingSink(EventSink):
+	def write(self, records: list[EventRecord]) -> None:
+		raise IOError("full")
+
+class TestEventBus(unittest.TestCase):
+	def test_wants(self):
+		bus = EventBus()
+		self.assertFalse(bus.wants(BatchMetrics))
+		bus.subscribe(CallbackSink(lambda event: None), (GenerationStarted,))
+		self.assertTrue(bus.wants(GenerationStarted))
+		self.assertFalse(bus.wants(BatchMetrics))
+		bus.subscribe(CallbackSink(lambda event: None))
+		self.assertTrue(bus.wants(BatchMetrics))
+		bus.close()
+		self.assertFalse(bus.wants(GenerationStarted))
+	def test_sampling(self):
+		received: list[Event] = []
+		with EventBus(buffer_size=4) as bus:
+			bus.subscribe(CallbackSink(received.append), (BatchMetrics, GenerationStarted), sample_every=3)
+			for i in range(10):
+				bus.emit(BatchMetrics("model", 0, i, 1.0, None, 8))
+				bus.emit(GenerationStarted(i, 1))
+			bus.emit(SelectionResult(0, 1, 1, None))
+			bus.flush()
+			#each type is sampled on its own count
+			self.assertEqual([event.step for event in received if isinstance(event, BatchMetrics)], [0, 3, 6, 9])
+			self.assertEqual([event.generation for event in received if isinstance(event, GenerationStarted)], [0, 3, 6, 9])
+			self.assertFalse(any(isinstance(event, SelectionResult) for event in received))
+	def test_sink_error(self):
+		bus = EventBus()
+		bus.subscribe(_FailingSink())
+		bus.emit(GenerationStarted(0, 1))
+		with self.assertRaises(IOError):
+			bus.flush()
+		bus.close()
+	def test_files(self):
+		with tempfile.TemporaryDirectory() as directory:
+			jsonl_path, csv_path = os.path.join(directory, "events.jsonl"), os.path.join(directory, "batches.csv")
+			with EventBus(buffer_size=2) as bus:
+				bus.subscribe(JsonlSink(jsonl_path))
+				bus.subscribe(CsvSink(csv_path, BatchMetrics))
+				for i in range(5):
+					bus.emit(BatchMetrics("model", 0, i, i / 2, None, 8))
+				bus.emit(GenerationStarted(0, 5))
+			with open(jsonl_path) as file:
+				lines = [json.loads(line) for line in file]
+			self.assertEqual(len(lines), 6)
+			self.assertEqual(lines[2]["event"], "BatchMetrics")
+			self.assertEqual(lines[2]["loss"], 1.0)
+			self.assertEqual(lines[-1]["event"], "GenerationStarted")
+			with open(csv_path) as file:
+				rows = list(csv.reader(file))
+			self.assertEqual(rows[0], ["time", "model", "epoch", "step", "loss", "accuracy", "samples", "seconds", "wait"])
+			self.assertEqual(len(rows), 6)
+			self.assertEqual(rows[3][3], "2")
+
+class TestSearchEvents(unittest.TestCase):
+	def test_or_search(self):
+		random.seed(0)
+		received: list[Event] = []
+		bus = EventBus()
+		bus.subscribe(CallbackSink(received.append), (GenerationStarted, CompileStarted, CompileFinished, SelectionResult))
+		or_search(get_loop_schema(), _LengthEvaluator(), _LossSelector(), ID(32), 4, 3, events=bus)
+		#the search flushes the bus before it returns
+		self.assertEqual([event.generation for event in received if isinstance(event, GenerationStarted)], [0, 1, 2])
+		self.assertEqual(sum(isinstance(event, CompileStarted) for event in received), 12)
+		self.assertEqual(sum(isinstance(event, CompileFinished) for event in received), 12)
+		selections = [event for event in received if isinstance(event, SelectionResult)]
+		self.assertEqual([(event.evaluated, event.selected) for event in selections], [(4, 4), (8, 4), (8, 4)])
+		best = [event.best_loss for event in selections]
+		self.assertEqual(best, sorted(best, reverse=True))
+		bus.close()
@@ -1,6 +1,7 @@
 import unittest
+import math
 
-from lemnos.control import Metrics, SampleCollection
+from lemnos.control import Metrics, SampleCollection, ResourcePenaltySelector
 
 class TestMetrics(unittest.TestCase):
 	def setUp(self):
@@ -36,3 +37,46 @@ class TestMetrics(unittest.TestCase):
 		record.record(self.sample_1)
 		self.assertEqual(len(record._samples), 3)
 		self.assertEqual(record._samples[-1].sample_size, 2)
+	def test_tail_loss(self):
+		record = Metrics()
+		for _ in range(9):
+			record.record(self.sample_2)
+		record.record(self.sample_1)
+		self.assertEqual(record.get_tail_loss(.1), 1.0)
+		self.assertEqual(record.get_tail_loss(.2), 1.5)
+		self.assertEqual(record.get_tail_loss(.01), 1.0)
+		self.assertEqual(Metrics().get_tail_loss(), math.inf)
+	def test_resources(self):
+		record = Metrics(2)
+		self.assertIsNone(record.get_throughput())
+		for _ in range(5):
+			record.record(SampleCollection(1.0, 1.0, 1.0, None, .3, 0, 10, .1))
+		#merging keeps the totals
+		self.assertAlmostEqual(record.get_compute_time() or 0, 1.5)
+		self.assertAlmostEqual(record.get_wait_time() or 0, .5)
+		self.assertAlmostEqual(record.get_throughput() or 0, 25)
+		self.assertAlmostEqual(record.get_wait_fraction() or 0, .25)
+		record.record(self.sample_1)
+		self.assertIsNone(record.get_compute_time())
+		self.assertIsNone(record.get_peak_memory())
+		record.set_peak_memory(2**20)
+		self.assertEqual(record.get_peak_memory(), 2**20)
+
+class TestResourcePenaltySelector(unittest.TestCase):
+	def test_select(self):
+		def metrics(loss: float, seconds: float, peak_memory: int) -> Metrics:
+			record = Metrics()
+			record.record(SampleCollection(loss, loss, loss, None, seconds, 0, 1, 0))
+			record.set_peak_memory(peak_memory)
+			return record
+		#a slightly better loss, bought with a much slower and larger model
+		fast = ([], metrics(1.0, 1e-6, 2**20), None)
+		slow = ([], metrics(.9, 1e-3, 2**20), None)
+		large = ([], metrics(.9, 1e-6, 2**30), None)
+		models = [fast, slow, large]
+		self.assertIs(ResourcePenaltySelector().select(models, 1)[0], slow)
+		self.assertIs(ResourcePenaltySelector(time_penalty=.001).select(models, 2)[1], fast)
+		self.assertIs(ResourcePenaltySelector(time_penalty=.001, memory_penalty=.001).select(models, 1)[0], fast)
+		#a model that recorded nothing is ranked last
+		empty = ([], Metrics(), None)
+		self.assertIs(ResourcePenaltySelector(time_penalty=.001).select([empty, fast], 2)[1], empty)
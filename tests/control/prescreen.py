@@ -0,0 +1,48 @@
+import unittest
+import random
+
+from lemnos.control import Prescreener, PrescreenStats, spearman_correlation
+from lemnos.schema import IRNode
+from lemnos.shared import LockedShape
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class _LengthPrescreener(Prescreener):
+	def score(self, irs: list[list[IRNode]]) -> list[float]:
+		return [float(len(ir)) for ir in irs]
+
+class TestPrescreen(unittest.TestCase):
+	def test_spearman(self):
+		self.assertAlmostEqual(spearman_correlation([1, 2, 3, 4], [10, 20, 30, 40]), 1)
+		self.assertAlmostEqual(spearman_correlation([1, 2, 3, 4], [4, 3, 2, 1]), -1)
+		self.assertAlmostEqual(spearman_correlation([1, 1, 2], [1, 1, 2]), 1)
+	def test_screen(self):
+		schema = get_loop_schema()
+		random.seed(0)
+		candidates = get_loop_irs(8, LockedShape(4, 16), 32, schema)
+		prescreener = _LengthPrescreener(.5)
+		kept = prescreener.screen(candidates, 4)
+		self.assertEqual(sorted(map(len, kept)), sorted(map(len, candidates))[4:])
+		self.assertIsNone(prescreener.get_stats().get_correlation())
+		for ir in kept:
+			prescreener.observe(ir, 1 / len(ir))
+		self.assertGreater(prescreener.get_stats().get_correlation() or 0, 0)
+		self.assertEqual(len(prescreener.get_stats()), 8)
+		with self.assertRaises(ValueError):
+			_LengthPrescreener(0)
+	def test_stats(self):
+		stats = PrescreenStats()
+		positions = stats.record([3, 2, 1], 3)
+		for position, loss in zip(positions, [1, 2, 3]):
+			stats.record_loss(position, loss)
+		self.assertAlmostEqual(stats.get_correlation() or 0, 1)
+		self.assertEqual(stats.get_time_per_candidate(), 1)
+	def test_component_stats(self):
+		stats = PrescreenStats()
+		positions = stats.record([3, 2, 1], 3, [{"a": 1, "b": 1}, {"a": 2, "b": 0}, {"a": 3}])
+		for position, loss in zip(positions, [1, 2, 3]):
+			stats.record_loss(position, loss)
+		self.assertAlmostEqual(stats.get_correlation("a") or 0, -1)
+		#a component missing for a candidate is left out of its correlation
+		self.assertAlmostEqual(stats.get_correlation("b") or 0, 1)
+		self.assertIsNone(stats.get_correlation("c"))
+		self.assertEqual(list(stats.get_correlations()), ["a", "b"])
@@ -0,0 +1,73 @@
+import unittest
+import random
+import os
+import tempfile
+
+from lemnos.schema import SchemaNode, IRNode, CompilationIndex, get_structural_hash
+from lemnos.schema.schema_graph import CompilationIndices
+from lemnos.shared import LockedShape, ID
+from lemnos.control import RunStore, Metrics, SampleCollection, or_search, Evaluator, Selector, ModelPool
+from tests.helpers import get_loop_schema, get_loop_irs
+
+def _metrics(loss: float) -> Metrics:
+	metrics = Metrics()
+	metrics.record(SampleCollection(loss, loss, loss, None, None, 0))
+	return metrics
+
+class _StoredIndices(CompilationIndices):
+	def __init__(self, indices: tuple[int, ...]) -> None:
+		self._indices = indices
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		return CompilationIndex(self._indices[id])
+
+class _LengthEvaluator(Evaluator):
+	def evaluate(self, ir: list[IRNode]) -> tuple[Metrics, Metrics | None]:
+		return _metrics(float(len(ir))), None
+	def get_input_shapes(self) -> list[LockedShape]:
+		return [LockedShape(4, 16)]
+
+class _LossSelector(Selector):
+	def select(self, models: ModelPool, model_pool_size: int) -> ModelPool:
+		return sorted(models, key=lambda model: model[1].get_tail_loss())[:model_pool_size]
+
+class TestRunStore(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		self.schema = get_loop_schema()
+		self.irs = get_loop_irs(16, LockedShape(4, 16), 32, self.schema)
+	def test_record(self):
+		store = RunStore(batch_size=4)
+		hashes = [store.record(ir, _metrics(float(i)), None, 0) for i, ir in enumerate(self.irs)]
+		self.assertEqual(len(store), len(set(hashes)))
+		record = store.get(hashes[3])
+		if record is None:
+			self.fail()
+		self.assertEqual(record.training_loss, max(float(i) for i, structural_hash in enumerate(hashes) if structural_hash == hashes[3]))
+		self.assertEqual(self.schema.compile_ir(list(record.input_shapes), _StoredIndices(record.indices), ID(32)), self.irs[3])
+	def test_queries(self):
+		store = RunStore()
+		for i, ir in enumerate(self.irs[:4]):
+			store.record(ir, _metrics(float(i)), _metrics(float(10 - i)), 0)
+		child = store.record(self.irs[4], generation=1, parents=self.irs[:2])
+		self.assertEqual(store.get_best(1)[0].hash, get_structural_hash(self.irs[3]))
+		smallest = min(record.parameters for record in store.get_generation(0))
+		self.assertTrue(all(record.parameters <= smallest for record in store.get_best(4, max_parameters=smallest)))
+		self.assertEqual([record.hash for record in store.get_children(get_structural_hash(self.irs[0]))], [child])
+		self.assertEqual(len(store.get_parents(child)), len({get_structural_hash(ir) for ir in self.irs[:2]}))
+		self.assertIsNone(store.get(child).training_loss) # type: ignore
+	def test_persistent(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "runs.sqlite")
+			with RunStore(path) as store:
+				for ir in self.irs:
+					store.record(ir, _metrics(1.0))
+				count = len(store)
+			with RunStore(path) as store:
+				self.assertEqual(len(store), count)
+	def test_search(self):
+		store = RunStore()
+		random.seed(0)
+		or_search(self.schema, _LengthEvaluator(), _LossSelector(), ID(32), 4, 3, run_store=store)
+		self.assertGreater(len(store.get_generation(0)), 0)
+		self.assertGreater(len(store.query("select * from parents")), 0)
+		self.assertIsNotNone(store.get_best()[0].training_loss)
@@ -0,0 +1,66 @@
+import unittest
+import random
+
+import numpy as np
+
+from lemnos.schema import BreedIndices, IRNode
+from lemnos.shared import LockedShape, ID
+from lemnos.control import or_search, Evaluator, Selector, Metrics, SampleCollection, ModelPool, GaussianProcessSurrogate, SurrogateProposer, get_ir_features
+from tests.helpers import get_loop_schema, get_loop_irs
+
+class _LengthEvaluator(Evaluator):
+	#loss is the length of the ir, so the best candidates are known
+	def __init__(self) -> None:
+		self.evaluated: list[list[IRNode]] = []
+	def evaluate(self, ir: list[IRNode]) -> tuple[Metrics, Metrics | None]:
+		self.evaluated.append(ir)
+		metrics = Metrics()
+		metrics.record(SampleCollection(float(len(ir)), float(len(ir)), float(len(ir)), None, None, None))
+		return metrics, None
+	def get_input_shapes(self) -> list[LockedShape]:
+		return [LockedShape(4, 16)]
+
+class _FirstSelector(Selector):
+	def select(self, models: ModelPool, model_pool_size: int) -> ModelPool:
+		return sorted(models, key=lambda model: model[1].get_tail_loss())[:model_pool_size]
+
+class TestGaussianProcess(unittest.TestCase):
+	def test_fit(self):
+		rng = np.random.default_rng(0)
+		features = rng.uniform(-2, 2, (64, 2))
+		surrogate = GaussianProcessSurrogate()
+		surrogate.fit(features, features[:, 0] ** 2 + features[:, 1])
+		test = rng.uniform(-2, 2, (16, 2))
+		mean, std = surrogate.predict(test)
+		self.assertLess(np.abs(mean - (test[:, 0] ** 2 + test[:, 1])).max(), .5)
+		_, far_std = surrogate.predict(np.array([[20.0, 20.0]]))
+		self.assertGreater(far_std[0], std.max())
+	def test_unfit(self):
+		with self.assertRaises(ValueError):
+			GaussianProcessSurrogate().predict(np.zeros((1, 2)))
+
+class TestSurrogateProposer(unittest.TestCase):
+	def test_select(self):
+		schema = get_loop_schema()
+		random.seed(0)
+		irs = get_loop_irs(48, LockedShape(4, 16), 32, schema)
+		proposer = SurrogateProposer(schema, exploration=0)
+		self.assertEqual(proposer.select(irs[:8], 2), irs[:2])
+		for ir in irs[:32]:
+			proposer.observe(ir, float(len(ir)))
+		selected = proposer.select(irs[32:], 4)
+		self.assertEqual(sorted(map(len, selected)), sorted(map(len, irs[32:]))[:4])
+	def test_features(self):
+		schema = get_loop_schema()
+		random.seed(0)
+		ir = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+		if ir is None:
+			self.fail()
+		features = get_ir_features(schema, ir)
+		self.assertEqual(features[:len(schema.get_nodes())].sum(), len(ir))
+	def test_search(self):
+		schema = get_loop_schema()
+		evaluator = _LengthEvaluator()
+		random.seed(0)
+		or_search(schema, evaluator, _FirstSelector(), ID(32), 4, 3, SurrogateProposer(schema, oversample=8))
+		self.assertEqual(len(evaluator.evaluated), 12)
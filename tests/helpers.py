@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from lemnos.schema import SchemaNode, Schema, New, BreedIndices, LinearGrowth, IRNode
+from lemnos.schema.components import Conv, ReLU, Full, Regularization
+from lemnos.shared import LockedShape, ShapeBound, ID
+
+# Schemas and irs shared by the tests, a conv start, a conv loop and a full end, which compile quickly at small bounds.
+
+def get_loop_schema(
+		bound: ShapeBound = ShapeBound((1, 64), (1, 16)),
+		end_bound: ShapeBound = ShapeBound((1, 8)),
+		start_growth: float = 2,
+		start_regularization: Regularization | None = None,
+		loop_activation: bool = True,
+		loop_regularization: Regularization | None = None,
+		end_regularization: Regularization | None = None,
+	) -> Schema:
+	start = SchemaNode(bound, LinearGrowth(start_growth, .9), None, Conv(3, 1), ReLU(), start_regularization, 1, "start")
+	loop = SchemaNode(bound, LinearGrowth(1, .9), None, Conv(3, 1), ReLU() if loop_activation else None, loop_regularization, 1, "loop")
+	end = SchemaNode(end_bound, None, None, Full(), None, end_regularization, 1, "end")
+	start.add_group(New(loop, 0))
+	loop.add_group(New(loop, 0))
+	loop.add_group(New(end, 0))
+	return Schema([start], [end])
+
+def get_loop_irs(count: int, input_shape: LockedShape = LockedShape(2, 8), max_id: int = 8, schema: Schema | None = None) -> list[list[IRNode]]:
+	#the compiles that fail within the max id are dropped, so fewer than count may be returned
+	if schema is None:
+		schema = get_loop_schema(ShapeBound((1, 16), (1, 8)), ShapeBound((4, 4)), 4)
+	return [ir for _ in range(count) if (ir := schema.compile_ir([input_shape], BreedIndices(), ID(max_id))) is not None]
+
+def get_conv_ir() -> list[IRNode]:
+	start = SchemaNode(ShapeBound((1, 16), (1, 8)), LinearGrowth(4, .9), None, Conv(3, 1), ReLU(), None, 1, "start")
+	end = SchemaNode(ShapeBound((4, 4)), None, None, Full(), None, None, 1, "end")
+	start.add_group(New(end, 0))
+	ir = Schema([start], [end]).compile_ir([LockedShape(2, 8)], BreedIndices(), ID(8))
+	if ir is None:
+		raise ValueError("No ir")
+	return ir
@@ -0,0 +1,62 @@
+# yes this is hacky af, but it's just a microbenchmark
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import time
+import tracemalloc
+import cProfile
+import pstats
+import random
+
+from lemnos.shared import LockedShape, ShapeBound
+from lemnos.schema import Schema, SchemaNode, New, Existing, PowerGrowth, LinearGrowth, BreedIndices
+from lemnos.schema.components import Conv, BatchNorm, ReLU6, Softmax, GroupType, Sum
+
+def create_schema() -> Schema:
+	head = SchemaNode(ShapeBound(None, None, None), LinearGrowth(4, .2), None, Conv(3, 1), ReLU6(), BatchNorm())
+	dw_point_squeeze = SchemaNode(ShapeBound(None, None, None), LinearGrowth(.5, .2), None, Conv(), ReLU6(), BatchNorm())
+	depthwise = SchemaNode(ShapeBound(None, None, None), None, None, Conv(3, 1, 1, 1, GroupType.DEPTHWISE), ReLU6(), BatchNorm())
+	dw_point_expand = SchemaNode(ShapeBound(None, None, None), None, None, Conv(), ReLU6(), BatchNorm())
+	skip = SchemaNode(ShapeBound(None, None, None), None, Sum(), None, None, BatchNorm())
+	downsample = SchemaNode(ShapeBound(None, (4, None), (4, None)), PowerGrowth(256, .6, .2), Sum(), Conv(2, 0, 2), ReLU6(), BatchNorm())
+	end = SchemaNode(ShapeBound(10, 1, 1), None, None, Conv(4, 0), Softmax(), None)
+	head.add_group(New(skip, 1), New(dw_point_squeeze, 0))
+	dw_point_squeeze.add_group(New(depthwise, 0))
+	depthwise.add_group(New(dw_point_expand, 0))
+	dw_point_expand.add_group(Existing(skip, 0))
+	dw_point_expand.add_group(Existing(downsample, 0))
+	skip.add_group(New(dw_point_squeeze, 0), New(skip, 1))
+	skip.add_group(New(dw_point_squeeze, 0), New(downsample, 1))
+	skip.add_group(New(end, 0))
+	downsample.add_group(New(skip, 1), New(dw_point_squeeze, 0))
+	return Schema([head], [end])
+
+COMPILES = 200
+
+def run(schema: Schema) -> int:
+	nodes = 0
+	for _ in range(COMPILES):
+		if (ir := schema.compile_ir([LockedShape(3, 32, 32)], BreedIndices(), 100)) is not None:
+			nodes += len(ir)
+	return nodes
+
+random.seed(0)
+schema = create_schema()
+start = time.perf_counter()
+nodes = run(schema)
+elapsed = time.perf_counter() - start
+
+#counts the python level object constructions, ie the __new__ and __init__ calls
+random.seed(0)
+profiler = cProfile.Profile()
+profiler.runcall(run, schema)
+constructions = sum(stats[1] for (_, _, function), stats in pstats.Stats(profiler).stats.items() if function in ("__new__", "__init__")) # type: ignore
+
+random.seed(0)
+tracemalloc.start()
+run(schema)
+_, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print(f"nodes: {nodes}, time per node: {elapsed / nodes * 1e6:.1f}us, constructions per node: {constructions / nodes:.1f}, peak traced memory: {peak / 1024:.0f}KiB")
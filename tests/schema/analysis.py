@@ -0,0 +1,65 @@
+import unittest
+
+from lemnos.schema import SchemaNode, Schema, New, Existing, analyze_schema, estimate_search_space, IssueKind, IssueSeverity
+from lemnos.schema.components import Conv, Sum, ReLU
+from lemnos.shared import ShapeBound
+
+def _kinds(schema: Schema) -> set[IssueKind]:
+	return {issue.kind for issue in analyze_schema(schema, 20).issues}
+
+class TestAnalysis(unittest.TestCase):
+	def test_clean(self):
+		start = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=2, stride=2), ReLU(), None, 1, "start")
+		end = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=1), None, None, 1, "end")
+		start.add_group(New(end, 0))
+		analysis = analyze_schema(Schema([start], [end]))
+		self.assertEqual(len(analysis.issues), 0)
+		self.assertEqual(analysis.search_space_size, 1)
+	def test_unreachable_end(self):
+		start = SchemaNode(ShapeBound((1, 10)), debug_name="start")
+		end = SchemaNode(ShapeBound((1, 10)), debug_name="end")
+		analysis = analyze_schema(Schema([start], [end]))
+		self.assertTrue(analysis.has_errors())
+		self.assertEqual(analysis.get_errors()[0].kind, IssueKind.UNREACHABLE_END)
+	def test_unjoinable_existing(self):
+		start = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "start")
+		end = SchemaNode(ShapeBound((1, 10)), None, Sum(), None, None, None, 1, "end")
+		start.add_group(Existing(end, 0))
+		self.assertIn(IssueKind.UNJOINABLE_EXISTING, _kinds(Schema([start], [end])))
+	def test_missing_merge_method(self):
+		start = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "start")
+		mid = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "mid")
+		end = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "end")
+		start.add_group(New(mid, 0), New(end, 1))
+		mid.add_group(Existing(end, 0))
+		self.assertIn(IssueKind.MISSING_MERGE_METHOD, [issue.kind for issue in analyze_schema(Schema([start], [end])).get_errors()])
+	def test_loops(self):
+		start = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=1), None, None, 1, "start")
+		loop = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=3, padding=1), None, None, 1, "loop")
+		end = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=1), None, None, 1, "end")
+		start.add_group(New(loop, 0))
+		loop.add_group(New(loop, 0))
+		loop.add_group(New(end, 0))
+		analysis = analyze_schema(Schema([start], [end]))
+		self.assertEqual([issue.kind for issue in analysis.issues], [IssueKind.UNBOUNDED_LOOP])
+		self.assertEqual(analysis.issues[0].severity, IssueSeverity.WARNING)
+		self.assertIsNone(analysis.search_space_size)
+		self.assertEqual(estimate_search_space(Schema([start], [end]), 4), 3)
+		reducing = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=2, stride=2), None, None, 1, "reducing")
+		reducing.add_group(New(reducing, 0))
+		reducing.add_group(New(end, 0))
+		self.assertNotIn(IssueKind.UNBOUNDED_LOOP, _kinds(Schema([reducing], [end])))
+	def test_non_terminating(self):
+		start = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "start")
+		end = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "end")
+		start.add_group(New(start, 0), New(end, 1))
+		self.assertIn(IssueKind.NON_TERMINATING, {issue.kind for issue in analyze_schema(Schema([start], [end])).get_errors()})
+	def test_lookahead(self):
+		start = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=1), None, None, 1, "start")
+		passthrough = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, None, ReLU(), None, 1, "passthrough")
+		end = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=1, groups=4), None, None, 1, "end")
+		start.add_group(New(passthrough, 0))
+		passthrough.add_group(New(end, 0))
+		issues = [issue for issue in analyze_schema(Schema([start], [end])).issues if issue.kind == IssueKind.LOOKAHEAD]
+		self.assertEqual(len(issues), 1)
+		self.assertEqual(issues[0].nodes, (start, passthrough))
@@ -0,0 +1,59 @@
+import unittest
+import random
+
+from lemnos.schema import SchemaNode, Schema, New, Existing, BreedIndices, LinearGrowth, ChannelSolver, ChannelConstraint
+from lemnos.schema.components import Conv, Sum, ReLU, BatchNorm, Full
+from lemnos.shared import LockedShape, ShapeBound, ID
+
+def _residual() -> Schema:
+	#split_2 reaches the sum through a node without a transform, so greedily it does not see the channels it has to match
+	head = SchemaNode(ShapeBound((1, 64), (1, 16)), None, None, Conv(1), None, None, 1, "head")
+	split_1 = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(2, .9), None, Conv(3, 1), ReLU(), None, 1, "split_1")
+	split_2 = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(2, .9), None, Conv(3, 1), None, None, 1, "split_2")
+	act = SchemaNode(ShapeBound((1, 64), (1, 16)), None, None, None, ReLU(), BatchNorm(), 1, "act")
+	merge = SchemaNode(ShapeBound((1, 64), (1, 16)), None, Sum(), None, None, None, 1, "merge")
+	end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+	head.add_group(New(split_1, 0), New(split_2, 1))
+	split_1.add_group(New(merge, 2))
+	split_2.add_group(New(act, 1))
+	act.add_group(Existing(merge, 2))
+	merge.add_group(New(end, 0))
+	return Schema([head], [end])
+
+class TestChannelConstraint(unittest.TestCase):
+	def test_join(self):
+		joined = ChannelConstraint(2, 1, 16).join(ChannelConstraint(3, 7, None))
+		self.assertEqual(joined, ChannelConstraint(6, 12, 16))
+		self.assertIsNone(ChannelConstraint(4, 1, 6).join(ChannelConstraint(1, 5, None)))
+		self.assertIsNone(ChannelConstraint(equal=4).join(ChannelConstraint(equal=6)))
+		self.assertIsNone(ChannelConstraint(3).join(ChannelConstraint(equal=4)))
+	def test_satisfied(self):
+		self.assertTrue(ChannelConstraint(2, 4, 8).is_satisfied(6))
+		self.assertFalse(ChannelConstraint(2, 4, 8).is_satisfied(5))
+		self.assertFalse(ChannelConstraint(2, 4, 8).is_satisfied(10))
+
+class TestChannelSolver(unittest.TestCase):
+	def _successes(self, solver: ChannelSolver | None) -> int:
+		schema = _residual()
+		random.seed(0)
+		return sum(schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(24), 1, solver) is not None for _ in range(32))
+	def test_success_rate(self):
+		self.assertLess(self._successes(None), 8)
+		self.assertEqual(self._successes(ChannelSolver()), 32)
+	def test_joined_channels(self):
+		random.seed(0)
+		ir = _residual().compile_ir([LockedShape(4, 16)], BreedIndices(), ID(24), 1, ChannelSolver())
+		if ir is None:
+			self.fail()
+		outputs = {node.schema_node.debug_name: node.output_shape for node in ir}
+		self.assertEqual(outputs["split_1"], outputs["split_2"])
+	def test_unconstrained_unchanged(self):
+		start = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(2, .9), None, Conv(3, 1), ReLU(), None, 1, "start")
+		end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+		start.add_group(New(end, 0))
+		schema = Schema([start], [end])
+		for seed in range(8):
+			random.seed(seed)
+			greedy = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(8))
+			random.seed(seed)
+			self.assertEqual(greedy, schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(8), 1, ChannelSolver()))
@@ -0,0 +1,61 @@
+import unittest
+import random
+
+import numpy as np
+
+from lemnos.schema import SchemaNode, Schema, New, BreedIndices, LinearGrowth, Genome, GenomePool, Crossover
+from lemnos.schema.genome import cross, mutate, MISSING_GENE
+from lemnos.schema.components import Conv, ReLU, Full
+from lemnos.shared import LockedShape, ShapeBound, ID
+
+def _schema() -> Schema:
+	start = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(2, .9), None, Conv(3, 1), ReLU(), None, 1, "start")
+	loop = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(1, .9), None, Conv(3, 1), ReLU(), None, 1, "loop")
+	end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+	start.add_group(New(loop, 0))
+	loop.add_group(New(loop, 0))
+	loop.add_group(New(end, 0))
+	return Schema([start], [end], 0)
+
+class TestGenome(unittest.TestCase):
+	def setUp(self) -> None:
+		random.seed(0)
+		self.schema = _schema()
+		self.irs = [ir for _ in range(8) if (ir := self.schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))) is not None]
+		self.pool = GenomePool(self.schema, self.irs)
+	def test_encoding(self):
+		genes = self.pool.get_genes()
+		self.assertEqual(genes.shape[:2], (len(self.irs), len(self.schema.get_nodes())))
+		for ir, genome in zip(self.irs, genes):
+			self.assertEqual(int((genome != MISSING_GENE).sum()), len(ir))
+	def test_reproduces_parent(self):
+		for i, ir in enumerate(self.irs):
+			self.assertEqual(self.schema.compile_ir([LockedShape(4, 16)], Genome(self.pool.get_genes()[i]), ID(32)), ir)
+		children = self.pool.breed(4, Crossover.UNIFORM, 2, 0, np.zeros((4, 2), dtype=np.int64))
+		for child in children:
+			self.assertEqual(self.schema.compile_ir([LockedShape(4, 16)], child, ID(32)), self.irs[0])
+	def test_crossover(self):
+		genes = np.array([[[1, 2, MISSING_GENE]], [[3, MISSING_GENE, MISSING_GENE]]], dtype=np.int64)
+		rng = np.random.default_rng(0)
+		for crossover in Crossover:
+			children = cross(genes, np.array([[0, 1], [1, 0]] * 8), crossover, rng)
+			self.assertEqual(children.shape, (16, 1, 3))
+			self.assertTrue(np.isin(children[:, 0, 0], [1, 3]).all())
+			self.assertTrue((children[:, 0, 1] == 2).all())
+			self.assertTrue((children[:, 0, 2] == MISSING_GENE).all())
+		points = cross(np.arange(2 * 6, dtype=np.int64).reshape(2, 6, 1), np.array([[0, 1]] * 16), Crossover.ONE_POINT, rng)[:, :, 0]
+		for child in points:
+			switches = child >= 6
+			self.assertTrue((switches[1:] >= switches[:-1]).all())
+	def test_mutate(self):
+		genes = np.zeros((4, 3, 2), dtype=np.int64)
+		rng = np.random.default_rng(0)
+		self.assertIs(mutate(genes, 0, rng), genes)
+		self.assertTrue((mutate(genes, 1, rng) != 0).any())
+		self.assertTrue((genes == 0).all())
+	def test_breed(self):
+		children = self.pool.breed(16, Crossover.ONE_POINT, 3, .1)
+		self.assertEqual(len(children), 16)
+		self.assertGreater(sum(self.schema.compile_ir([LockedShape(4, 16)], child, ID(32)) is not None for child in children), 0)
+		with self.assertRaises(ValueError):
+			self.pool.breed(4, parents=np.zeros((3, 2), dtype=np.int64))
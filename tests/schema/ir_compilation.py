@@ -1,9 +1,13 @@
 import unittest
+import random
 
 from lemnos.schema.schema_graph import _CompilationNode, _CompilationNodeStack, _CompilationTracker 
 from lemnos.schema.schema_graph import *
 from lemnos.schema.components import Concat, Sum, Conv, ReLU, BatchNorm, Full
-from lemnos.schema.compilation_indices import BreedIndices
+from lemnos.schema.compilation_indices import BreedIndices, SequenceIndices
+from lemnos.schema import Schema, LinearGrowth, IRNode, CompilationIndex
+from lemnos.schema.analysis import analyze_schema, IssueKind
+from lemnos.schema.schema_graph import CompilationIndices
 from lemnos.shared import *
 
 class Test_Compilation(unittest.TestCase):
@@ -67,3 +71,179 @@ class Test_Compilation(unittest.TestCase):
 		if nodes is None:
 			self.fail()
 		self.assertEqual(len(nodes), 11)
+
+class TestFreeze(unittest.TestCase):
+	def setUp(self):
+		self.start = SchemaNode(ShapeBound((1, 10), (1, 8)), None, None, Conv(kernel=2, stride=2, groups=2), ReLU(), None, 3, "start")
+		self.end = SchemaNode(ShapeBound((1, 10), (1, 4)), None, Sum(), None, None, None, 1, "end")
+		self.start.add_group(New(self.end, 0))
+		self.schema = Schema([self.start], [self.end])
+	def test_ids(self):
+		self.schema.freeze()
+		self.assertEqual(self.start.get_schema_id(), 0)
+		self.assertEqual(self.end.get_schema_id(), 1)
+		self.assertEqual(len(self.schema.get_transitions()), 1)
+	def test_add_group_after_compile(self):
+		#schemas are built incrementally, compiling after each addition
+		self.assertIsNotNone(self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10)))
+		other = SchemaNode(ShapeBound((1, 10), (1, 4)), None, None, None, None, None, 1, "other")
+		self.start.add_group(New(other, 0))
+		self.assertFalse(self.start.is_frozen())
+		self.assertFalse(self.schema.is_frozen())
+		self.schema = Schema([self.start], [self.end, other])
+		for _ in range(8):
+			self.assertIsNotNone(self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10)))
+		self.assertEqual(other.get_schema_id(), 2)
+	def test_shared_nodes(self):
+		#a second schema renumbers the nodes it shares, the first freezes again before its next compilation
+		middle = SchemaNode(ShapeBound((1, 10), (1, 4)), None, None, None, None, None, 1, "middle")
+		after = SchemaNode(ShapeBound((1, 10), (1, 4)), None, None, None, None, None, 1, "after")
+		middle.add_group(New(after, 0))
+		after.add_group(New(self.end, 0))
+		other = Schema([middle], [self.end])
+		self.assertIsNotNone(self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10)))
+		self.assertIsNotNone(other.compile_ir([LockedShape(2, 4)], BreedIndices(), ID(10)))
+		self.assertFalse(self.schema.is_frozen())
+		self.assertIsNotNone(self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10)))
+		self.assertEqual(self.end.get_schema_id(), 1)
+	def test_conformance_template(self):
+		self.schema.freeze()
+		self.assertIs(self.start.get_conformance([]), self.start.get_conformance([]))
+		conformance = self.start.get_conformance([])
+		if conformance is None:
+			self.fail()
+		self.assertEqual(conformance.divisor, 6)
+	def test_compile_freezes(self):
+		ir = self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10))
+		if ir is None:
+			self.fail()
+		self.assertTrue(self.schema.is_frozen())
+		self.assertEqual(ir, self.schema.compile_ir([LockedShape(2, 8)], SequenceIndices(ir), ID(10)))
+	def test_sequence_indices(self):
+		ir = self.schema.compile_ir([LockedShape(2, 8)], BreedIndices(), ID(10))
+		if ir is None:
+			self.fail()
+		indices = SequenceIndices(ir)
+		self.assertIs(indices.get_index(ir[0].id, ir[0].schema_node, ir[0].input_shape), ir[0].index)
+		self.assertRaises(KeyError, indices.get_index, len(ir) + 5, ir[0].schema_node, ir[0].input_shape)
+	def test_join_without_merge(self):
+		#a join into a node without a merge method is reported by analysis, an auto join compiles while only one parent joins so it is only a warning
+		start = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "start")
+		end = SchemaNode(ShapeBound((1, 10)), None, None, None, None, None, 1, "end")
+		start.add_group(Auto(end, 0))
+		schema = Schema([start], [end])
+		analysis = analyze_schema(schema)
+		self.assertTrue(any(issue.kind == IssueKind.MISSING_MERGE_METHOD for issue in analysis.get_warnings()))
+		self.assertFalse(analysis.has_errors())
+		self.assertIsNotNone(schema.compile_ir([LockedShape(5)], BreedIndices(), ID(10)))
+
+class TestLookahead(unittest.TestCase):
+	def setUp(self):
+		#the grouped conv is behind a node without a transform, so the divisor it needs is not seen by down with a single lookahead
+		start = SchemaNode(ShapeBound((1, 64), (1, 32), (1, 32)), LinearGrowth(8, .9), None, Conv(3, 1), None, None, 1, "start")
+		act = SchemaNode(ShapeBound((1, 64), (1, 32), (1, 32)), None, Concat(), None, ReLU(), BatchNorm(), 1, "act")
+		down = SchemaNode(ShapeBound((1, 64), (1, 32), (1, 32)), LinearGrowth(1.5, .9), None, Conv(2, 0, 2), None, None, 1, "down")
+		down_act = SchemaNode(ShapeBound((1, 64), (1, 32), (1, 32)), None, None, None, ReLU(), BatchNorm(), 1, "down_act")
+		grouped = SchemaNode(ShapeBound((1, 64), (1, 32), (1, 32)), LinearGrowth(1, .5), None, Conv(3, 1, groups=4), None, None, 1, "grouped")
+		bottleneck = SchemaNode(ShapeBound((1, 64), 4, 4), None, None, None, ReLU(), None, 1, "bottleneck")
+		end = SchemaNode(ShapeBound((1, 64), 1, 1), None, None, Conv(4), None, None, 1, "end")
+		start.add_group(New(act, 0))
+		act.add_group(New(down, 0))
+		act.add_group(New(bottleneck, 0))
+		down.add_group(New(down_act, 0))
+		down_act.add_group(New(grouped, 0))
+		grouped.add_group(New(act, 0))
+		bottleneck.add_group(New(end, 0))
+		self.schema = Schema([start], [end])
+	def _successes(self, lookahead: int) -> int:
+		random.seed(0)
+		return sum(self.schema.compile_ir([LockedShape(3, 32, 32)], BreedIndices(), ID(64), lookahead) is not None for _ in range(32))
+	def test_success_rate(self):
+		self.assertLess(self._successes(1), 16)
+		self.assertEqual(self._successes(3), 32)
+	def test_valid(self):
+		random.seed(0)
+		for _ in range(8):
+			ir = self.schema.compile_ir([LockedShape(3, 32, 32)], BreedIndices(), ID(64), 3)
+			if ir is None:
+				self.fail()
+			for node in ir:
+				if node.schema_node.debug_name == "grouped":
+					self.assertEqual(node.input_shape[0] % 4, 0)
+
+class _ChangedIndices(CompilationIndices):
+	def __init__(self, ir: list[IRNode], changes: dict[int, CompilationIndex]) -> None:
+		self._indices = {node.id: node.index for node in ir}
+		self._changes = changes
+	def get_index(self, id: int, schema_node: SchemaNode, shape_in: LockedShape) -> CompilationIndex:
+		return self._changes.get(id, self._indices.get(id, CompilationIndex()))
+
+def _loop_schema(prefix_cache_size: int) -> Schema:
+	start = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(2, .9), None, Conv(3, 1), ReLU(), None, 1, "start")
+	loop = SchemaNode(ShapeBound((1, 64), (1, 16)), LinearGrowth(1, .9), None, Conv(3, 1), ReLU(), None, 1, "loop")
+	end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+	start.add_group(New(loop, 0))
+	loop.add_group(New(loop, 0))
+	loop.add_group(New(end, 0))
+	return Schema([start], [end], prefix_cache_size)
+
+class TestRecompile(unittest.TestCase):
+	def test_matches_full(self):
+		schema = _loop_schema(4096)
+		random.seed(0)
+		ir = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+		if ir is None:
+			self.fail()
+		changed_id = len(ir) // 2
+		indices = _ChangedIndices(ir, {changed_id: CompilationIndex(12345)})
+		recompiled = schema.recompile_ir(ir, [changed_id], indices, ID(32))
+		if recompiled is None:
+			self.fail()
+		self.assertEqual(recompiled, schema.compile_ir([LockedShape(4, 16)], indices, ID(32)))
+		for parent_node, node in zip(ir[:changed_id], recompiled):
+			self.assertIs(parent_node, node)
+		self.assertEqual(recompiled[changed_id].index, CompilationIndex(12345))
+	def test_chained(self):
+		schema = _loop_schema(4096)
+		random.seed(1)
+		ir = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+		if ir is None:
+			self.fail()
+		for changed_id in (len(ir) - 1, len(ir) // 2, 1):
+			indices = _ChangedIndices(ir, {changed_id: CompilationIndex(changed_id * 7919)})
+			if (ir := schema.recompile_ir(ir, [changed_id], indices, ID(32))) is None:
+				self.fail()
+			self.assertEqual(ir, schema.compile_ir([LockedShape(4, 16)], indices, ID(32)))
+	def test_uncached(self):
+		schema = _loop_schema(0)
+		random.seed(0)
+		ir = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+		if ir is None:
+			self.fail()
+		indices = _ChangedIndices(ir, {1: CompilationIndex(7)})
+		self.assertEqual(schema.recompile_ir(ir, [1], indices, ID(32)), schema.compile_ir([LockedShape(4, 16)], indices, ID(32)))
+
+class TestPrefixCache(unittest.TestCase):
+	def test_shared_prefix(self):
+		schema = _loop_schema(4096)
+		random.seed(0)
+		ir = schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+		if ir is None:
+			self.fail()
+		changed_id = len(ir) - 2
+		indices = _ChangedIndices(ir, {changed_id: CompilationIndex(54321)})
+		compiled = schema.compile_ir([LockedShape(4, 16)], indices, ID(32))
+		if compiled is None:
+			self.fail()
+		for parent_node, node in zip(ir[:changed_id], compiled):
+			self.assertIs(parent_node, node)
+		uncached = _loop_schema(0).compile_ir([LockedShape(4, 16)], indices, ID(32))
+		if uncached is None:
+			self.fail()
+		self.assertEqual([(node.id, node.input_shape, node.output_shape, node.index) for node in compiled], [(node.id, node.input_shape, node.output_shape, node.index) for node in uncached])
+	def test_bounded(self):
+		schema = _loop_schema(64)
+		random.seed(0)
+		for _ in range(32):
+			schema.compile_ir([LockedShape(4, 16)], BreedIndices(), ID(32))
+			self.assertLessEqual(len(schema._prefixes), 64)
@@ -0,0 +1,55 @@
+import unittest
+import random
+
+from lemnos.schema import SchemaNode, Schema, New, Existing, BreedIndices, IRNode, CompilationIndex, get_parameter_count, get_flops, get_depth, get_structural_hash
+from lemnos.schema.components import Conv, Sum, ReLU, ReLU6, BatchNorm, Full, GLU, Activation
+from lemnos.shared import LockedShape, ShapeBound, ID
+from lemnos.adapter.torch import create_module
+
+class TestIRProperties(unittest.TestCase):
+	def setUp(self) -> None:
+		head = SchemaNode(ShapeBound((1, 16), (1, 16)), None, None, Conv(1), None, None, 1, "head")
+		split_1 = SchemaNode(ShapeBound((1, 16), (1, 16)), None, None, Conv(3, 1, groups=2), ReLU(), BatchNorm(), 2, "split_1")
+		split_2 = SchemaNode(ShapeBound((1, 16), (1, 16)), None, None, Conv(3, 1), ReLU(), None, 2, "split_2")
+		merge = SchemaNode(ShapeBound((1, 16), (1, 16)), None, Sum(), None, None, None, 1, "merge")
+		end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+		head.add_group(New(split_1, 0), New(split_2, 1))
+		split_1.add_group(New(merge, 2))
+		split_2.add_group(Existing(merge, 2))
+		merge.add_group(New(end, 0))
+		random.seed(0)
+		ir = Schema([head], [end]).compile_ir([LockedShape(4, 16)], BreedIndices(), ID(16))
+		if ir is None:
+			self.fail()
+		self.ir = ir
+	def test_parameter_count(self):
+		module = create_module("Test", self.ir, fusion=False)
+		self.assertEqual(get_parameter_count(self.ir), sum(parameter.numel() for parameter in module.parameters()))
+	def test_flops(self):
+		head, split_1 = self.ir[0], next(node for node in self.ir if node.schema_node.debug_name == "split_1")
+		self.assertEqual(get_flops([head]), 2 * head.output_shape.get_product() * head.input_shape[0])
+		self.assertEqual(get_flops([split_1]), 2 * split_1.output_shape.get_product() * (split_1.input_shape[0] // 2) * 3 + 2 * split_1.output_shape.get_product())
+	def test_glu(self):
+		#the conv makes twice the channels the glu passes on
+		node = SchemaNode(ShapeBound((1, 16), (1, 16)), None, None, Conv(3, 1), GLU(), BatchNorm(), 1, "glu")
+		ir = [IRNode(node, (), 0, LockedShape(4, 16), LockedShape(6, 16), CompilationIndex())]
+		self.assertEqual(get_parameter_count(ir), 4 * 12 * 3 + 12 + 2 * 6)
+		self.assertEqual(get_flops(ir), 2 * 12 * 16 * 4 * 3 + 12 * 16 + 6 * 16)
+	def test_structural_hash(self):
+		def ir(kernel: int, activation: Activation) -> list[IRNode]:
+			#nodes of the same name and shapes, which differ only in their components
+			start = SchemaNode(ShapeBound((1, 16), (1, 16)), None, None, Conv(kernel, kernel // 2), activation, None, 1, "start")
+			end = SchemaNode(ShapeBound((1, 8)), None, None, Full(), None, None, 1, "end")
+			start.add_group(New(end, 0))
+			random.seed(0)
+			compiled = Schema([start], [end]).compile_ir([LockedShape(4, 16)], BreedIndices(), ID(4))
+			if compiled is None:
+				self.fail()
+			return compiled
+		#separately built schemas hash the same, so the hash does not depend on object identity
+		self.assertEqual(get_structural_hash(ir(3, ReLU())), get_structural_hash(ir(3, ReLU())))
+		self.assertNotEqual(get_structural_hash(ir(3, ReLU())), get_structural_hash(ir(1, ReLU())))
+		self.assertNotEqual(get_structural_hash(ir(3, ReLU())), get_structural_hash(ir(3, ReLU6())))
+	def test_depth(self):
+		self.assertEqual(get_depth(self.ir), 4)
+		self.assertEqual(get_depth([]), 0)
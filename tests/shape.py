@@ -1,4 +1,7 @@
 import unittest
+import pickle
+from copy import copy
+from math import prod
 
 from lemnos.shared import Shape, LockedShape, OpenShape, ShapeBound 
 
@@ -62,3 +65,25 @@ class TestShapeBounds(unittest.TestCase):
 	def test_contains_out(self) -> None:
 		self.assertFalse(LockedShape(11) in self.bound)
 	
+
+class TestShapeInterning(unittest.TestCase):
+	def test_interned(self) -> None:
+		self.assertIs(LockedShape(2, 3), LockedShape(2, 3))
+		self.assertIsNot(LockedShape(2, 3), OpenShape(2, 3))
+		self.assertNotEqual(LockedShape(2, 3), OpenShape(2, 3))
+		self.assertIs(copy(LockedShape(2, 3)), LockedShape(2, 3))
+	def test_hash(self) -> None:
+		shapes = {LockedShape(2, 3): 0, OpenShape(2, 3): 1}
+		self.assertEqual(shapes[LockedShape(2, 3)], 0)
+		self.assertEqual(shapes[OpenShape(2, 3)], 1)
+	def test_pickle(self) -> None:
+		self.assertIs(pickle.loads(pickle.dumps(LockedShape(1, 2, 3))), LockedShape(1, 2, 3))
+	def test_reverse_lower_product(self) -> None:
+		shape = LockedShape(2, 3, 4)
+		for reverse_index in range(0, 5):
+			self.assertEqual(shape.reverse_lower_product(reverse_index), prod((2, 3, 4)[:-reverse_index]))
+	def test_memoized_common(self) -> None:
+		self.assertIs(LockedShape(2, 3).common_lossless(OpenShape(2, 3)), LockedShape(1, 2, 3))
+		self.assertIs(LockedShape(2, 3).common_lossless(OpenShape(2, 3)), LockedShape(1, 2, 3))
+		self.assertIsNone(LockedShape(3, 3).common_lossless(OpenShape(2, 3)))
+		self.assertIsNone(LockedShape(3, 3).common_lossless(OpenShape(2, 3)))